@@ -0,0 +1,31 @@
+'''
+Random-policy throughput: BatchGameState (K games per NumPy step) against scalar GameState.
+
+    python -m bench.bench_batch [games]
+'''
+import sys, time
+import numpy as np
+from game_logic.batch import BatchGameState
+from game_logic.sim import simulate, RandomAgent
+
+
+def run(games: int):
+    t0 = time.perf_counter()
+    batch = BatchGameState(3, range(games))
+    rng = np.random.default_rng(0)
+    steps = 0
+    while not batch.check_end().all():
+        batch.step(*batch.random_actions(rng))
+        steps += 1
+    elapsed = time.perf_counter() - t0
+    print(f"batch : {games} games, {steps} steps, {elapsed:.2f}s, {games / elapsed:,.0f} games/s, "
+          f"{int(batch.version.sum()) / elapsed:,.0f} actions/s")
+
+    t0 = time.perf_counter()
+    actions = sum(r.turns for r in simulate(RandomAgent, 3, games, workers=1))
+    elapsed = time.perf_counter() - t0
+    print(f"scalar: {games} games, {elapsed:.2f}s, {games / elapsed:,.0f} games/s, {actions / elapsed:,.0f} actions/s")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
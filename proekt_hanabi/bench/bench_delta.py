@@ -0,0 +1,46 @@
+'''
+Per-move cost of the STATE snapshot versus the DELTA message, over whole random games.
+
+    python -m bench.bench_delta [games]
+'''
+import json, random, sys, time
+from game_logic.cards import Color
+from game_logic.state import GameState
+
+
+def random_action(gs, rng):
+    turn = gs.current_turn
+    choice = rng.randrange(3)
+    if choice == 0 and gs.tokens > 0:
+        gs.give_hint(turn, (turn + 1) % len(gs.players), color=rng.choice(list(Color)))
+    elif choice == 1:
+        gs.play_card(turn, rng.randrange(len(gs.players[turn].hand)))
+    else:
+        gs.discard(turn, rng.randrange(len(gs.players[turn].hand)))
+
+
+def run(games: int):
+    rng = random.Random(0)
+    moves = state_bytes = delta_bytes = 0
+    state_time = delta_time = 0.0
+    for _ in range(games):
+        gs = GameState(["A", "B", "C"])
+        while not gs.check_end():
+            random_action(gs, rng)
+            t0 = time.perf_counter()
+            state = json.dumps({"type": "STATE", **gs.serialize_state()})
+            t1 = time.perf_counter()
+            delta = json.dumps({"type": "DELTA", **gs.last_delta})
+            t2 = time.perf_counter()
+            moves += 1
+            state_bytes += len(state)
+            delta_bytes += len(delta)
+            state_time += t1 - t0
+            delta_time += t2 - t1
+    print(f"moves={moves}")
+    print(f"STATE avg {state_bytes / moves:7.0f} bytes  {state_time / moves * 1e6:6.1f} us/encode")
+    print(f"DELTA avg {delta_bytes / moves:7.0f} bytes  {delta_time / moves * 1e6:6.1f} us/encode")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,43 @@
+'''
+Endgame solver (game_logic/endgame.py) throughput: for each table size and cards left in the
+deck, the real-order search (Solver.best_move) and the search over deck orders (solve), as nodes
+searched per second and transposition table hit rate, on SimpleAgent games played into the
+endgame. With workers > 1 solve() splits the root moves across processes.
+
+    python -m bench.bench_endgame [games] [workers]
+'''
+import sys, time
+from game_logic.endgame import Solver, endgame, solve
+
+SAMPLES = 60
+
+
+def run(games: int, workers: int):
+    for players in (2, 3, 5):
+        for deck in (3, 5, 7):
+            real = [0, 0, 0.0] # nodes, lookups, seconds
+            orders = [0, 0, 0.0]
+            for seed in range(games):
+                game = endgame(players, seed, deck)
+                if game.check_end():
+                    continue
+                solver = Solver()
+                t0 = time.perf_counter()
+                solver.best_move(game)
+                t1 = time.perf_counter()
+                stats = solver.stats()
+                real[0] += stats["nodes"]
+                real[1] += stats["nodes"] + stats["hits"]
+                real[2] += t1 - t0
+                stats = solve(game, SAMPLES, workers, seed)["stats"]
+                orders[0] += stats["nodes"]
+                orders[1] += stats["nodes"] + stats["hits"]
+                orders[2] += time.perf_counter() - t1
+            print(f"{players} players, {deck} cards left: "
+                  + ", ".join(f"{name} {n / s if s else 0:,.0f} nodes/s hit {h and (h - n) / h:.0%} "
+                              f"({s / games * 1e3:.1f} ms/game)"
+                              for name, (n, h, s) in (("real order", real), ("all orders", orders))))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10, int(sys.argv[2]) if len(sys.argv) > 2 else 1)
@@ -0,0 +1,46 @@
+'''
+Per-turn cost of card inference (game_logic/knowledge.py) on a five-player table: observe() the
+action, then the current player asks for the playable and useless odds of each of its slots, as
+InferenceAgent does. Also reports the same queries against a fresh Knowledge (no incremental
+state, nothing memoized) for comparison.
+
+    python -m bench.bench_knowledge [games]
+'''
+import random, sys, time
+from game_logic.state import GameState
+from game_logic.actions import apply_action
+from game_logic.knowledge import Knowledge
+
+
+def turn_queries(kn, game):
+    me = game.current_turn
+    playable, useless = kn.playable_cards(), kn.useless_cards()
+    for slot in range(len(game.players[me].hand)):
+        kn.chance(me, slot, playable)
+        kn.chance(me, slot, useless)
+
+
+def run(games: int):
+    rng = random.Random(1)
+    incremental = fresh = 0.0
+    turns = 0
+    for seed in range(games):
+        game = GameState([f"bot{i}" for i in range(5)], seed=seed)
+        kn = Knowledge(game)
+        while not game.check_end():
+            action = rng.choice(game.legal_actions())
+            apply_action(game, action)
+            t0 = time.perf_counter()
+            kn.observe(action)
+            turn_queries(kn, game)
+            t1 = time.perf_counter()
+            turn_queries(Knowledge(game), game)
+            fresh += time.perf_counter() - t1
+            incremental += t1 - t0
+            turns += 1
+    print(f"5 players, {turns} turns: incremental {incremental / turns * 1e6:.1f} us/turn, "
+          f"from scratch {fresh / turns * 1e6:.1f} us/turn (no negative hint info)")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
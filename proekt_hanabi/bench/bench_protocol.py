@@ -0,0 +1,42 @@
+'''
+JSON lines against binary frames (with and without zlib): bytes on the wire and encode + decode
+time for every STATE and DELTA of random 4-player games.
+
+    python -m bench.bench_protocol [games]
+'''
+import json, random, sys, time
+from game_logic.state import GameState
+from game_logic.protocol import encode_json, encode_frame, decode_frame, HEADER
+from bench.bench_delta import random_action
+
+CODECS = {
+    "json":     (encode_json, lambda data: json.loads(data)),
+    "bin":      (encode_frame, lambda data: decode_frame(data[4], data[HEADER.size:])),
+    "bin+zlib": (lambda msg: encode_frame(msg, True), lambda data: decode_frame(data[4], data[HEADER.size:])),
+}
+
+
+def run(games: int):
+    rng = random.Random(0)
+    messages = {"STATE": [], "DELTA": []}
+    for seed in range(games):
+        gs = GameState(["Alice", "Bob", "Carol", "Dave"], seed=seed)
+        while not gs.check_end():
+            random_action(gs, rng)
+            messages["DELTA"].append({"type": "DELTA", **gs.last_delta})
+            messages["STATE"].append({"type": "STATE", **gs.serialize_state()})
+    for kind, msgs in messages.items():
+        for name, (enc, dec) in CODECS.items():
+            t0 = time.perf_counter()
+            frames = [enc(m) for m in msgs]
+            t1 = time.perf_counter()
+            for f in frames:
+                dec(f)
+            t2 = time.perf_counter()
+            size = sum(map(len, frames)) / len(frames)
+            print(f"{kind} {name:9s} {size:7.0f} bytes  encode {(t1 - t0) / len(msgs) * 1e6:6.1f} us"
+                  f"  decode {(t2 - t1) / len(msgs) * 1e6:6.1f} us")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
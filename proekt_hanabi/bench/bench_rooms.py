@@ -0,0 +1,54 @@
+'''
+Capacity benchmark for the multi-room server.
+Starts HanabiServer in-process without Redis, fills ROOMS rooms with LOBBY_SIZE bot
+connections each and lets every room play MOVES moves (discarding slot 0 on its turn), following the
+STATE / DELTA stream like a real client.
+Bots share the process (and the core) with the server, so the numbers are a lower bound.
+
+    python -m bench.bench_rooms [rooms] [moves]
+'''
+import asyncio, json, sys, time
+from game_logic.delta import apply_delta
+from server.server import HanabiServer
+
+HOST, PORT = '127.0.0.1', 12399
+
+
+async def bot(room_id: int, name: str, moves: int, stats: dict):
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    writer.write((json.dumps({"type":"JOIN","player":name,"room":room_id}) + "\n").encode())
+    idx, state = None, None
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        msg = json.loads(line)
+        if msg["type"] == "ASSIGN_IDX":
+            idx = msg["idx"]
+        elif msg["type"] in ("STATE", "DELTA"):
+            state = msg if msg["type"] == "STATE" else apply_delta(state, msg)
+            if state["version"] >= moves:
+                break
+            if state["current_turn"] == idx:
+                stats["moves"] += 1
+                writer.write((json.dumps({"type":"DISC","player_idx":idx,"card_idx":0}) + "\n").encode())
+    writer.close()
+
+
+async def run(rooms: int, moves: int):
+    server = HanabiServer(lobby_size=2, r=None, max_rooms=rooms)
+    srv = await asyncio.start_server(server.handle_client, HOST, PORT, backlog=4096)
+    stats = {"moves": 0}
+    t0 = time.perf_counter()
+    await asyncio.gather(*(bot(i, f"p{i}-{s}", moves, stats)
+                           for i in range(rooms) for s in range(2)))
+    elapsed = time.perf_counter() - t0
+    srv.close()
+    print(f"rooms={rooms} connections={2 * rooms} moves={stats['moves']} "
+          f"elapsed={elapsed:.2f}s moves/s={stats['moves'] / elapsed:,.0f}")
+
+
+if __name__ == "__main__":
+    rooms = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    moves = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    asyncio.run(run(rooms, moves))
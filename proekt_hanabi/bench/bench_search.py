@@ -0,0 +1,46 @@
+'''
+Branching cost for search bots: clone() and apply()/undo() against deepcopy and a
+serialize_state / from_serialized round trip (which also reshuffles a fresh deck).
+
+    python -m bench.bench_search [nodes]
+'''
+import copy, random, sys, timeit
+from game_logic.state import GameState
+from game_logic.actions import PLAY, DISC, HINT
+from game_logic.cards import Color
+
+
+def midgame(seed=1):
+    gs = GameState(["A", "B", "C", "D"], seed=seed)
+    rng = random.Random(seed)
+    for _ in range(15):
+        turn = gs.current_turn
+        if gs.tokens and rng.random() < 0.5:
+            gs.apply((HINT, turn, (turn + 1) % 4, rng.choice(list(Color))))
+        else:
+            gs.apply((DISC, turn, rng.randrange(4)))
+    return gs
+
+
+def run(nodes: int):
+    gs = midgame()
+    actions = [(PLAY, gs.current_turn, 0), (DISC, gs.current_turn, 1),
+               (HINT, gs.current_turn, (gs.current_turn + 1) % 4, 2)]
+
+    def apply_undo():
+        for action in actions:
+            gs.undo(gs.apply(action))
+
+    rows = [
+        ("deepcopy", lambda: copy.deepcopy(gs), 1),
+        ("serialize round trip", lambda: GameState.from_serialized(gs.serialize_state()), 1),
+        ("clone", gs.clone, 1),
+        ("apply + undo", apply_undo, len(actions)),
+    ]
+    for name, fn, per_call in rows:
+        t = timeit.timeit(fn, number=nodes)
+        print(f"{name:22s} {t / (nodes * per_call) * 1e6:8.2f} us/node")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
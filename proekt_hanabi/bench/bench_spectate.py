@@ -0,0 +1,90 @@
+'''
+Spectator fan-out: one game played by a SpectatorFeed publisher into an in-memory Redis
+(fakeredis) and VIEWERS viewer sockets on an in-process SpectatorGateway, all in this process
+and on this core. Reports frame deliveries per second and what that means as viewers per core.
+
+    python -m bench.bench_spectate [viewers] [moves] [json|bin]
+'''
+import asyncio, sys, time
+import fakeredis
+from game_logic.state import GameState
+from game_logic.protocol import JSON, BINARY, encode_json, read_frame_async
+from server.spectate import SpectatorFeed
+from server.gateway import SpectatorGateway
+
+HOST = '127.0.0.1'
+MOVES_PER_S = 20 # a brisk bot game; human games are far slower
+
+
+def long_move(game: GameState):
+    '''hint while tokens last, else discard: the longest game a deck allows, no misfire ends it'''
+    player = game.current_turn
+    if game.tokens > 0:
+        to = (player + 1) % len(game.players)
+        card = next(c for c in game.players[to].hand if c is not None)
+        game.give_hint(player, to, card.color)
+    else:
+        game.discard(player, 0)
+
+
+async def viewer(port: int, game_id: str, proto: str, seen: list):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    req = {"type": "SPECTATE", "game_id": game_id}
+    if proto == BINARY:
+        req["proto"] = BINARY
+    writer.write(encode_json(req))
+    try:
+        while True:
+            if proto == BINARY:
+                await read_frame_async(reader)
+            else:
+                await reader.readline()
+            seen[0] += 1
+    finally:
+        writer.close()
+
+
+async def run(viewers: int, moves: int, proto: str):
+    redis_server = fakeredis.FakeServer()
+    feed = SpectatorFeed(fakeredis.FakeAsyncRedis(server=redis_server))
+    gateway = SpectatorGateway(fakeredis.FakeAsyncRedis(server=redis_server))
+    gw = await asyncio.start_server(gateway.handle_viewer, HOST, 0, backlog=4096)
+    port = gw.sockets[0].getsockname()[1]
+
+    game = GameState(["Alice", "Bob", "Carol"], seed=1)
+    feed.publish(game, {"type": "STATE", **game.serialize_state()}, full=True)
+    while feed.published == 0:
+        await asyncio.sleep(0.01)
+    seen = [0] # frames read by all viewers together
+    tasks = [asyncio.create_task(viewer(port, game.game_id, proto, seen)) for _ in range(viewers)]
+    while seen[0] < viewers:
+        await asyncio.sleep(0.01)
+
+    t0 = time.perf_counter()
+    for _ in range(moves):
+        if game.check_end():
+            break
+        long_move(game)
+        feed.publish(game, {"type": "DELTA", **game.last_delta})
+        await asyncio.sleep(0) # let the publisher and gateway interleave like a live server
+    played = game.version
+    while seen[0] < viewers * (played + 1): # + the STATE every viewer starts with
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - t0
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    while gateway.feeds: # let the gateway see every viewer leave
+        await asyncio.sleep(0.01)
+    deliveries = played * viewers
+    rate = deliveries / elapsed
+    print(f"proto={proto} viewers={viewers} moves={played} elapsed={elapsed:.2f}s "
+          f"deliveries/s={rate:,.0f} -> ~{rate / MOVES_PER_S:,.0f} viewers per core at {MOVES_PER_S} moves/s")
+    gw.close()
+
+
+if __name__ == "__main__":
+    viewers = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    moves = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    proto = sys.argv[3] if len(sys.argv) > 3 else JSON
+    asyncio.run(run(viewers, moves, proto))
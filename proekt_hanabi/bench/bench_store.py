@@ -0,0 +1,103 @@
+'''
+Per-move persistence cost of the StateStore backends (server/store.py), in this process:
+
+    latency     one game, every move waits until the store has it (submit + flush)
+    submit      what a room pays per move when it does not wait (the server never does)
+    throughput  GAMES games moving round-robin, stored moves per second with write-behind batching
+
+The "none" row is the same loop without a store (picking and applying the moves), subtract it.
+Redis is fakeredis (no network, no fsync) unless a URL is given, so it is a lower bound there;
+SQLite runs on a temp file with synchronous=FULL, one fsync per commit.
+
+    python -m bench.bench_store [games] [moves] [redis_url]
+'''
+import asyncio, os, sys, tempfile, time
+from game_logic.state import GameState
+from game_logic.actions import HINT, DISC, apply_action
+from server.store import StateStore, MemoryStore
+from server.sqlstore import SQLiteStore
+from server.writebehind import WriteBehind
+
+
+class NoStore(StateStore):
+    def submit_create(self, game): pass
+    def submit_action(self, game, action): pass
+
+
+def long_action(game: GameState) -> tuple:
+    '''hint while tokens last, else discard: the longest game a deck allows, no misfire ends it'''
+    player = game.current_turn
+    if game.tokens > 0:
+        return next(a for a in game.legal_actions() if a[0] == HINT)
+    return (DISC, player, 0)
+
+
+async def latency(store, games: int = 5) -> float:
+    elapsed, played = 0.0, 0
+    for seed in range(games):
+        game = GameState(["A", "B", "C"], game_id=f"latency{seed}", seed=seed)
+        store.submit_create(game)
+        await store.flush()
+        t0 = time.perf_counter()
+        while not game.check_end():
+            action = long_action(game)
+            apply_action(game, action)
+            store.submit_action(game, action)
+            await store.flush()
+            played += 1
+        elapsed += time.perf_counter() - t0
+    return elapsed / played
+
+
+async def throughput(store, games: int, moves: int) -> tuple:
+    tables = [GameState(["A", "B", "C"], game_id=f"g{i}", seed=i) for i in range(games)]
+    for game in tables:
+        store.submit_create(game)
+    await store.flush()
+    submit = 0.0
+    played = 0
+    t0 = time.perf_counter()
+    for _ in range(moves):
+        for game in tables:
+            if game.check_end():
+                continue
+            action = long_action(game)
+            apply_action(game, action)
+            t1 = time.perf_counter()
+            store.submit_action(game, action)
+            submit += time.perf_counter() - t1
+            played += 1
+        await asyncio.sleep(0) # the rooms yield between moves like a live server
+    await store.flush()
+    elapsed = time.perf_counter() - t0
+    return submit / played, played / elapsed
+
+
+async def run(games: int, moves: int, redis_url: str = None):
+    if redis_url:
+        import redis.asyncio
+        redis_client, redis_name = lambda: redis.asyncio.from_url(redis_url, decode_responses=True), "redis"
+    else:
+        import fakeredis
+        redis_client, redis_name = lambda: fakeredis.FakeAsyncRedis(decode_responses=True), "fakeredis"
+    backends = {
+        "none": lambda: NoStore(),
+        "memory": lambda: MemoryStore(),
+        "sqlite": lambda: SQLiteStore(os.path.join(tmp, "games.db")),
+        redis_name: lambda: WriteBehind(redis_client()),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, make in backends.items():
+            store = make()
+            per_move = await latency(store)
+            submit, rate = await throughput(store, games, moves)
+            await store.close()
+            print(f"{name:10s} latency={per_move * 1e6:8.1f}us/move  submit={submit * 1e6:5.2f}us/move  "
+                  f"throughput={rate:10,.0f} moves/s  ({games} games)")
+
+
+if __name__ == "__main__":
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    moves = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    redis_url = sys.argv[3] if len(sys.argv) > 3 else None
+    asyncio.run(run(games, moves, redis_url))
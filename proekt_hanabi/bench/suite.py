@@ -0,0 +1,236 @@
+'''
+Benchmark suite with a regression gate. Times the hot paths of game_logic and the server and
+compares them with the stored baseline (bench/baseline.json, from the machine that last saved it):
+
+    deck               Deck() + shuffle
+    play_card          GameState.play_card, a fresh 3-player game per batch of 10
+    give_hint          GameState.give_hint, 8 per game (the tokens)
+    discard            GameState.discard
+    serialize          serialize_state() of a mid-game 3-player game
+    from_serialized    GameState.from_serialized of a mid-game snapshot (replays nothing, reshuffles)
+    state_json         JSON encoding of a mid-game STATE message
+    move_latency       one DISC through handle_client until the mover has its DELTA, 2 players over
+                       loopback, write-behind store on an in-memory Redis (fakeredis; no store
+                       without it), best of 3 medians
+
+Each micro case is the best of REPEAT runs, in microseconds per operation. Right before every
+case a fixed pure-Python workload is timed too (calibrate), and the ratio to the baseline is
+divided by how much slower that workload got: a slower machine, or a VM that is being throttled
+for a few seconds, slows both, a slower build only the case. Save the baseline on a quiet
+machine: a baseline taken while the machine was slow makes every later run look slow. A case
+whose ratio exceeds --max-slowdown is measured again up to CONFIRM times and fails the run (exit
+code 1) if it never gets under; --raw compares plain times. Cases without a baseline only report.
+
+    python -m bench.suite                        # run, compare, exit 1 on a regression
+    python -m bench.suite --max-slowdown 1.5     # looser gate, e.g. on a noisy laptop
+    python -m bench.suite --only play,hint       # cases whose name contains one of these
+    python -m bench.suite --save                 # store this run as the new baseline
+'''
+import argparse, asyncio, gc, json, os, platform, random, statistics, sys, time
+from game_logic.cards import Deck, Color
+from game_logic.state import GameState
+from game_logic.protocol import encode_json
+from game_logic.actions import apply_action, PLAY
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+MAX_SLOWDOWN = 1.3
+REPEAT = 5
+CONFIRM = 2 # extra measurements of a case over the limit before it counts as a regression
+PLAYERS = ["Alice", "Bob", "Carol"]
+
+
+def best_of(setup, op, per_item: int, items: int) -> float:
+    ''' us per operation: op(item) on `items` fresh setup() results, best of REPEAT '''
+    best = float("inf")
+    for _ in range(REPEAT):
+        prepared = [setup() for _ in range(items)]
+        gc.disable() # as timeit does, a collection landing in one run is noise
+        try:
+            t0 = time.perf_counter()
+            for item in prepared:
+                op(item)
+            best = min(best, (time.perf_counter() - t0) / (items * per_item))
+        finally:
+            gc.enable()
+    return best * 1e6
+
+
+def reference(_):
+    d, items = {}, []
+    for i in range(2000):
+        d[i & 63] = d.get(i & 63, 0) + i
+        items.append((i, str(i)))
+    json.dumps(items[:200])
+
+
+def calibrate() -> float:
+    ''' us of a fixed workload of the kind the game code does (dicts, tuples, strings) '''
+    return best_of(lambda: None, reference, 1, 20)
+
+
+def midgame(seed: int = 1) -> GameState:
+    rng = random.Random(seed)
+    gs = GameState(PLAYERS, seed=seed)
+    for _ in range(20): # hints and discards only, a misfire streak would end the game
+        apply_action(gs, rng.choice([a for a in gs.legal_actions() if a[0] != PLAY]))
+    return gs
+
+
+MIDGAME = midgame()
+SNAPSHOT = MIDGAME.serialize_state()
+STATE_MSG = {"type": "STATE", **SNAPSHOT}
+
+
+def fresh():
+    return GameState(PLAYERS, seed=7)
+
+
+def plays(gs):
+    for i in range(10):
+        gs.play_card(i % 3, i % 5)
+
+
+def hints(gs):
+    for i in range(8):
+        gs.give_hint(i % 3, (i + 1) % 3, color=Color.RED if i % 2 else None, number=None if i % 2 else 1)
+
+
+def discards(gs):
+    for i in range(10):
+        gs.discard(i % 3, i % 5)
+
+
+def shuffled(_):
+    Deck().shuffle()
+
+
+async def _move_latency(moves: int) -> float:
+    r = None
+    try:
+        import fakeredis
+        r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    except ImportError:
+        pass
+    from server.server import HanabiServer
+    server = HanabiServer(lobby_size=2, r=r)
+    srv = await asyncio.start_server(server.handle_client, '127.0.0.1', 0)
+    port = srv.sockets[0].getsockname()[1]
+    latencies, room = [], 0
+    while len(latencies) < moves:
+        conns = []
+        for name in ("A", "B"):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(encode_json({"type": "JOIN", "player": name, "room": f"bench-{room}"}))
+            conns.append((reader, writer))
+        for reader, _ in conns:
+            await reader.readline() # ASSIGN_IDX
+            state = json.loads(await reader.readline())
+        while state["deck_count"] > 0 and len(latencies) < moves:
+            turn = state["current_turn"]
+            reader, writer = conns[turn]
+            t0 = time.perf_counter()
+            writer.write(encode_json({"type": "DISC", "player_idx": turn, "card_idx": 0}))
+            state = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - t0)
+            await conns[1 - turn][0].readline()
+        for _, writer in conns:
+            writer.close()
+        room += 1
+    srv.close()
+    if server.store is not None:
+        await server.store.close()
+    return statistics.median(latencies) * 1e6
+
+
+CASES = {
+    "deck":            lambda n: best_of(lambda: None, shuffled, 1, n),
+    "play_card":       lambda n: best_of(fresh, plays, 10, n // 10),
+    "give_hint":       lambda n: best_of(fresh, hints, 8, n // 8),
+    "discard":         lambda n: best_of(fresh, discards, 10, n // 10),
+    "serialize":       lambda n: best_of(lambda: MIDGAME, GameState.serialize_state, 1, n),
+    "from_serialized": lambda n: best_of(lambda: SNAPSHOT, GameState.from_serialized, 1, n),
+    "state_json":      lambda n: best_of(lambda: STATE_MSG, encode_json, 1, n),
+    "move_latency":    lambda n: min(asyncio.run(_move_latency(max(40, n // 10))) for _ in range(3)),
+}
+
+
+def measure(name: str, n: int) -> dict:
+    ''' {"us": per operation, "calibration": reference workload us around it} '''
+    before = calibrate()
+    us = CASES[name](n)
+    return {"us": us, "calibration": min(before, calibrate())}
+
+
+def run(names=None, n: int = 2000) -> dict:
+    return {name: measure(name, n) for name in names or CASES}
+
+
+def compare(results: dict, baseline: dict, max_slowdown: float, raw: bool = False) -> list:
+    ''' (case, us, baseline us or None, ratio, machine factor, regressed) for every result '''
+    rows = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, result["us"], None, None, None, False))
+            continue
+        machine = 1.0 if raw else result["calibration"] / base["calibration"]
+        ratio = result["us"] / base["us"] / machine
+        rows.append((name, result["us"], base["us"], ratio, machine, ratio > max_slowdown))
+    return rows
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)["cases"]
+
+
+def save_baseline(path: str, results: dict):
+    cases = {**load_baseline(path), **results}
+    with open(path, "w") as f:
+        json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                   "cases": {k: {key: round(v, 3) for key, v in case.items()} for k, case in sorted(cases.items())}},
+                  f, indent=2)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite with a slowdown gate against a stored baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--max-slowdown", type=float, default=float(os.getenv("BENCH_MAX_SLOWDOWN", MAX_SLOWDOWN)),
+                        help="fail when a case takes more than this times its baseline")
+    parser.add_argument("--only", help="comma separated substrings of case names")
+    parser.add_argument("--n", type=int, default=2000, help="operations per repeat of a micro case")
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--raw", action="store_true", help="compare plain times, no calibration")
+    args = parser.parse_args()
+
+    names = None
+    if args.only:
+        names = [name for name in CASES if any(part in name for part in args.only.split(","))]
+    results = run(names, args.n)
+    baseline = load_baseline(args.baseline)
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"baseline saved to {args.baseline}")
+        baseline = load_baseline(args.baseline)
+    rows = compare(results, baseline, args.max_slowdown, args.raw)
+    for i, row in enumerate(rows):
+        for _ in range(CONFIRM if row[-1] else 0):
+            again = compare({row[0]: measure(row[0], args.n)}, baseline, args.max_slowdown, args.raw)[0]
+            row = rows[i] = min(row, again, key=lambda r: r[3])
+            if not row[-1]:
+                break
+    failed = False
+    for name, us, base, ratio, machine, regressed in rows:
+        vs = f"{base:10.2f} us  x{ratio:.2f} (machine x{machine:.2f})" if base else f"{'-':>13s}  new"
+        print(f"{name:16s} {us:10.2f} us  baseline {vs}{'  SLOWER' if regressed else ''}")
+        failed |= regressed
+    if failed:
+        print(f"FAILED: slower than {args.max_slowdown}x the baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+from bench.suite import compare, run, save_baseline, load_baseline
+
+
+def test_gate_divides_out_the_machine():
+    baseline = {"a": {"us": 10.0, "calibration": 100.0}, "b": {"us": 10.0, "calibration": 100.0}}
+    results = {"a": {"us": 20.0, "calibration": 200.0},  # whole machine twice as slow
+               "b": {"us": 20.0, "calibration": 100.0},  # the code got slower
+               "c": {"us": 5.0, "calibration": 100.0}}   # no baseline yet
+    rows = {row[0]: row for row in compare(results, baseline, 1.3)}
+    assert rows["a"][3] == 1.0 and not rows["a"][-1]
+    assert rows["b"][3] == 2.0 and rows["b"][-1]
+    assert rows["c"][2] is None and not rows["c"][-1]
+    assert compare(results, baseline, 1.3, raw=True)[0][-1]
+
+
+def test_saved_baseline_round_trip(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    results = run(["give_hint", "state_json"], n=80)
+    assert all(r["us"] > 0 and r["calibration"] > 0 for r in results.values())
+    save_baseline(path, results)
+    assert set(load_baseline(path)) == {"give_hint", "state_json"}
+    assert not any(row[-1] for row in compare(results, load_baseline(path), 1.3))
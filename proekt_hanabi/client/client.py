@@ -1,139 +1,110 @@
-import socket, json, threading
+import asyncio, os
+from game_logic.protocol import JSON, ZLIB
+from client.session import Session, Assigned, Update, ServerError, Reconnecting, Closed, HOST, PORT
+'''
+Command line client on top of client/session.py. Typing a move runs in a worker thread, so
+updates keep arriving (and printing) while the prompt is open; after the first full state only
+the parts of the game that changed are printed. A dropped connection is resumed automatically.
 
-HOST, PORT = '0.0.0.0', 12345
+    python -m client.client          # HANABI_HOST / HANABI_PORT, HANABI_PROTO=bin for the binary protocol
+'''
+PROTO    = os.getenv("HANABI_PROTO", JSON)      # "bin" for the framed binary protocol
+COMPRESS = os.getenv("HANABI_COMPRESS") == ZLIB # only with PROTO=bin
+PROMPT = "Your move (PLAY idx / HINT p val / DISC idx): "
 
-class Client:
-    def __init__(self):
-        '''Connect to server and create file-like reader'''
-        self.sock = socket.socket()
-        self.sock.connect((HOST, PORT))
-        self.sock_file = self.sock.makefile('r')
-        self.idx = None  # assigned by server in first message
-        self.game_started = False
 
-        # Start listener thread
-        threading.Thread(target=self.receive_loop, daemon=True).start()
+def parse_command(cmd: str, idx: int) -> dict:
+    ''' move message for a typed command, ValueError with the usage if it is malformed '''
+    parts = cmd.split()
+    if not parts:
+        raise ValueError("Empty command—try again")
+    action = parts[0].upper()
+    if action in ("PLAY", "DISC"):
+        if len(parts) != 2 or not parts[1].isdigit():
+            raise ValueError(f"Usage: {action} <card_idx>")
+        return {"type": action, "player_idx": idx, "card_idx": int(parts[1])}
+    if action == "HINT":
+        # must be exactly 3 parts: HINT <player> <val>
+        if len(parts) != 3:
+            raise ValueError("Usage: HINT <player_idx> <color|number>")
+        target_str, val = parts[1], parts[2]
+        if not target_str.isdigit():
+            raise ValueError("Second argument must be the target player index.")
+        if val.isdigit():
+            return {"type": "HINT", "from": idx, "to": int(target_str), "number": int(val)}
+        return {"type": "HINT", "from": idx, "to": int(target_str), "color": val.upper()}
+    raise ValueError("Unknown command. Use PLAY, DISC, or HINT.")
 
-        # Send JOIN immediately after connecting
-        name = input("Your name> ")
-        old_id  = input("Game ID to resume (leave blank for new)> ").strip() or None
-        join_payload = {
-            "type":   "JOIN",
-            "player": name
-        }
-        if old_id:
-            join_payload["game_id"] = old_id
-        join_msg = json.dumps(join_payload) + "\n"
-        self.sock.sendall(join_msg.encode())
 
-    def receive_loop(self):
-        while True:
-            line = self.sock_file.readline()
-            if not line:
-                print("Connection closed by server.")
-                break
-            msg = json.loads(line)
-            msg_type = msg.get("type")
-            if msg_type == "ASSIGN_IDX":
-                self.idx = msg.get("idx")
-                print(f"Assigned player index: {self.idx}")
-            elif msg_type == "STATE":
-                # First STATE marks game start
-                if not self.game_started:
-                    print("All players joined. Game is starting!\n")
-                    self.game_started = True
-                self.handle_state(msg)
-            elif msg_type == "ERROR":
-                print("Error from server:", msg.get("msg"))
-
-    def handle_state(self, state):
-        ''' Prints received state and prompts for action if neccessary'''
-        self.current_turn = state.get("current_turn")
-        print("--- Game State ---")
-        print("Board:", state.get("board"))
-        print("Tokens:", state.get("tokens"), "Misfires:", state.get("misfires"))
+def render(state: dict, idx: int, changed) -> list:
+    ''' lines to print for the changed parts of the state '''
+    lines = []
+    if "game_id" in changed: # a full STATE
+        lines.append("--- Game State ---")
+    if "board" in changed:
+        lines.append(f"Board: {state.get('board')}")
+    if "tokens" in changed or "misfires" in changed:
+        lines.append(f"Tokens: {state.get('tokens')} Misfires: {state.get('misfires')} "
+                     f"Deck: {state.get('deck_count')}")
+    if "discards" in changed and state.get("discards"):
+        lines.append(f"Discarded: {state['discards'][-1]}")
+    if "hands" in changed:
         for i, hand in enumerate(state.get("hands", [])):
-            if i == self.idx:
-                # Show only the hints for your own cards
-                display = []
-                for card_info in hand:
-                    # card_info is a dict with 'number','color','hints'
-                    hints = card_info.get('hints', [])
-                    display.append({'hints': hints})
-                print(f"Player {i} (you): {display}")
+            if i == idx:
+                # own cards arrive without number / color (server-side seat view), show the hints
+                lines.append(f"Player {i} (you): {[{'hints': card.get('hints', [])} for card in hand]}")
             else:
-                print(f"Player {i}: {hand}")
-        print(f"Current turn: {self.current_turn}")
-        # Prompt to play only on your turn
-        if self.game_started and self.idx == self.current_turn:
-            self.prompt_action()
-
-    def prompt_action(self):
-        while True:
-            cmd = input("Your move (PLAY idx / HINT p val / DISC idx): ").strip()
-            parts = cmd.split()
-            if not parts:
-                print("Empty command—try again")
-                continue
+                lines.append(f"Player {i}: {hand}")
+    if "current_turn" in changed:
+        lines.append(f"Current turn: {state.get('current_turn')}")
+    return lines
 
-            action = parts[0].upper()
-            if action == "PLAY":
-                if len(parts) != 2 or not parts[1].isdigit():
-                    print("Usage: PLAY <card_idx>")
-                    continue
-                msg = {
-                    "type": "PLAY",
-                    "player_idx": self.idx,
-                    "card_idx": int(parts[1])
-                }
-                break
 
-            elif action == "DISC":
-                if len(parts) != 2 or not parts[1].isdigit():
-                    print("Usage: DISC <card_idx>")
-                    continue
-                msg = {
-                    "type": "DISC",
-                    "player_idx": self.idx,
-                    "card_idx": int(parts[1])
-                }
-                break
+async def prompt_move(session: Session):
+    while True:
+        try:
+            cmd = await asyncio.to_thread(input, PROMPT)
+        except EOFError: # stdin closed, leave the table
+            await session.close()
+            return
+        try:
+            msg = parse_command(cmd.strip(), session.idx)
+        except ValueError as e:
+            print(e)
+            continue
+        session.submit(msg)
+        return
 
-            elif action == "HINT":
-                # must be exactly 3 parts: HINT <player> <val>
-                if len(parts) != 3:
-                    print("Usage: HINT <player_idx> <color|number>")
-                    continue
 
-                target_str, val = parts[1], parts[2]
-                if not target_str.isdigit():
-                    print("Second argument must be the target player index.")
-                    continue
-                target = int(target_str)
-
-                if val.isdigit():
-                    msg = {
-                        "type": "HINT",
-                        "from": self.idx,
-                        "to": target,
-                        "number": int(val)
-                    }
-                else:
-                    msg = {
-                        "type": "HINT",
-                        "from": self.idx,
-                        "to": target,
-                        "color": val.upper()
-                    }
-                break
-            else:
-                print("Unknown command. Use PLAY, DISC, or HINT.")
-                continue
+async def main():
+    name = await asyncio.to_thread(input, "Your name> ")
+    old_id = (await asyncio.to_thread(input, "Game ID to resume (leave blank for new)> ")).strip() or None
+    session = Session(name, HOST, PORT, game_id=old_id, proto=PROTO, compress=COMPRESS)
+    await session.start()
+    prompt, started = None, False
+    async for event in session.events():
+        if isinstance(event, Assigned):
+            print(f"Assigned player index: {event.idx}")
+        elif isinstance(event, Update):
+            if not started:
+                print(f"All players joined. Game {session.game_id} is starting!\n")
+                started = True
+            print("\n".join(render(event.state, session.idx, event.changed)))
+            if session.finished:
+                print("Game over, final score:", sum(event.state["board"].values()))
+                await session.close()
+            elif event.state["current_turn"] == session.idx and (prompt is None or prompt.done()):
+                prompt = asyncio.get_running_loop().create_task(prompt_move(session))
+        elif isinstance(event, ServerError):
+            print("Error from server:", event.msg)
+            state = session.state
+            if state is not None and state["current_turn"] == session.idx and (prompt is None or prompt.done()):
+                prompt = asyncio.get_running_loop().create_task(prompt_move(session))
+        elif isinstance(event, Reconnecting):
+            print(f"Connection lost ({event.reason}), reconnecting in {event.delay:.1f}s")
+        elif isinstance(event, Closed):
+            print("Connection closed:", event.reason)
 
-        self.sock.sendall((json.dumps(msg) + "\n").encode())
 
 if __name__ == "__main__":
-    import threading
-    client = Client()
-    # keep the main thread alive
-    threading.Event().wait()
+    asyncio.run(main())
@@ -0,0 +1,195 @@
+import asyncio, json, random, time, argparse
+from game_logic.delta import apply_delta, StaleDelta
+from game_logic.protocol import JSON, BINARY, encode_json, encode_frame, read_frame_async
+from client.session import game_over
+'''
+Load generator: thousands of headless bot connections against a real server. Every bot joins a
+room, keeps a local copy of the game from STATE / DELTA and plays legal moves on its turn.
+
+    python -m client.loadgen --rooms 500 --players 2                      # against HOST:PORT
+    python -m client.loadgen --rooms 500 --spawn --redis fake             # in-process server
+Reports moves/s, action -> update latency (p50 / p99), connection setup time and error counts.
+'''
+HOST, PORT = '127.0.0.1', 12345
+COLORS = ["RED", "YELLOW", "GREEN", "BLUE", "WHITE"]
+
+
+class Stats():
+    def __init__(self):
+        self.latencies = []  # seconds from sending a move to the update that carries it
+        self.connect = []    # seconds from connect() to ASSIGN_IDX
+        self.moves = 0
+        self.errors = 0      # ERROR messages from the server
+        self.failed = 0      # bots that could not connect or lost the connection
+        self.games = 0
+
+    def report(self, elapsed: float) -> dict:
+        def pct(values, p):
+            if not values:
+                return 0.0
+            values = sorted(values)
+            return values[min(len(values) - 1, int(len(values) * p))] * 1000
+        return {
+            "moves": self.moves,
+            "moves_per_s": self.moves / elapsed if elapsed else 0.0,
+            "latency_p50_ms": pct(self.latencies, 0.50),
+            "latency_p99_ms": pct(self.latencies, 0.99),
+            "connect_p50_ms": pct(self.connect, 0.50),
+            "connect_p99_ms": pct(self.connect, 0.99),
+            "errors": self.errors,
+            "failed_connections": self.failed,
+            "games_finished": self.games,
+            "error_rate": (self.errors + self.failed) / max(1, self.moves),
+        }
+
+
+def choose_move(state: dict, idx: int, rng) -> dict:
+    ''' legal move from what this seat can see: play a slot whose hints prove it playable,
+    else hint a teammate, else discard '''
+    board = state["board"]
+    for slot, card in enumerate(state["hands"][idx]):
+        colors = [h for h in card["hints"] if h in COLORS]
+        ranks = [int(h) for h in card["hints"] if h.isdigit()]
+        if colors and ranks and board[colors[0]] + 1 == ranks[0]:
+            return {"type": "PLAY", "player_idx": idx, "card_idx": slot}
+    players = len(state["hands"])
+    if state["tokens"] > 0 and rng.random() < 0.6:
+        to = (idx + rng.randrange(1, players)) % players
+        cards = [c for c in state["hands"][to] if c["number"] is not None]
+        if cards:
+            card = rng.choice(cards)
+            if rng.random() < 0.5:
+                return {"type": "HINT", "from": idx, "to": to, "color": card["color"]}
+            return {"type": "HINT", "from": idx, "to": to, "number": card["number"]}
+    return {"type": "DISC", "player_idx": idx, "card_idx": rng.randrange(len(state["hands"][idx]))}
+
+
+async def bot(host: str, port: int, room, name: str, proto: str, stats: Stats, seed: int):
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        stats.failed += 1
+        return
+    join = {"type": "JOIN", "player": name, "room": room}
+    if proto == BINARY:
+        join["proto"] = BINARY
+    writer.write(encode_json(join))
+    idx, state, wire = None, None, JSON
+    sent_at, waiting_for = 0.0, None
+
+    def send(msg):
+        writer.write(encode_frame(msg) if wire == BINARY else encode_json(msg))
+
+    try:
+        while True:
+            if wire == BINARY:
+                msg = await read_frame_async(reader)
+            else:
+                line = await reader.readline()
+                msg = json.loads(line) if line else None
+            if msg is None:
+                if state is None or not game_over(state):
+                    stats.failed += 1
+                break
+            kind = msg["type"]
+            if kind == "ASSIGN_IDX":
+                if idx is None: # later ones only move the seat (lobby reshuffle, resumed game)
+                    wire = msg.get("proto", JSON)
+                    stats.connect.append(time.perf_counter() - t0)
+                idx = msg["idx"]
+                continue
+            if kind == "ERROR":
+                stats.errors += 1
+                if idx is None:
+                    break
+                waiting_for = None
+                if state is not None and state["current_turn"] == idx:
+                    # rejected move, fall back to something that is always legal
+                    send({"type": "DISC", "player_idx": idx, "card_idx": 0})
+                    stats.moves += 1
+                    sent_at, waiting_for = time.perf_counter(), state["version"] + 1
+                continue
+            if kind == "STATE":
+                state = msg
+            elif kind == "DELTA" and state is not None:
+                try:
+                    apply_delta(state, msg)
+                except StaleDelta:
+                    state = None
+                    send({"type": "RESYNC"})
+                    continue
+            if state is None:
+                continue
+            if waiting_for is not None and state["version"] >= waiting_for:
+                stats.latencies.append(time.perf_counter() - sent_at)
+                waiting_for = None
+            if game_over(state):
+                if idx == 0:
+                    stats.games += 1
+                break
+            if state["current_turn"] == idx and waiting_for is None:
+                send(choose_move(state, idx, rng))
+                stats.moves += 1
+                sent_at, waiting_for = time.perf_counter(), state["version"] + 1
+    except (ConnectionError, asyncio.IncompleteReadError):
+        stats.failed += 1
+    finally:
+        writer.close()
+
+
+async def run(rooms: int, players: int, host: str = HOST, port: int = PORT, proto: str = JSON,
+              spawn: bool = False, redis: str = "none") -> dict:
+    ''' play one game in each of `rooms` rooms. spawn starts a HanabiServer in this process on
+    `port`, with no persistence (redis="none") or the ActionLog on an in-memory fakeredis ("fake") '''
+    srv = None
+    if spawn:
+        from server.server import HanabiServer
+        r = None
+        if redis == "fake":
+            import fakeredis
+            r = fakeredis.FakeAsyncRedis(decode_responses=True, max_connections=2 ** 20)
+        server = HanabiServer(lobby_size=players, r=r, max_rooms=rooms)
+        srv = await asyncio.start_server(server.handle_client, host, port, backlog=4096)
+        port = srv.sockets[0].getsockname()[1] # port=0 picks a free one
+    stats = Stats()
+    t0 = time.perf_counter()
+    tasks = []
+    for room in range(rooms):
+        for seat in range(players):
+            tasks.append(asyncio.create_task(
+                bot(host, port, f"load-{room}", f"bot{seat}", proto, stats, room * 8 + seat)))
+        await asyncio.sleep(0) # let the accept loop keep up with the connection burst
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t0
+    if srv is not None:
+        srv.close()
+        # let the server side of the closed connections finish before the loop goes away
+        handlers = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        if handlers:
+            await asyncio.wait(handlers, timeout=5)
+    result = stats.report(elapsed)
+    result["elapsed_s"] = elapsed
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hanabi server load generator")
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--players", type=int, default=2)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--proto", choices=[JSON, BINARY], default=JSON)
+    parser.add_argument("--spawn", action="store_true", help="run the server in this process")
+    parser.add_argument("--redis", choices=["none", "fake"], default="none",
+                        help="persistence of the spawned server")
+    args = parser.parse_args()
+    result = asyncio.run(run(args.rooms, args.players, args.host, args.port, args.proto,
+                             args.spawn, args.redis))
+    for key, value in result.items():
+        print(f"{key:20s} {value:,.3f}" if isinstance(value, float) else f"{key:20s} {value:,}")
+
+
+if __name__ == "__main__":
+    main()
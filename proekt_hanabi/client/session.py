@@ -0,0 +1,238 @@
+import asyncio, json, os, random
+from collections import namedtuple
+from game_logic.delta import apply_delta, StaleDelta
+from game_logic.protocol import JSON, BINARY, ZLIB, encode_json, encode_frame, read_frame_async
+from game_logic.state import game_ended
+'''
+Asyncio connection layer for anything that plays: the CLI (client/client.py), bots, load tools.
+
+    session = Session("alice", room="t1")
+    await session.start()
+    async for event in session.events():
+        if isinstance(event, Update) and event.state["current_turn"] == session.idx:
+            session.submit({"type": "DISC", "player_idx": session.idx, "card_idx": 0})
+
+Server messages arrive as typed events: Assigned (ASSIGN_IDX), Update (STATE / DELTA) and
+ServerError (ERROR), plus Reconnecting and Closed for the connection itself. submit() never
+blocks: moves go to a queue that the writer task drains, every message queued meanwhile in one
+write. With cache=True (the default) the session keeps the game patched from DELTAs (and asks
+for RESYNC when one is missed), each Update carries the whole state and the top-level keys that
+changed, so a renderer redraws only those; with cache=False no state is kept, Update.state is
+always None and Update.msg is the raw STATE / DELTA (the session still tracks version, board,
+misfires and deck count, enough for `finished`).
+
+A dropped connection is retried with exponential backoff. The JOIN then names the room and the
+game id, so the server puts the player back on the seat of the running game, or, if the table
+closed meanwhile, resumes the game from Redis once everyone is back. REDIRECTs of a cluster are
+followed without backoff. Moves submitted while disconnected are sent after the reconnect.
+'''
+HOST = os.getenv("HANABI_HOST", '0.0.0.0')
+PORT = int(os.getenv("HANABI_PORT", "12345")) # any node of a cluster, it redirects as needed
+BACKOFF_MIN, BACKOFF_MAX = 0.05, 5.0
+RETRIES = 20 # failed connection attempts in a row before the session gives up
+
+Assigned = namedtuple("Assigned", "idx room")            # seat and room given by the server
+Update = namedtuple("Update", "state msg changed")       # state None with cache=False; changed: top-level
+                                                         # state keys, all on a STATE
+ServerError = namedtuple("ServerError", "msg")
+Reconnecting = namedtuple("Reconnecting", "attempt delay reason")
+Closed = namedtuple("Closed", "reason")                  # last event of a session
+
+# DELTA field -> state key it changes
+DELTA_KEYS = {"tower": "board", "discard": "discards", "hints": "hands", "slot": "hands", "tokens": "tokens",
+              "misfires": "misfires", "deck_count": "deck_count", "current_turn": "current_turn",
+              "version": "version"}
+
+
+def game_over(state: dict) -> bool:
+    ''' GameState.check_end on a serialized state (or the progress of a session without cache) '''
+    return game_ended(state["misfires"], sum(state["board"].values()), state["deck_count"])
+
+
+class Session():
+    def __init__(self, name: str, host: str = HOST, port: int = PORT, room=None, game_id: str = None,
+                 proto: str = JSON, compress: bool = False, cache: bool = True, reconnect: bool = True,
+                 retries: int = RETRIES):
+        self.name = name
+        self.host, self.port = host, port
+        self.room = room         # from ASSIGN_IDX once seated, so a reconnect finds the table again
+        self.game_id = game_id   # resume this game; set from the first STATE
+        self.proto = proto       # asked for in JOIN
+        self.compress = compress
+        self.cache = cache
+        self.reconnect = reconnect
+        self.retries = retries
+        self.idx = None
+        self.state = None        # local copy of the game (cache=True)
+        self.version = None      # last version seen, also without the cache
+        self.progress = None     # board / misfires / deck_count of the game, for `finished` without the cache
+        self.finished = False
+        self.reconnects = 0
+        self.outbox = asyncio.Queue()
+        self.queue = asyncio.Queue() # events
+        self.task = None
+        self.writer = None
+        self.closing = False
+
+    async def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def submit(self, msg: dict):
+        ''' queue a PLAY / HINT / DISC (or any) message, sent as soon as the connection can take it '''
+        self.outbox.put_nowait(msg)
+
+    async def next_event(self):
+        return await self.queue.get()
+
+    async def events(self):
+        ''' every event up to and including Closed '''
+        while True:
+            event = await self.queue.get()
+            yield event
+            if isinstance(event, Closed):
+                return
+
+    async def close(self):
+        self.closing = True
+        if self.writer is not None:
+            self.writer.close()
+        if self.task is not None:
+            await self.task
+
+    def drop(self):
+        ''' abort the connection as a network failure would (tests, load tools) '''
+        if self.writer is not None:
+            self.writer.transport.abort()
+
+    def _join(self) -> dict:
+        join = {"type": "JOIN", "player": self.name}
+        if self.room is not None:
+            join["room"] = self.room
+        if self.game_id is not None:
+            join["game_id"] = self.game_id
+        if self.proto == BINARY:
+            join["proto"] = BINARY
+            if self.compress:
+                join["compress"] = ZLIB
+        return join
+
+    async def _run(self):
+        host, port = self.host, self.port
+        routed, attempt, reason = False, 0, None
+        while not self.closing:
+            try:
+                reader, self.writer = await asyncio.open_connection(host, port)
+                join = self._join()
+                if routed:
+                    join["routed"] = True
+                self.writer.write(encode_json(join))
+                outcome = await self._session(reader, self.writer)
+                if isinstance(outcome, tuple): # REDIRECT, go there right away
+                    host, port = outcome
+                    routed = True
+                    continue
+                if outcome == "seated":
+                    attempt = 0
+                reason = outcome
+            except (OSError, asyncio.IncompleteReadError) as e:
+                reason = str(e) or type(e).__name__
+            finally:
+                if self.writer is not None:
+                    self.writer.close()
+            if self.closing or self.finished or not self.reconnect or reason == "refused":
+                break
+            attempt += 1
+            if attempt > self.retries:
+                break
+            # jittered, so a restarted server is not hit by every client at once
+            delay = min(BACKOFF_MAX, BACKOFF_MIN * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            self.queue.put_nowait(Reconnecting(attempt, delay, reason))
+            await asyncio.sleep(delay)
+            host, port, routed = self.host, self.port, False
+            self.reconnects += 1
+        self.queue.put_nowait(Closed("finished" if self.finished else reason or "closed"))
+
+    async def _session(self, reader, writer):
+        ''' one connection: returns (host, port) on REDIRECT, "refused" if the server will not seat
+        us and there is nothing to resume, else why it ended ("seated" = it ran, then dropped) '''
+        wire, pump, seated = JSON, None, False
+        try:
+            while True:
+                if wire == BINARY:
+                    msg = await read_frame_async(reader)
+                else:
+                    line = await reader.readline()
+                    msg = json.loads(line) if line else None
+                if msg is None:
+                    return "seated" if seated else "closed by server"
+                kind = msg.get("type")
+                if kind == "REDIRECT":
+                    return msg["host"], msg["port"]
+                if kind == "ASSIGN_IDX":
+                    self.idx = msg["idx"]
+                    self.room = msg.get("room", self.room)
+                    if not seated:
+                        seated = True
+                        wire = msg.get("proto", JSON)
+                        compress = msg.get("compress") == ZLIB
+                        pump = asyncio.get_running_loop().create_task(self._pump(writer, wire, compress))
+                    self.queue.put_nowait(Assigned(self.idx, self.room))
+                elif kind == "ERROR":
+                    self.queue.put_nowait(ServerError(msg.get("msg")))
+                    if not seated:
+                        # a resume may race the server noticing our old connection died, retry
+                        return "rejected" if self.game_id is not None else "refused"
+                elif kind == "STATE":
+                    self.game_id = msg.get("game_id", self.game_id)
+                    self.version = msg.get("version")
+                    self.state = msg if self.cache else None
+                    self.progress = {"board": dict(msg["board"]), "misfires": msg["misfires"],
+                                     "deck_count": msg["deck_count"]}
+                    self.finished = game_over(msg)
+                    self.queue.put_nowait(Update(self.state, msg, frozenset(msg)))
+                elif kind == "DELTA":
+                    self._delta(msg, writer, wire)
+        finally:
+            if pump is not None:
+                pump.cancel()
+
+    def _delta(self, msg: dict, writer, wire: str):
+        if not self.cache:
+            self.version = msg["version"]
+            if self.progress is not None:
+                if "tower" in msg:
+                    color, height = msg["tower"]
+                    self.progress["board"][color] = height
+                for key in ("misfires", "deck_count"):
+                    if key in msg:
+                        self.progress[key] = msg[key]
+                self.finished = game_over(self.progress)
+            self.queue.put_nowait(Update(None, msg, frozenset(DELTA_KEYS[k] for k in msg if k in DELTA_KEYS)))
+            return
+        if self.state is None:
+            return # waiting for the RESYNC snapshot
+        try:
+            apply_delta(self.state, msg)
+        except StaleDelta:
+            self.state = None
+            writer.write(encode_frame({"type": "RESYNC"}) if wire == BINARY else encode_json({"type": "RESYNC"}))
+            return
+        self.version = msg["version"]
+        self.finished = game_over(self.state)
+        self.queue.put_nowait(Update(self.state, msg, frozenset(DELTA_KEYS[k] for k in msg if k in DELTA_KEYS)))
+
+    async def _pump(self, writer, wire: str, compress: bool):
+        ''' writer task: drains the outbox, everything queued so far in one write '''
+        while True:
+            msg = await self.outbox.get()
+            batch = [msg]
+            while not self.outbox.empty():
+                batch.append(self.outbox.get_nowait())
+            if wire == BINARY:
+                writer.write(b"".join(encode_frame(m, compress) for m in batch))
+            else:
+                writer.write(b"".join(encode_json(m) for m in batch))
+            try:
+                await writer.drain()
+            except ConnectionError:
+                return
@@ -0,0 +1,12 @@
+import asyncio
+import pytest
+from client.loadgen import run
+
+
+@pytest.mark.parametrize("proto", ["json", "bin"])
+def test_bots_finish_every_game_against_a_spawned_server(proto):
+    result = asyncio.run(run(rooms=10, players=3, port=0,
+                             proto=proto, spawn=True))
+    assert result["games_finished"] == 10
+    assert result["errors"] == 0 and result["failed_connections"] == 0
+    assert result["moves"] > 0 and result["latency_p99_ms"] >= result["latency_p50_ms"] > 0
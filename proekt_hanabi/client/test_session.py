@@ -0,0 +1,149 @@
+import asyncio, random
+import pytest
+from client.loadgen import choose_move
+from client.session import Session, Assigned, Update, ServerError, Reconnecting, Closed
+from game_logic.protocol import encode_json
+from game_logic.state import GameState
+from server.server import HanabiServer
+from server.eventlog import meta_key, IDLE_TTL
+from server.store import MemoryStore
+from server.sqlstore import SQLiteStore
+from server.writebehind import WriteBehind
+
+HOST = '127.0.0.1'
+
+
+async def start(server):
+    srv = await asyncio.start_server(server.handle_client, HOST, 0)
+    return srv, srv.sockets[0].getsockname()[1]
+
+
+async def play(session, seed, drop_at=None, stop_at=None):
+    ''' bot on top of a session: every event seen, until Closed '''
+    rng = random.Random(seed)
+    seen = []
+    await session.start()
+    async for event in session.events():
+        seen.append(event)
+        if isinstance(event, Update):
+            state = event.state
+            if session.finished or (stop_at is not None and state["version"] >= stop_at):
+                await session.close()
+            elif drop_at is not None and state["version"] >= drop_at:
+                drop_at = None
+                session.drop()
+            elif state["current_turn"] == session.idx:
+                session.submit(choose_move(state, session.idx, rng))
+        elif isinstance(event, ServerError) and session.state and session.state["current_turn"] == session.idx:
+            session.submit({"type": "DISC", "player_idx": session.idx, "card_idx": 0})
+    return seen
+
+
+@pytest.mark.parametrize("proto", ["json", "bin"])
+def test_dropped_session_resumes_its_seat_and_finishes(proto):
+    async def scenario():
+        server = HanabiServer(lobby_size=3)
+        srv, port = await start(server)
+        sessions = [Session(f"P{i}", HOST, port, room="t", proto=proto) for i in range(3)]
+        runs = [play(s, i, drop_at=5 if i == 1 else None) for i, s in enumerate(sessions)]
+        events = await asyncio.wait_for(asyncio.gather(*runs), 20)
+        assert sessions[1].reconnects >= 1 and any(isinstance(e, Reconnecting) for e in events[1])
+        assert [e.idx for e in events[1] if isinstance(e, Assigned)] == [1] * (1 + sessions[1].reconnects)
+        assert all(s.finished for s in sessions)
+        assert len({s.game_id for s in sessions}) == 1
+        final = [s.state for s in sessions]
+        assert final[0]["board"] == final[1]["board"] == final[2]["board"]
+        assert final[0]["version"] == final[1]["version"] == final[2]["version"]
+        assert all(isinstance(e[-1], Closed) and e[-1].reason == "finished" for e in events)
+        # after the first full STATE, updates name only what changed
+        updates = [e for e in events[0] if isinstance(e, Update)]
+        assert "game_id" in updates[0].changed
+        assert all("current_turn" in u.changed and "game_id" not in u.changed for u in updates[1:])
+        srv.close()
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("backend", ["redis", "memory", "sqlite"])
+def test_whole_table_comes_back_from_the_store_in_any_order(backend, tmp_path):
+    async def scenario():
+        if backend == "redis":
+            fakeredis = pytest.importorskip("fakeredis")
+            store = WriteBehind(fakeredis.FakeAsyncRedis(decode_responses=True))
+        else:
+            store = MemoryStore() if backend == "memory" else SQLiteStore(str(tmp_path / "games.db"))
+        server = HanabiServer(lobby_size=2, store=store)
+        srv, port = await start(server)
+        first = [Session(f"P{i}", HOST, port, room="t") for i in range(2)]
+        await asyncio.wait_for(asyncio.gather(*(play(s, i, stop_at=6) for i, s in enumerate(first))), 10)
+        while server.rooms:
+            await asyncio.sleep(0.01)
+        game_id = first[0].game_id
+        if backend == "redis": # the emptied table's game may expire now, unless resumed
+            await store.flush()
+            assert 0 < await store.log.r.ttl(meta_key(game_id)) <= IDLE_TTL
+        # the players come back in the other order, each gets its old seat
+        second = [Session(f"P{i}", HOST, port, room="t", game_id=game_id) for i in (1, 0)]
+        runs = [asyncio.create_task(play(s, i)) for i, s in enumerate(second)]
+        events = await asyncio.wait_for(asyncio.gather(*runs), 20)
+        assert [second[0].idx, second[1].idx] == [1, 0]
+        assert second[0].game_id == second[1].game_id == game_id
+        state = next(e.state for e in events[0] if isinstance(e, Update))
+        assert state["version"] >= 6 and all(s.finished for s in second)
+        srv.close()
+        await server.store.close()
+    asyncio.run(scenario())
+
+
+def test_pipelined_moves_and_non_cached_updates():
+    async def scenario():
+        server = HanabiServer(lobby_size=2)
+        srv, port = await start(server)
+        a, b = Session("A", HOST, port, room="q", cache=False), Session("B", HOST, port, room="q")
+        await a.start()
+        assert await asyncio.wait_for(a.next_event(), 2) == Assigned(0, "q")
+        await b.start()
+        event = await asyncio.wait_for(a.next_event(), 2)
+        assert event.msg["type"] == "STATE" and event.state is None
+        # both go out in one write, the second one is no longer A's turn
+        a.submit({"type": "DISC", "player_idx": 0, "card_idx": 0})
+        a.submit({"type": "DISC", "player_idx": 0, "card_idx": 0})
+        delta = await asyncio.wait_for(a.next_event(), 2)
+        assert delta.state is None and delta.msg["type"] == "DELTA"
+        assert {"discards", "hands", "tokens", "current_turn", "version"} <= delta.changed
+        assert await asyncio.wait_for(a.next_event(), 2) == ServerError("Not your turn")
+        assert a.state is None and a.version == 1
+        await a.close()
+        await b.close()
+        assert isinstance(await a.next_event(), Closed)
+        srv.close()
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("cache", [True, False])
+def test_perfect_score_finishes_the_session(cache):
+    async def scenario():
+        state = {"type": "STATE", **GameState(["A", "B"], game_id="g25", seed=1).serialize_state()}
+        state["board"] = {color: 5 for color in state["board"]}
+        state["board"]["RED"], state["version"] = 4, 40
+        async def table(reader, writer):
+            await reader.readline()
+            writer.write(encode_json({"type": "ASSIGN_IDX", "idx": 0, "room": "r"}))
+            writer.write(encode_json(state))
+            writer.write(encode_json({"type": "DELTA", "version": 41, "current_turn": 1, "tower": ["RED", 5]}))
+            await reader.read() # the server keeps the connection open, the finished session leaves
+        srv = await asyncio.start_server(table, HOST, 0)
+        session = Session("A", HOST, srv.sockets[0].getsockname()[1], cache=cache)
+        await session.start()
+        async def follow():
+            seen = []
+            async for event in session.events():
+                seen.append(event)
+                if isinstance(event, Update) and session.finished:
+                    await session.close()
+            return seen
+        events = await asyncio.wait_for(follow(), 2)
+        first, last = (event for event in events if isinstance(event, Update))
+        assert (first.state is first.msg) if cache else (first.state is None and last.state is None)
+        assert session.finished and events[-1] == Closed("finished")
+        srv.close()
+    asyncio.run(scenario())
@@ -0,0 +1 @@
+# makes `game_logic`, `server` and `client` importable when pytest runs from this directory
@@ -0,0 +1,53 @@
+from game_logic.cards import Color
+'''
+Compact action codec. One move is a tuple and a 3-4 character string on disk / in Redis:
+    ("P", player, card_idx)    <-> "P02"   play
+    ("D", player, card_idx)    <-> "D13"   discard
+    ("H", from, to, Color.RED) <-> "H01R"  color hint
+    ("H", from, to, 3)         <-> "H013"  number hint
+A game is fully described by its seed and the list of its encoded actions.
+'''
+PLAY, DISC, HINT = "P", "D", "H"
+COLOR_CODES = {c: c.name[0] for c in Color}  # RED -> 'R' ...
+CODE_COLORS = {v: k for k, v in COLOR_CODES.items()}
+
+
+def encode_action(action: tuple) -> str:
+    if action[0] == HINT:
+        _, frm, to, value = action
+        return f"H{frm}{to}{COLOR_CODES[value] if isinstance(value, Color) else value}"
+    kind, player, card_idx = action
+    return f"{kind}{player}{card_idx}"
+
+
+def decode_action(code: str) -> tuple:
+    if code[0] == HINT:
+        value = code[3]
+        return (HINT, int(code[1]), int(code[2]), CODE_COLORS[value] if value in CODE_COLORS else int(value))
+    return (code[0], int(code[1]), int(code[2]))
+
+
+def action_from_msg(msg: dict):
+    ''' PLAY / DISC / HINT wire message -> action tuple, None for anything else '''
+    kind = msg.get("type")
+    if kind == "PLAY":
+        return (PLAY, msg["player_idx"], msg["card_idx"])
+    if kind == "DISC":
+        return (DISC, msg["player_idx"], msg["card_idx"])
+    if kind == "HINT":
+        if "color" in msg:
+            return (HINT, msg["from"], msg["to"], Color[msg["color"]])
+        if "number" in msg:
+            return (HINT, msg["from"], msg["to"], msg["number"])
+    return None
+
+
+def apply_action(gs, action: tuple):
+    if action[0] == PLAY:
+        return gs.play_card(action[1], action[2])
+    if action[0] == DISC:
+        return gs.discard(action[1], action[2])
+    _, frm, to, value = action
+    if isinstance(value, Color):
+        return gs.give_hint(frm, to, color=value)
+    return gs.give_hint(frm, to, number=value)
@@ -0,0 +1,165 @@
+import numpy as np
+import random
+from game_logic.cards import Color, Deck, EMPTY
+from game_logic.state import COLOR_HINTS, RANK_HINTS
+'''
+K games as stacked NumPy arrays, for policy evaluation at scale (needs numpy, the server does not).
+step() applies one action per game to all K games at once with exactly the rules of
+GameState.play_card / give_hint / discard / check_end; test_batch.py replays the same seeds through
+both engines and compares them field by field.
+
+Actions are three int arrays of length K:
+    kind    PLAY / DISC / HINT / NOOP (NOOP for games that should sit this step out)
+    arg     card slot for PLAY / DISC, target player for HINT
+    value   HINT only: 0-4 = Color(value), 5-9 = number value - 4
+'''
+PLAY, DISC, HINT, NOOP = 0, 1, 2, 3
+
+
+class BatchGameState():
+    def __init__(self, num_players: int, seeds):
+        seeds = list(seeds)
+        K, P = len(seeds), num_players
+        H = 4 if P >= 4 else 5
+        self.seeds = seeds
+        self.num_players, self.hand_size = P, H
+        # same shuffle as GameState: one random.Random(seed) per game, draw from the end
+        decks = np.empty((K, 50), dtype=np.uint8)
+        for k, seed in enumerate(seeds):
+            deck = Deck()
+            deck.shuffle(random.Random(seed))
+            decks[k] = deck.cards
+        self.decks = decks
+        self.deck_count = np.full(K, 50, dtype=np.int16)
+        self.hands = np.empty((K, P, H), dtype=np.uint8)
+        for p in range(P):
+            for i in range(H):
+                self.deck_count -= 1
+                self.hands[:, p, i] = decks[:, 50 - 1 - (p * H + i)]
+        self.color_hints = np.zeros((K, P, H), dtype=np.uint8)
+        self.rank_hints = np.zeros((K, P, H), dtype=np.uint8)
+        self.board = np.zeros((K, 5), dtype=np.int8)
+        self.tokens = np.full(K, 8, dtype=np.int16)
+        self.misfires = np.zeros(K, dtype=np.int8)
+        self.discards = np.full((K, 50), EMPTY, dtype=np.uint8)
+        self.discard_count = np.zeros(K, dtype=np.int16)
+        self.current_turn = np.zeros(K, dtype=np.int8)
+        self.version = np.zeros(K, dtype=np.int32)
+        self.rows = np.arange(K)
+
+    def __len__(self):
+        return len(self.seeds)
+
+    def check_end(self):
+        ''' bool per game, same conditions as GameState.check_end '''
+        return (self.misfires >= 3) | (self.board >= 5).all(axis=1) | (self.deck_count == 0)
+
+    def _draw(self, rows):
+        ''' top card of each listed deck, EMPTY where the deck is gone '''
+        count = self.deck_count[rows]
+        has = count > 0
+        codes = np.full(len(rows), EMPTY, dtype=np.uint8)
+        codes[has] = self.decks[rows[has], count[has] - 1]
+        self.deck_count[rows] = count - has
+        return codes
+
+    def _discard(self, rows, codes):
+        self.discards[rows, self.discard_count[rows]] = codes
+        self.discard_count[rows] += 1
+
+    def step(self, kind, arg, value=None):
+        ''' apply one action per game, by the player whose turn it is. returns bool array, True
+        where a PLAY succeeded. Every row is checked before any game changes, so a step that
+        raises leaves the batch as it was '''
+        kind = np.asarray(kind)
+        arg = np.asarray(arg)
+        player = self.current_turn.astype(np.intp)
+        success = np.zeros(len(self), dtype=bool)
+        moves = self.rows[(kind == PLAY) | (kind == DISC)]
+        hints = self.rows[kind == HINT]
+        # read everything first: a bad slot, target or missing token raises here
+        if len(moves):
+            p, s = player[moves], arg[moves]
+            codes = self.hands[moves, p, s]
+            if (codes == EMPTY).any():
+                raise IndexError("No card in that slot")
+        if len(hints):
+            if (self.tokens[hints] == 0).any():
+                raise RuntimeError("No hint tokens left")
+            to, val = arg[hints], np.asarray(value)[hints]
+            hands = self.hands[hints, to]
+
+        rows = moves
+        if len(rows):
+            colors = codes // 5
+            ok = (kind[rows] == PLAY) & (self.board[rows, colors] == codes % 5)
+            self.board[rows[ok], colors[ok]] += 1
+            success[rows[ok]] = True
+            lost = ~ok
+            self._discard(rows[lost], codes[lost])
+            misfire = rows[lost & (kind[rows] == PLAY)]
+            self.misfires[misfire] += 1
+            self.tokens[rows[kind[rows] == DISC]] += 1
+            self.color_hints[rows, p, s] = 0
+            self.rank_hints[rows, p, s] = 0
+            self.hands[rows, p, s] = self._draw(rows)
+
+        rows = hints
+        if len(rows):
+            present = hands != EMPTY
+            is_color = (val < 5)[:, None]
+            color_match = present & is_color & (hands // 5 == val[:, None])
+            rank_match = present & ~is_color & (hands % 5 == (val - 5)[:, None])
+            bit = (1 << np.where(val < 5, val, val - 5)).astype(np.uint8)[:, None]
+            self.color_hints[rows, to] |= np.where(color_match, bit, 0).astype(np.uint8)
+            self.rank_hints[rows, to] |= np.where(rank_match, bit, 0).astype(np.uint8)
+            self.tokens[rows] -= 1
+
+        acted = self.rows[kind != NOOP]
+        self.current_turn[acted] = (self.current_turn[acted] + 1) % self.num_players
+        self.version[acted] += 1
+        return success
+
+    def random_actions(self, rng):
+        ''' uniformly random moves (like sim.RandomAgent), NOOP for finished games '''
+        K = len(self)
+        kind = rng.integers(0, 3, K)
+        kind[(kind == HINT) & (self.tokens == 0)] = DISC
+        arg = rng.integers(0, self.hand_size, K)
+        hint = kind == HINT
+        offset = rng.integers(1, self.num_players, K)
+        arg[hint] = ((self.current_turn + offset) % self.num_players)[hint]
+        value = rng.integers(0, 10, K)
+        kind[self.check_end()] = NOOP
+        return kind, arg, value
+
+    def score(self):
+        return self.board.sum(axis=1)
+
+    def checkpoint(self, k: int, game_id: str = None) -> dict:
+        ''' game k in the exact form of GameState.checkpoint(), for conformance checks '''
+        def card(code):
+            if code == EMPTY:
+                return {"number": None, "color": None}
+            return {"number": int(code) % 5 + 1, "color": Color(int(code) // 5).name}
+        deck_count = int(self.deck_count[k])
+        return {
+            "game_id":    game_id if game_id is not None else str(self.seeds[k]),
+            "player_names": [f"bot{i}" for i in range(self.num_players)],
+            "board":      {c.name: int(self.board[k, c.value]) for c in Color},
+            "tokens":     int(self.tokens[k]),
+            "misfires":   int(self.misfires[k]),
+            "deck_count": deck_count,
+            "discards":   [card(c) for c in self.discards[k, :self.discard_count[k]]],
+            "hands":      [
+                [
+                    dict(card(code), hints=list(COLOR_HINTS[self.color_hints[k, p, i]] + RANK_HINTS[self.rank_hints[k, p, i]]))
+                    for i, code in enumerate(self.hands[k, p])
+                ]
+                for p in range(self.num_players)
+            ],
+            "current_turn": int(self.current_turn[k]),
+            "version":    int(self.version[k]),
+            "seed":       self.seeds[k],
+            "deck":       [int(c) for c in self.decks[k, :deck_count]],
+        }
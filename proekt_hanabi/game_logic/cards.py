@@ -1,4 +1,5 @@
 import random
+from array import array
 from enum import Enum
 # 1 -> 3
 # 2 -> 2
@@ -8,40 +9,99 @@ from enum import Enum
 
 class Color(Enum):
     RED, YELLOW, GREEN, BLUE, WHITE = range(5)
+
+# a card is one of 25 values, code = color * 5 + (number - 1). Decks and hands only hold codes,
+# Card objects are interned singletons looked up in CARDS, never allocated per game.
+EMPTY = 255 # code of an empty hand slot (deck ran out)
+
+def card_code(number: int, color) -> int:
+    return color.value * 5 + number - 1
+
 class Card():
-    def __init__(self,number:int,color):
-        self.number = number
-        self.color = color
-    def __repr__(self): # returns printable representation of the card 
+    __slots__ = ("number", "color", "code")
+    def __new__(cls, number: int, color):
+        if not isinstance(color, Color) or number not in (1, 2, 3, 4, 5):
+            raise ValueError(f"No such card: {number} {color}")
+        return CARDS[card_code(number, color)] # Card(1, Color.RED) is CARDS[0]
+    def __reduce__(self): # pickle / deepcopy keep the singleton
+        return (card_from_code, (self.code,))
+    def __repr__(self): # returns printable representation of the card
         return f"Card({self.number}, {self.color.name})"
+
+def _make_card(code: int) -> Card:
+    card = object.__new__(Card)
+    card.number, card.color, card.code = code % 5 + 1, Color(code // 5), code
+    return card
+
+CARDS = tuple(_make_card(code) for code in range(25))
+CARD_NUMBER = tuple(c.number for c in CARDS)
+CARD_COLOR = tuple(c.color for c in CARDS)
+
+def card_from_code(code: int):
+    return None if code == EMPTY else CARDS[code]
+
+# counts: 1→3, 2→2, 3→2, 4→2, 5→1
+COUNTS = {1:3, 2:2, 3:2, 4:2, 5:1}
+FULL_DECK = array('B', [
+    card_code(num, col)
+    for num, cnt in COUNTS.items()
+    for col in Color
+    for _ in range(cnt)
+]) # codes of each number and color, copied into every new Deck
+
 class Deck:
     def __init__(self):
-        # counts: 1→3, 2→2, 3→2, 4→2, 5→1
-        counts = {1:3, 2:2, 3:2, 4:2, 5:1}
-        self.cards = [
-            Card(num, col)
-            for num, cnt in counts.items()
-            for col in Color
-            for _ in range(cnt)
-        ] # list of cards in each number and color 
-        self.deck_count = 50 # 5 suits with 10 cards each 
-
-    def shuffle(self):
-        random.shuffle(self.cards)
+        self.cards = array('B', FULL_DECK) # card codes, top of the deck is the end
+        self.deck_count = 50 # 5 suits with 10 cards each
+
+    def shuffle(self, rng=random):
+        rng.shuffle(self.cards) # pass a seeded random.Random to get a reproducible deal
 
     def draw(self):
         if self.cards:
             self.deck_count -= 1
-            return self.cards.pop() 
-        else: 
+            return CARDS[self.cards.pop()]
+        else:
             return None # returns the top card if such exists
+    def draw_code(self) -> int:
+        ''' draw() without leaving the code representation, EMPTY once the deck is gone '''
+        if self.cards:
+            self.deck_count -= 1
+            return self.cards.pop()
+        return EMPTY
     def get_deck_count(self):
         return self.deck_count
-# 5 cards to 2 or 3 players 
-# 4 cards to 4 or 5 players 
+    def copy(self):
+        deck = object.__new__(Deck)
+        deck.cards = array('B', self.cards)
+        deck.deck_count = self.deck_count
+        return deck
+
+class Hand():
+    ''' array-backed hand: one byte card code per slot, indexing returns the interned Card '''
+    __slots__ = ("codes",)
+    def __init__(self, cards):
+        self.codes = array('B', [EMPTY if c is None else c.code for c in cards])
+    def __len__(self):
+        return len(self.codes)
+    def __getitem__(self, idx: int):
+        code = self.codes[idx]
+        return None if code == EMPTY else CARDS[code]
+    def __setitem__(self, idx: int, card):
+        self.codes[idx] = EMPTY if card is None else card.code
+    def __iter__(self):
+        return (None if code == EMPTY else CARDS[code] for code in self.codes)
+    def __repr__(self):
+        return f"Hand({list(self)})"
+    def copy(self):
+        hand = object.__new__(Hand)
+        hand.codes = array('B', self.codes)
+        return hand
+# 5 cards to 2 or 3 players
+# 4 cards to 4 or 5 players
 
 # broadcast game state to all players and then the client of the player "censors" the players own cards
-# or broadcast separately without his own cards 
-# player info sent with each mess on his own cards : card idx 1,2,3 - know green,4 - know its a 2 
-# complete state of the game is - no cards in deck,all player cards, the 5 towers in the middle, the token state, 
+# or broadcast separately without his own cards
+# player info sent with each mess on his own cards : card idx 1,2,3 - know green,4 - know its a 2
+# complete state of the game is - no cards in deck,all player cards, the 5 towers in the middle, the token state,
 # game ends if 3 times mess up order / color , all 5 towers are made succ, or all cards played
\ No newline at end of file
@@ -0,0 +1,35 @@
+from game_logic.cards import Color
+'''
+Client side of the delta protocol. The server sends one full STATE snapshot on join / resync
+and a DELTA (see GameState.record_delta) after every action; apply_delta patches a local
+snapshot in place so nobody re-sends the growing discards and hint lists.
+'''
+HINT_ORDER = {**{c.name: c.value for c in Color}, **{str(n): 4 + n for n in range(1, 6)}}
+
+
+class StaleDelta(Exception):
+    ''' raised when a delta does not follow the local version, the client must ask for RESYNC '''
+
+
+def apply_delta(state: dict, delta: dict) -> dict:
+    ''' apply one DELTA message to a snapshot produced by GameState.serialize_state '''
+    if delta["version"] != state.get("version", 0) + 1:
+        raise StaleDelta(f"have version {state.get('version')}, got {delta['version']}")
+    if "tower" in delta:
+        color, height = delta["tower"]
+        state["board"][color] = height
+    if "discard" in delta:
+        state["discards"].append(delta["discard"])
+    for player, idx, hint in delta.get("hints", ()):
+        # hints are a set per slot, kept in the server's order: colors, then numbers
+        hints = state["hands"][player][idx]["hints"]
+        if hint not in hints:
+            hints.append(hint)
+            hints.sort(key=HINT_ORDER.__getitem__)
+    if "slot" in delta:
+        player, idx, card = delta["slot"]
+        state["hands"][player][idx] = dict(card, hints=[])
+    for key in ("tokens", "misfires", "deck_count", "current_turn", "version"):
+        if key in delta:
+            state[key] = delta[key]
+    return state
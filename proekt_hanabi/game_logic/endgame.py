@@ -0,0 +1,248 @@
+from game_logic.cards import EMPTY
+from game_logic.state import GameState
+from game_logic.actions import PLAY, DISC, HINT
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations
+import argparse, random, time
+'''
+Exact endgame search. The game ends when the deck runs out, so once few cards are left the whole
+action tree is small enough to solve:
+
+    Solver().best_move(game)          best final score and a move reaching it, for the real deck
+                                      order (post-game analysis: grade what a player did)
+    solve(game, workers=4)            expected best score per root move over the orders the
+                                      remaining deck can still come in (what a bot can act on)
+
+Both look at every hand. The search runs on a compact position holding only what can still change
+the score: (board, tokens, turn, hands as sorted card codes, deck in draw order); the discard
+pile, hint masks and slot order are dropped and children are built as plain tuples, no GameState
+apply / undo. With perfect information a hint changes nothing but the tokens and the turn, so one
+hint move stands for all of them; a misfire is a discard without the token, so only playable cards
+are played; equal cards in a hand are one move. Moves are ordered plays, hint, dead discards, other
+discards lowest number first, and a node stops at its bound: score + cards left, or what the
+towers can reach with the cards still in hands and deck if that is less.
+
+Positions are cached in a transposition table of at most `table_size` entries, oldest evicted
+first. One table serves every deck order: orders that still have the same cards to come share
+their positions. For unknown deck orders every distinct order is enumerated while there are at
+most MAX_ORDERS, otherwise `samples` random ones. Averaging perfect-information results is
+optimistic (it assumes the deck order is known when choosing later moves), fine for ranking the
+root moves. The root moves are split across processes.
+
+One process searches 40-65k nodes/s with a 15-50% table hit rate (bench/bench_endgame.py). With 7
+cards left the real order takes 3-150 ms (2-5 players) and 60 sampled orders 0.7-8 s; each extra
+card multiplies that by 5-20, so solve() is meant for the last 5-8 cards.
+'''
+TABLE_SIZE = 1 << 20 # positions, a few hundred MB at worst
+MAX_ORDERS = 720     # enumerate every order of up to 6 cards, sample beyond
+HINT_MOVE = (HINT,)  # compact moves: (PLAY, code), (DISC, code) or HINT_MOVE
+DEAD = 25            # stands for every card that can no longer score
+
+
+def position(game) -> tuple:
+    ''' the compact position of a game '''
+    return (tuple(game.board.values()), game.tokens, game.current_turn,
+            tuple(tuple(sorted(c for c in ps.hand.codes if c != EMPTY)) for ps in game.players),
+            tuple(game.deck.cards))
+
+
+def children(pos: tuple) -> list:
+    ''' [(compact move, next position)] in search order; the deck must not be empty '''
+    board, tokens, turn, hands, deck = pos
+    hand = hands[turn]
+    nxt = (turn + 1) % len(hands)
+    drawn, rest = deck[-1], deck[:-1]
+    plays, dead, live = [], [], []
+    prev = None
+    for i, code in enumerate(hand):
+        if code == prev:
+            continue
+        prev = code
+        new_hand = tuple(sorted(hand[:i] + hand[i + 1:] + (drawn,)))
+        new_hands = hands[:turn] + (new_hand,) + hands[turn + 1:]
+        discard = ((DISC, code), (board, tokens + 1, nxt, new_hands, rest))
+        if code == DEAD:
+            dead.append(discard)
+            continue
+        color, rank = divmod(code, 5) # rank = number - 1
+        top = board[color]
+        if rank == top:
+            new_board = board[:color] + (top + 1,) + board[color + 1:]
+            plays.append(((PLAY, code), (new_board, tokens, nxt, new_hands, rest)))
+        if rank < top:
+            dead.append(discard)
+        else:
+            live.append((rank, discard))
+    moves = plays
+    if tokens:
+        moves.append((HINT_MOVE, (board, tokens - 1, nxt, hands, deck)))
+    moves += dead
+    live.sort(key=lambda item: item[0]) # low numbers have spare copies
+    moves += [move for _, move in live]
+    return moves
+
+
+def action_of(game, move: tuple) -> tuple:
+    ''' compact move -> an action of the game '''
+    me = game.current_turn
+    if move == HINT_MOVE:
+        return next(action for action in game.legal_actions() if action[0] == HINT)
+    return (move[0], me, game.players[me].hand.codes.index(move[1]))
+
+
+class Solver():
+    def __init__(self, table_size: int = TABLE_SIZE):
+        self.table_size = table_size
+        self.table = {} # position -> best final score, insertion order = eviction order
+        self.nodes = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        lookups = self.nodes + self.hits
+        return {"nodes": self.nodes, "hits": self.hits, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions, "table": len(self.table)}
+
+    def value(self, pos: tuple) -> int:
+        ''' best final score reachable from a compact position '''
+        board, tokens, turn, hands, deck = pos
+        score = sum(board)
+        if not deck:
+            return score
+        cards = set(deck)
+        for hand in hands:
+            cards.update(hand)
+        live, reachable = set(), 0
+        for color, top in enumerate(board):
+            while top < 5 and color * 5 + top in cards:
+                live.add(color * 5 + top)
+                top += 1
+            reachable += top
+        bound = min(reachable, score + len(deck))
+        if score >= bound:
+            return score
+        # positions that differ only in cards that cannot score, or in tokens beyond the
+        # (players - 1) hints per remaining draw that can be of use, have the same value
+        deck = tuple(c if c in live else DEAD for c in deck)
+        hands = tuple(tuple(sorted(c if c in live else DEAD for c in hand)) for hand in hands)
+        pos = (board, min(tokens, (len(hands) - 1) * len(deck)), turn, hands, deck)
+        best = self.table.get(pos)
+        if best is not None:
+            self.hits += 1
+            return best
+        self.nodes += 1
+        best = score
+        for _, child in children(pos):
+            result = self.value(child)
+            if result > best:
+                best = result
+                if best >= bound:
+                    break
+        if len(self.table) >= self.table_size:
+            del self.table[next(iter(self.table))]
+            self.evictions += 1
+        self.table[pos] = best
+        return best
+
+    def action_values(self, game) -> dict:
+        ''' action -> best final score after it, for every legal action (misfires included) '''
+        values = {}
+        for action in game.legal_actions():
+            after = game.clone()
+            after.apply(action)
+            values[action] = after.score if after.check_end() else self.value(position(after))
+        return values
+
+    def best_move(self, game) -> tuple:
+        ''' (best final score, an action reaching it) with the game's deck order,
+        (score, None) if the game is over '''
+        if game.check_end():
+            return game.score, None
+        best, move = -1, None
+        for compact, child in children(position(game)):
+            result = self.value(child)
+            if result > best:
+                best, move = result, compact
+        return best, action_of(game, move)
+
+
+def deck_orders(cards, samples: int, rng) -> list:
+    ''' every distinct order of the remaining deck, or `samples` random ones if there are too many '''
+    cards = list(cards)
+    count = 1
+    for n in range(2, len(cards) + 1):
+        count *= n
+    if count <= MAX_ORDERS:
+        return sorted(set(permutations(cards)))
+    orders = []
+    for _ in range(samples):
+        rng.shuffle(cards)
+        orders.append(tuple(cards))
+    return orders
+
+
+def _root_value(pos: tuple, move: tuple, orders: list, table_size: int) -> tuple:
+    ''' worker: summed best score after one root move over the deck orders, plus search stats '''
+    solver = Solver(table_size)
+    total = 0
+    for order in orders:
+        child = dict(children(pos[:4] + (order,)))[move]
+        total += solver.value(child)
+    return move, total, solver.stats()
+
+
+def solve(game, samples: int = 200, workers: int = 1, seed: int = 0, table_size: int = TABLE_SIZE) -> dict:
+    ''' expected best final score of each root move over the possible deck orders.
+    workers=1 searches in this process, otherwise root moves go to a process pool '''
+    if game.check_end():
+        return {"move": None, "expected": game.score, "moves": {}, "orders": 0, "stats": {}}
+    pos = position(game)
+    orders = deck_orders(pos[4], samples, random.Random(seed))
+    moves = [move for move, _ in children(pos)]
+    args = ([pos] * len(moves), moves, [orders] * len(moves), [table_size] * len(moves))
+    if workers == 1:
+        results = list(map(_root_value, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_root_value, *args))
+    expected = {action_of(game, move): total / len(orders) for move, total, _ in results}
+    best = max(expected, key=expected.get)
+    stats = {"nodes": sum(s["nodes"] for _, _, s in results), "hits": sum(s["hits"] for _, _, s in results)}
+    stats["hit_rate"] = stats["hits"] / max(1, stats["nodes"] + stats["hits"])
+    return {"move": best, "expected": expected[best], "moves": expected, "orders": len(orders), "stats": stats}
+
+
+def endgame(num_players: int, seed: int, deck: int) -> GameState:
+    ''' a SimpleAgent game of this seed played until `deck` cards are left '''
+    from game_logic.sim import SimpleAgent
+    from game_logic.actions import apply_action
+    game = GameState([f"bot{i}" for i in range(num_players)], game_id=str(seed), seed=seed)
+    agents = [SimpleAgent(i, seed * 8 + i) for i in range(num_players)]
+    while not game.check_end() and game.deck.deck_count > deck:
+        apply_action(game, agents[game.current_turn].act(game))
+    return game
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve a Hanabi endgame")
+    parser.add_argument("--seed", type=int, default=0, help="deal to play into an endgame")
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--deck", type=int, default=6, help="cards left in the deck when solving")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    game = endgame(args.players, args.seed, args.deck)
+    t0 = time.perf_counter()
+    best = Solver().best_move(game)
+    t1 = time.perf_counter()
+    result = solve(game, args.samples, args.workers, args.seed)
+    t2 = time.perf_counter()
+    print(f"score {game.score}, deck {game.deck.deck_count}, tokens {game.tokens}")
+    print(f"real deck order: best final score {best[0]} via {best[1]} ({t1 - t0:.2f}s)")
+    print(f"over {result['orders']} orders: {result['move']} expects {result['expected']:.2f} "
+          f"({t2 - t1:.2f}s, {result['stats']})")
+
+
+if __name__ == "__main__":
+    main()
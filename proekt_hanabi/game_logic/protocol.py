@@ -0,0 +1,250 @@
+from game_logic.cards import Color, EMPTY, card_code
+from game_logic.state import COLOR_BIT, RANK_BIT, COLOR_HINTS, RANK_HINTS
+import json, struct, zlib
+'''
+Wire formats shared by server and client. The JOIN line is always JSON; a client asks for the
+binary protocol with {"proto": "bin"} (optionally "compress": "zlib") and the server confirms in its
+JSON ASSIGN_IDX line. After that both sides exchange frames:
+
+    u32 length | u8 type (bit 0x80 = zlib compressed payload) | payload
+
+encode_frame / decode_frame map the same dicts as the JSON protocol, so everything above the
+codec does not care which one a connection speaks. Cards are one byte (cards.card_code, 255 = empty
+slot), hints one byte (0-4 color, 5-9 number 1-5), hint knowledge two mask bytes per slot.
+The readers treat a peer that announces more than MAX_FRAME bytes (before or after inflating) or
+sends a frame that does not decode like one that hung up: they return None.
+'''
+JSON, BINARY = "json", "bin"
+ZLIB = "zlib"
+COMPRESS_MIN = 256 # smaller payloads (deltas, moves) are not worth compressing
+MAX_FRAME = 64 * 1024 # payload bytes, a 5 player STATE is well under 1 KiB
+
+HEADER = struct.Struct(">IB")
+T_ASSIGN, T_STATE, T_DELTA, T_ERROR, T_PLAY, T_DISC, T_HINT, T_RESYNC = range(1, 9)
+COMPRESSED = 0x80
+COLOR_NAMES = tuple(c.name for c in Color)
+# DELTA presence flags
+F_TOWER, F_DISCARD, F_MISFIRES, F_TOKENS, F_DECK, F_SLOT, F_HINTS = (1 << i for i in range(7))
+
+
+def encode_json(msg: dict) -> bytes:
+    return (json.dumps(msg) + "\n").encode()
+
+
+def _code(card: dict) -> int:
+    return EMPTY if card["number"] is None else card_code(card["number"], Color[card["color"]])
+
+_WIRE_CARDS = tuple((code % 5 + 1, Color(code // 5).name) for code in range(25))
+
+def _card(code: int) -> dict:
+    if code == EMPTY:
+        return {"number": None, "color": None}
+    number, color = _WIRE_CARDS[code]
+    return {"number": number, "color": color}
+
+def _hint_byte(hint: str) -> int:
+    return Color[hint].value if hint in COLOR_BIT else 4 + int(hint)
+
+def _hint_str(b: int) -> str:
+    return Color(b).name if b < 5 else str(b - 4)
+
+def _text(s: str) -> bytes:
+    raw = s.encode()[:255]
+    return bytes([len(raw)]) + raw
+
+
+def _encode_state(msg: dict) -> bytes:
+    out = bytearray(_text(msg["game_id"]))
+    out.append(len(msg["player_names"]))
+    for name in msg["player_names"]:
+        out += _text(name)
+    out += bytes(msg["board"][c.name] for c in Color)
+    out += struct.pack(">BBBBI", msg["tokens"], msg["misfires"], msg["deck_count"],
+                       msg["current_turn"], msg["version"])
+    out.append(len(msg["discards"]))
+    out += bytes(_code(c) for c in msg["discards"])
+    for hand in msg["hands"]:
+        out.append(len(hand))
+        for card in hand:
+            colors = ranks = 0
+            for hint in card["hints"]:
+                if hint in COLOR_BIT:
+                    colors |= COLOR_BIT[hint]
+                else:
+                    ranks |= RANK_BIT[hint]
+            out += bytes((_code(card), colors, ranks))
+    return bytes(out)
+
+def _decode_state(buf: bytes) -> dict:
+    pos = 0
+    def text():
+        nonlocal pos
+        n = buf[pos]
+        s = buf[pos + 1:pos + 1 + n].decode()
+        pos += 1 + n
+        return s
+    game_id = text()
+    names = []
+    count = buf[pos]; pos += 1
+    for _ in range(count):
+        names.append(text())
+    board = dict(zip(COLOR_NAMES, buf[pos:pos + 5])); pos += 5
+    tokens, misfires, deck_count, turn, version = struct.unpack_from(">BBBBI", buf, pos); pos += 8
+    n = buf[pos]; pos += 1
+    discards = [_card(c) for c in buf[pos:pos + n]]; pos += n
+    hands = []
+    for _ in names:
+        size = buf[pos]; pos += 1
+        hand = []
+        for _ in range(size):
+            code, colors, ranks = buf[pos:pos + 3]; pos += 3
+            hand.append(dict(_card(code), hints=list(COLOR_HINTS[colors] + RANK_HINTS[ranks])))
+        hands.append(hand)
+    return {"type": "STATE", "game_id": game_id, "player_names": names, "board": board,
+            "tokens": tokens, "misfires": misfires, "deck_count": deck_count, "discards": discards,
+            "hands": hands, "current_turn": turn, "version": version}
+
+
+def _encode_delta(msg: dict) -> bytes:
+    flags = 0
+    body = bytearray()
+    if "tower" in msg:
+        flags |= F_TOWER
+        body += bytes((Color[msg["tower"][0]].value, msg["tower"][1]))
+    if "discard" in msg:
+        flags |= F_DISCARD
+        body.append(_code(msg["discard"]))
+    if "misfires" in msg:
+        flags |= F_MISFIRES
+        body.append(msg["misfires"])
+    if "tokens" in msg:
+        flags |= F_TOKENS
+        body.append(msg["tokens"])
+    if "deck_count" in msg:
+        flags |= F_DECK
+        body.append(msg["deck_count"])
+    if "slot" in msg:
+        flags |= F_SLOT
+        player, idx, card = msg["slot"]
+        body += bytes((player, idx, _code(card)))
+    if "hints" in msg:
+        flags |= F_HINTS
+        body.append(len(msg["hints"]))
+        for player, idx, hint in msg["hints"]:
+            body += bytes((player, idx, _hint_byte(hint)))
+    return struct.pack(">IBB", msg["version"], msg["current_turn"], flags) + bytes(body)
+
+def _decode_delta(buf: bytes) -> dict:
+    version, turn, flags = struct.unpack_from(">IBB", buf)
+    pos = 6
+    msg = {"type": "DELTA"}
+    if flags & F_TOWER:
+        msg["tower"] = [Color(buf[pos]).name, buf[pos + 1]]; pos += 2
+    if flags & F_DISCARD:
+        msg["discard"] = _card(buf[pos]); pos += 1
+    if flags & F_MISFIRES:
+        msg["misfires"] = buf[pos]; pos += 1
+    if flags & F_TOKENS:
+        msg["tokens"] = buf[pos]; pos += 1
+    if flags & F_DECK:
+        msg["deck_count"] = buf[pos]; pos += 1
+    if flags & F_SLOT:
+        msg["slot"] = [buf[pos], buf[pos + 1], _card(buf[pos + 2])]; pos += 3
+    if flags & F_HINTS:
+        n = buf[pos]; pos += 1
+        msg["hints"] = [[buf[pos + 3 * i], buf[pos + 3 * i + 1], _hint_str(buf[pos + 3 * i + 2])] for i in range(n)]
+    msg["version"] = version
+    msg["current_turn"] = turn
+    return msg
+
+
+def encode_frame(msg: dict, compress: bool = False) -> bytes:
+    kind = msg["type"]
+    if kind == "STATE":
+        t, payload = T_STATE, _encode_state(msg)
+    elif kind == "DELTA":
+        t, payload = T_DELTA, _encode_delta(msg)
+    elif kind == "PLAY":
+        t, payload = T_PLAY, bytes((msg["player_idx"], msg["card_idx"]))
+    elif kind == "DISC":
+        t, payload = T_DISC, bytes((msg["player_idx"], msg["card_idx"]))
+    elif kind == "HINT":
+        value = Color[msg["color"]].value if "color" in msg else 4 + msg["number"]
+        t, payload = T_HINT, bytes((msg["from"], msg["to"], value))
+    elif kind == "RESYNC":
+        t, payload = T_RESYNC, b""
+    elif kind == "ASSIGN_IDX":
+        t, payload = T_ASSIGN, bytes((msg["idx"],))
+    else:
+        t, payload = T_ERROR, msg.get("msg", "").encode()
+    if compress and len(payload) >= COMPRESS_MIN:
+        t, payload = t | COMPRESSED, zlib.compress(payload, 1)
+    return HEADER.pack(len(payload), t) + payload
+
+
+class FrameError(ValueError):
+    ''' a frame that is too long or does not decode '''
+
+
+def decode_frame(t: int, payload: bytes) -> dict:
+    try:
+        return _decode(t, payload)
+    except (IndexError, KeyError, ValueError, struct.error, zlib.error) as e:
+        raise FrameError(f"Bad frame of type {t}: {e}") from e
+
+
+def _decode(t: int, payload: bytes) -> dict:
+    if t & COMPRESSED:
+        inflate = zlib.decompressobj()
+        t, payload = t & ~COMPRESSED, inflate.decompress(payload, MAX_FRAME)
+        if inflate.unconsumed_tail:
+            raise FrameError(f"Frame inflates past {MAX_FRAME} bytes")
+    if t == T_STATE:
+        return _decode_state(payload)
+    if t == T_DELTA:
+        return _decode_delta(payload)
+    if t == T_PLAY:
+        return {"type": "PLAY", "player_idx": payload[0], "card_idx": payload[1]}
+    if t == T_DISC:
+        return {"type": "DISC", "player_idx": payload[0], "card_idx": payload[1]}
+    if t == T_HINT:
+        msg = {"type": "HINT", "from": payload[0], "to": payload[1]}
+        if payload[2] < 5:
+            msg["color"] = Color(payload[2]).name
+        else:
+            msg["number"] = payload[2] - 4
+        return msg
+    if t == T_RESYNC:
+        return {"type": "RESYNC"}
+    if t == T_ASSIGN:
+        return {"type": "ASSIGN_IDX", "idx": payload[0]}
+    return {"type": "ERROR", "msg": payload.decode()}
+
+
+def read_frame(f):
+    ''' next frame from a blocking binary file object (socket.makefile('rb')), None on EOF or a bad frame '''
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    length, t = HEADER.unpack(header)
+    if length > MAX_FRAME:
+        return None
+    payload = f.read(length)
+    if len(payload) < length:
+        return None
+    try:
+        return decode_frame(t, payload)
+    except FrameError:
+        return None
+
+
+async def read_frame_async(reader):
+    ''' next frame from an asyncio StreamReader, None on EOF or a bad frame '''
+    try:
+        header = await reader.readexactly(HEADER.size)
+        length, t = HEADER.unpack(header)
+        if length > MAX_FRAME:
+            return None # never buffer what a peer merely announces
+        return decode_frame(t, await reader.readexactly(length))
+    except (EOFError, FrameError):
+        return None
@@ -0,0 +1,168 @@
+from game_logic.cards import Color, CARD_NUMBER, CARD_COLOR, EMPTY
+from game_logic.state import GameState
+from game_logic.actions import PLAY, DISC, HINT, apply_action
+from game_logic.knowledge import Knowledge, ALL
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import namedtuple
+import argparse, random, time
+'''
+Headless self-play. Bots implement Agent.act and games run straight on GameState, no sockets.
+simulate() plays N seeded games and streams GameResult as batches finish, batches are spread
+over a ProcessPoolExecutor. Same seeds and agents give the same results, serial or parallel.
+
+    python -m game_logic.sim --games 100000 --players 3 --agent simple
+'''
+GameResult = namedtuple("GameResult", "seed score turns misfires")
+MAX_TURNS = 500 # safety net for agents that never play or discard
+
+
+class Agent():
+    ''' one agent per seat. act gets the full GameState (a bot must only read what its seat
+    may see: other hands, its own hint masks, board, discards, counters) and returns an action
+    tuple from game_logic.actions. Agents with uses_knowledge share one Knowledge of the game,
+    kept up to date by play_game '''
+    uses_knowledge = False
+    knowledge = None
+
+    def __init__(self, player_idx: int, seed: int):
+        self.player_idx = player_idx
+        self.rng = random.Random(seed)
+
+    def act(self, game: GameState) -> tuple:
+        raise NotImplementedError
+
+
+class RandomAgent(Agent):
+    ''' uniformly random legal moves, the floor every convention has to beat '''
+    def act(self, game):
+        return self.rng.choice(game.legal_actions())
+
+
+class SimpleAgent(Agent):
+    ''' play what hints prove playable, else hint a playable card of a teammate, else discard
+    the oldest slot without any hint '''
+    def act(self, game):
+        me = self.player_idx
+        ps = game.players[me]
+        board = game.board
+        for slot in range(len(ps.hand)):
+            colors, ranks = ps.color_hints[slot], ps.rank_hints[slot]
+            if colors and ranks and ps.hand.codes[slot] != EMPTY:
+                color = Color(colors.bit_length() - 1)
+                if board[color] + 1 == ranks.bit_length():
+                    return (PLAY, me, slot)
+        if game.tokens > 0:
+            for step in range(1, len(game.players)):
+                to = (me + step) % len(game.players)
+                other = game.players[to]
+                for slot, code in enumerate(other.hand.codes):
+                    if code == EMPTY or board[CARD_COLOR[code]] + 1 != CARD_NUMBER[code]:
+                        continue
+                    # complete what the teammate is missing about this card
+                    if not other.rank_hints[slot]:
+                        return (HINT, me, to, CARD_NUMBER[code])
+                    if not other.color_hints[slot]:
+                        return (HINT, me, to, CARD_COLOR[code])
+        for slot in range(len(ps.hand)):
+            if not ps.color_hints[slot] and not ps.rank_hints[slot]:
+                return (DISC, me, slot)
+        return (DISC, me, 0)
+
+
+class InferenceAgent(Agent):
+    ''' SimpleAgent on top of game_logic.knowledge: play a card once it is surely playable (or
+    likely enough while misfires are cheap), hint teammates about playable cards they cannot be
+    sure of yet, discard the card most likely to be useless '''
+    uses_knowledge = True
+    RISK = 0.6 # playable chance worth a play while at most one misfire happened
+
+    def act(self, game):
+        me, kn = self.player_idx, self.knowledge
+        ps = game.players[me]
+        slots = [slot for slot, code in enumerate(ps.hand.codes) if code != EMPTY]
+        playable = kn.playable_cards()
+        chance, slot = max((kn.chance(me, slot, playable), slot) for slot in slots)
+        if chance >= 1.0 or (chance >= self.RISK and game.misfires < 2):
+            return (PLAY, me, slot)
+        if game.tokens > 0:
+            for step in range(1, len(game.players)):
+                to = (me + step) % len(game.players)
+                other = game.players[to]
+                for slot, code in enumerate(other.hand.codes):
+                    if code == EMPTY or not playable >> code & 1 or kn.chance(to, slot, playable) >= 1.0:
+                        continue
+                    if not other.rank_hints[slot]:
+                        return (HINT, me, to, CARD_NUMBER[code])
+                    if not other.color_hints[slot]:
+                        return (HINT, me, to, CARD_COLOR[code])
+        useless = kn.useless_cards()
+        chance, oldest = max((kn.chance(me, slot, useless), -slot) for slot in slots)
+        likeliest = -oldest # lowest slot among equal chances
+        if chance >= 1.0:
+            return (DISC, me, likeliest)
+        for slot in slots:
+            if kn.masks[me][slot] == ALL:
+                return (DISC, me, slot)
+        return (DISC, me, likeliest) # everything was hinted: the likeliest to be useless
+
+
+AGENTS = {"random": RandomAgent, "simple": SimpleAgent, "infer": InferenceAgent}
+
+
+def play_game(agent_cls, num_players: int, seed: int) -> GameResult:
+    game = GameState([f"bot{i}" for i in range(num_players)], game_id=str(seed), seed=seed)
+    agents = [agent_cls(i, seed * 8 + i) for i in range(num_players)]
+    knowledge = Knowledge(game) if agent_cls.uses_knowledge else None
+    for agent in agents:
+        agent.knowledge = knowledge
+    while not game.check_end() and game.version < MAX_TURNS:
+        action = agents[game.current_turn].act(game)
+        apply_action(game, action)
+        if knowledge is not None:
+            knowledge.observe(action)
+    return GameResult(seed, sum(game.board.values()), game.version, game.misfires)
+
+
+def run_batch(agent_cls, num_players: int, seeds) -> list:
+    return [play_game(agent_cls, num_players, seed) for seed in seeds]
+
+
+def simulate(agent_cls, num_players: int, games: int, base_seed: int = 0,
+             workers: int = None, batch_size: int = 2000):
+    ''' yield GameResult for seeds base_seed .. base_seed+games-1, batch by batch as they finish.
+    workers=1 plays in this process, otherwise batches go to a process pool (None = cpu count) '''
+    batches = [range(start, min(start + batch_size, base_seed + games))
+               for start in range(base_seed, base_seed + games, batch_size)]
+    if workers == 1:
+        for seeds in batches:
+            yield from run_batch(agent_cls, num_players, seeds)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_batch, agent_cls, num_players, seeds) for seeds in batches]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hanabi self-play simulation")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--agent", choices=sorted(AGENTS), default="simple")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    n = score = turns = misfires = 0
+    for result in simulate(AGENTS[args.agent], args.players, args.games, args.seed, args.workers):
+        n += 1
+        score += result.score
+        turns += result.turns
+        misfires += result.misfires
+    elapsed = time.perf_counter() - t0
+    print(f"{n} games in {elapsed:.2f}s ({n / elapsed * 3600:,.0f} games/hour)")
+    print(f"avg score {score / n:.2f}  avg turns {turns / n:.1f}  avg misfires {misfires / n:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,137 +1,373 @@
-from game_logic.cards import Card,Color,Deck
-import json,uuid
+from game_logic.cards import Card,Color,Deck,Hand,CARDS,CARD_NUMBER,CARD_COLOR,EMPTY,COUNTS,card_code
+from game_logic.actions import PLAY,DISC,HINT,apply_action
+from array import array
+import json,uuid,random
 '''
 All of the game logic included in this file. Game state is created then managed here. 
 
 '''
+COLOR_NAMES = tuple(c.color.name for c in CARDS) # Enum.name is a property, look it up once
+
+def card_dict(card) -> dict:
+    ''' wire form of a card, an empty slot (deck ran out) has no number / color '''
+    if card is None:
+        return {"number": None, "color": None}
+    return {"number": card.number, "color": COLOR_NAMES[card.code]}
+
+def game_ended(misfires: int, score: int, deck_count: int) -> bool:
+    ''' end of the game: 3 misfires, all 5 towers built (25 points) or the deck is empty '''
+    return misfires >= 3 or score == 25 or deck_count == 0
+
+# hint knowledge is two bitmasks per slot: bit c of the color mask = told "this is Color(c)",
+# bit n-1 of the rank mask = told "this is a n". Strings like 'RED' / '2' only exist on the wire.
+COLOR_BIT = {c.name: 1 << c.value for c in Color}
+RANK_BIT = {str(n): 1 << (n - 1) for n in range(1, 6)}
+# mask -> hint strings, colors first then numbers, precomputed for all 32 masks
+COLOR_HINTS = tuple(tuple(c.name for c in Color if m & (1 << c.value)) for m in range(32))
+RANK_HINTS = tuple(tuple(str(n) for n in range(1, 6) if m & (1 << (n - 1))) for m in range(32))
+
+class SlotHints():
+    ''' list-like view of the hints on one slot, backed by the player's masks '''
+    __slots__ = ("ps", "idx")
+    def __init__(self, ps, idx: int):
+        self.ps, self.idx = ps, idx
+    def append(self, hint: str):
+        if hint in COLOR_BIT:
+            self.ps.color_hints[self.idx] |= COLOR_BIT[hint]
+        else:
+            self.ps.rank_hints[self.idx] |= RANK_BIT[hint]
+    def __iter__(self):
+        return iter(COLOR_HINTS[self.ps.color_hints[self.idx]] + RANK_HINTS[self.ps.rank_hints[self.idx]])
+    def __len__(self):
+        return len(COLOR_HINTS[self.ps.color_hints[self.idx]]) + len(RANK_HINTS[self.ps.rank_hints[self.idx]])
+    def __contains__(self, hint):
+        return hint in list(self)
+    def __eq__(self, other):
+        return list(self) == list(other)
+    def __repr__(self):
+        return repr(list(self))
+
+class HintsView():
+    ''' ps.hints[idx] -> SlotHints, ps.hints[idx] = [...] replaces that slot's knowledge '''
+    __slots__ = ("ps",)
+    def __init__(self, ps):
+        self.ps = ps
+    def __len__(self):
+        return len(self.ps.color_hints)
+    def __getitem__(self, idx: int):
+        return SlotHints(self.ps, idx)
+    def __setitem__(self, idx: int, hints):
+        self.ps.color_hints[idx] = self.ps.rank_hints[idx] = 0
+        slot = SlotHints(self.ps, idx)
+        for hint in hints:
+            slot.append(hint)
+    def __iter__(self):
+        return (SlotHints(self.ps, idx) for idx in range(len(self)))
+
 class PlayerState():
+    __slots__ = ("name", "_hand", "color_hints", "rank_hints")
     def __init__(self,name:str,hand_size:int):
         self.name = name
-        self.hand = [None]*hand_size
-        self.hints = [[] for _ in range(hand_size)]  # append string data to these 
+        self._hand = Hand([None]*hand_size) # card codes, see cards.Hand
+        self.color_hints = array('B', bytes(hand_size)) # per slot bitmasks
+        self.rank_hints = array('B', bytes(hand_size))
         # clear when that card is played / discarded 
+    @property
+    def hand(self):
+        return self._hand
+    @hand.setter
+    def hand(self, cards):
+        self._hand = cards if isinstance(cards, Hand) else Hand(cards)
+    @property
+    def hints(self):
+        return HintsView(self)
+    @hints.setter
+    def hints(self, hints):
+        self.color_hints = array('B', bytes(len(hints)))
+        self.rank_hints = array('B', bytes(len(hints)))
+        for idx, slot in enumerate(hints):
+            self.hints[idx] = slot
     def clear_hints(self, card_idx: int):
-        self.hints[card_idx] = [] # clear only that one which got discarded (not all)
+        self.color_hints[card_idx] = self.rank_hints[card_idx] = 0 # clear only that one which got discarded (not all)
+    def copy(self):
+        ps = object.__new__(PlayerState)
+        ps.name = self.name
+        ps._hand = self._hand.copy()
+        ps.color_hints = array('B', self.color_hints)
+        ps.rank_hints = array('B', self.rank_hints)
+        return ps
 
 class GameState():
-    def __init__(self,player_names:list,game_id: str = None):
+    def __init__(self,player_names:list,game_id: str = None,seed: int = None):
         self.game_id = game_id or str(uuid.uuid4())
+        # the seed fixes the whole deal, so a game is its seed + its action log
+        self.seed = seed if seed is not None else random.getrandbits(63)
         self.deck = Deck()
-        self.deck.shuffle()
+        self.deck.shuffle(random.Random(self.seed))
         self.players = [] # list of playerstate infos 
         hand_size = 4 if len(player_names) >= 4 else 5
         for name in player_names:
             ps = PlayerState(name,hand_size)
             for i in range(hand_size):
-                ps.hand[i] = self.deck.draw()
+                ps.hand.codes[i] = self.deck.draw_code()
             self.players.append(ps)
         self.board = {c:0 for c in Color} # dict Color -> number of cards in tower, all start at 0
+        # running counters, kept up to date by every action so check_end / bots never rescan
+        self.discarded = array('B', bytes(25)) # card code -> copies in the discard pile
+        self.max_score = 25 # best score still reachable: towers stop below a card with every copy discarded
         self.tokens = 8
         self.misfires = 0
         self.discards = []
         self.current_turn = 0 # mod player number will tell which player turn it is 
+        self.version = 0 # bumped by every action, lets clients detect a missed delta
+        self.last_delta = None # what the last action changed, see record_delta
     @classmethod
     def from_serialized(cls, data: dict):
         # 1) Create an “empty” GameState with the same players + game_id
-        gs = cls(data["player_names"], game_id=data["game_id"])
+        gs = cls(data["player_names"], game_id=data["game_id"], seed=data.get("seed"))
         
         # 2) Overwrite the board / tokens / misfires / turn / discards
         gs.board        = { Color[cname]: v for cname, v in data["board"].items() }
         gs.tokens       = data["tokens"]
         gs.misfires     = data["misfires"]
         gs.current_turn = data["current_turn"]
+        gs.version      = data.get("version", 0)
         gs.discards     = [
             Card(item["number"], Color[item["color"]])
             for item in data["discards"]
         ]
+        gs.discarded = array('B', bytes(25))
+        for card in gs.discards:
+            gs.discarded[card.code] += 1
+        gs.max_score = gs.reachable_score()
         
         # 3) Reconstruct each player’s hand & hints
         gs.players = []  # clear out the ones __init__ drew
         for name, hand_data in zip(data["player_names"], data["hands"]):
             ps = PlayerState(name, len(hand_data))
             for idx, card_info in enumerate(hand_data):
-                # rebuild the Card
-                num   = card_info["number"]
-                col   = Color[card_info["color"]]
-                card  = Card(num, col)
-                ps.hand[idx] = card
-                # rebuild the hints list
-                ps.hints[idx] = list(card_info.get("hints", []))
+                # rebuild the Card (empty slot once the deck ran out)
+                if card_info["number"] is not None:
+                    ps.hand[idx] = Card(card_info["number"], Color[card_info["color"]])
+                # rebuild the hint masks
+                ps.hints[idx] = card_info.get("hints", [])
             gs.players.append(ps)
         
-        # 4) (Optionally) if you want the deck_count accurate
-        #    You could create a dummy deck of the right size:
-        # gs.deck = Deck()
-        # gs.deck.cards = [None] * data["deck_count"]
-        # gs.deck.deck_count = data["deck_count"]
+        # 4) checkpoints also carry the remaining deck, plain snapshots keep a freshly dealt one
+        if "deck" in data:
+            gs.deck.cards = array('B', data["deck"])
+            gs.deck.deck_count = len(gs.deck.cards)
 
         return gs
+
+    @property
+    def board(self):
+        return self._board
+    @board.setter
+    def board(self, board: dict):
+        self._board = board
+        self.score = sum(board.values())
+
+    def reachable_score(self) -> int:
+        ''' max_score from scratch: per color, the tower can still climb to just below the
+        lowest number whose copies are all discarded '''
+        total = 0
+        for color in Color:
+            top = 5
+            for number in range(1, 6):
+                if self.discarded[card_code(number, color)] == COUNTS[number]:
+                    top = number - 1
+                    break
+            total += top
+        return total
+
+    def _discard_card(self, card):
+        self.discards.append(card)
+        n = self.discarded[card.code] + 1
+        self.discarded[card.code] = n
+        if n == COUNTS[card.number]: # last copy gone, that tower can never pass it
+            self.max_score = self.reachable_score()
+
     def play_card(self,player_idx:int,card_idx:int) -> bool:
         ''' in : player id of player who does move and his card index (he doesnt know card).
         return true if card fits tower number and color. return false otherwise '''
         player = self.players[player_idx]
-        card = player.hand[card_idx]
+        codes = player.hand.codes
+        card = CARDS[codes[card_idx]]
         # need to add checking if the tower for that color is full ? 
-        top = self.board[card.color]
+        top = self._board[card.color]
         success = False
+        delta = {}
         if card.number == top + 1:
-            self.board[card.color] += 1 # if fitting, tower goes up
+            self._board[card.color] = top + 1 # if fitting, tower goes up
+            self.score += 1
             success = True 
+            delta["tower"] = [COLOR_NAMES[card.code], top + 1]
         else:
-            self.discards.append(card) # card if discarded if it doesnt fit 
+            self._discard_card(card) # card if discarded if it doesnt fit 
             self.misfires += 1
+            delta["discard"] = card_dict(card)
+            delta["misfires"] = self.misfires
         # have to draw replacement in any case 
         player.clear_hints(card_idx) # clear hints for played card 
-        player.hand[card_idx] = self.deck.draw()
+        codes[card_idx] = self.deck.draw_code()
         self.current_turn = (self.current_turn + 1) % len(self.players)
+        delta["slot"] = [player_idx, card_idx, card_dict(player.hand[card_idx])]
+        delta["deck_count"] = self.deck.get_deck_count()
+        self.record_delta(delta)
         return success
     def give_hint(self,from_player_idx:int,to_player_idx:int,color=None,number=None):
         if self.tokens == 0:
             raise RuntimeError("No hint tokens left")
         ps_to = self.players[to_player_idx]
+        codes = ps_to.hand.codes
+        touched = []
 
         # color hint - tell him which cards have that color 
         if color is not None:
-            for idx, card in enumerate(ps_to.hand):
-                if card.color == color:
-                    ps_to.hints[idx].append(color.name)
+            bit = 1 << color.value
+            for idx, code in enumerate(codes):
+                if code != EMPTY and CARD_COLOR[code] is color:
+                    ps_to.color_hints[idx] |= bit
+                    touched.append([to_player_idx, idx, color.name])
 
         # apply number hints - tell him which cards have that number 
         if number is not None:
-            for idx, card in enumerate(ps_to.hand):
-                if card.number == number:
-                    ps_to.hints[idx].append(str(number))
+            bit = 1 << (number - 1)
+            for idx, code in enumerate(codes):
+                if code != EMPTY and CARD_NUMBER[code] == number:
+                    ps_to.rank_hints[idx] |= bit
+                    touched.append([to_player_idx, idx, str(number)])
 
         self.tokens -= 1
         self.current_turn = (self.current_turn + 1) % len(self.players)
+        self.record_delta({"hints": touched, "tokens": self.tokens})
     
     def discard(self,player_idx:int,card_idx:int):
         '''discard the card_d of player_id and draw another in its place. discarded should be shown. '''
         player = self.players[player_idx]
-        card = player.hand[card_idx]
-        self.discards.append(card)
+        codes = player.hand.codes
+        card = CARDS[codes[card_idx]]
+        self._discard_card(card)
         player.clear_hints(card_idx)
         self.tokens += 1
-        player.hand[card_idx] = self.deck.draw()
+        codes[card_idx] = self.deck.draw_code()
         self.current_turn = (self.current_turn + 1) % len(self.players)
+        self.record_delta({
+            "discard":    card_dict(card),
+            "tokens":     self.tokens,
+            "slot":       [player_idx, card_idx, card_dict(player.hand[card_idx])],
+            "deck_count": self.deck.get_deck_count(),
+        })
+
+    def record_delta(self, delta: dict):
+        ''' stamp the changes of one action with the new version and turn.
+        only changed fields are present: slot, hints, tower, tokens, misfires, discard, deck_count '''
+        self.version += 1
+        delta["version"] = self.version
+        delta["current_turn"] = self.current_turn
+        self.last_delta = delta
     
+    def clone(self):
+        ''' independent copy for search, without the uuid / reshuffle of __init__ or a
+        serialize round trip. every field is a small array, dict or list '''
+        gs = object.__new__(GameState)
+        gs.__dict__.update(self.__dict__)
+        gs.deck = self.deck.copy()
+        gs.players = [ps.copy() for ps in self.players]
+        gs._board = dict(self._board)
+        gs.discards = list(self.discards)
+        gs.discarded = array('B', self.discarded)
+        return gs
+
+    def apply(self, action: tuple):
+        ''' apply an action tuple (see game_logic.actions) and return the undo token for undo().
+        the token only holds what the action can change, so apply + undo is O(hand size) '''
+        kind, player_idx = action[0], action[1]
+        saved = (self.tokens, self.misfires, self.current_turn, self.version, self.last_delta, len(self.discards),
+                 self.score, self.max_score)
+        if kind == PLAY or kind == DISC:
+            ps = self.players[player_idx]
+            slot = action[2]
+            card = CARDS[ps.hand.codes[slot]]
+            undo = (action, saved, card, ps.color_hints[slot], ps.rank_hints[slot], self._board[card.color])
+        else:
+            ps = self.players[action[2]]
+            undo = (action, saved, array('B', ps.color_hints), array('B', ps.rank_hints))
+        apply_action(self, action)
+        return undo
+
+    def undo(self, token: tuple):
+        ''' revert the action that returned token. tokens must be undone last-in first-out '''
+        action, saved = token[0], token[1]
+        (self.tokens, self.misfires, self.current_turn, self.version, self.last_delta, n_discards,
+         self.score, self.max_score) = saved
+        if action[0] == PLAY or action[0] == DISC:
+            _, _, card, color_mask, rank_mask, top = token
+            ps = self.players[action[1]]
+            slot = action[2]
+            drawn = ps.hand.codes[slot]
+            if drawn != EMPTY: # put the replacement back on top of the deck
+                self.deck.cards.append(drawn)
+                self.deck.deck_count += 1
+            ps.hand.codes[slot] = card.code
+            ps.color_hints[slot], ps.rank_hints[slot] = color_mask, rank_mask
+            self._board[card.color] = top
+            if len(self.discards) > n_discards:
+                self.discarded[card.code] -= 1
+                del self.discards[n_discards:]
+        else:
+            ps = self.players[action[2]]
+            ps.color_hints, ps.rank_hints = token[2], token[3]
+
     def check_end(self) -> bool:
         ''' if 3 misfires are reached,
             or all 5 towers are built - 25 points 
             or deck is empty 
         '''
-        if self.misfires >= 3:
-            return True
-        full = True
-        for v in self.board.values(): # iterate values of the dict, if below 5, game not won
-            if v < 5:
-                full = False
-                break
-        if full:
-            return True
-        if self.deck.get_deck_count() == 0:
-            return True
-        return False
+        return game_ended(self.misfires, self.score, self.deck.deck_count)
+
+    def legal_actions(self) -> list:
+        ''' every legal move of the current player as action tuples (game_logic.actions), in
+        O(players * hand size): play or discard any card, hint a teammate a color or number that
+        touches at least one of their cards '''
+        if self.check_end():
+            return []
+        me = self.current_turn
+        slots = [slot for slot, code in enumerate(self.players[me].hand.codes) if code != EMPTY]
+        actions = [(PLAY, me, slot) for slot in slots] + [(DISC, me, slot) for slot in slots]
+        if self.tokens:
+            for step in range(1, len(self.players)):
+                to = (me + step) % len(self.players)
+                codes = [code for code in self.players[to].hand.codes if code != EMPTY]
+                actions += [(HINT, me, to, color) for color in Color if any(CARD_COLOR[c] is color for c in codes)]
+                actions += [(HINT, me, to, number) for number in sorted({CARD_NUMBER[c] for c in codes})]
+        return actions
+
+    def validate(self, action: tuple):
+        ''' raise ValueError unless action is legal now, O(hand size). The play_card / give_hint /
+        discard mutators stay unchecked for replay and search, the server checks every move first '''
+        if self.check_end():
+            raise ValueError("Game is over")
+        kind, player = action[0], action[1]
+        if player != self.current_turn:
+            raise ValueError("Not your turn")
+        if kind == HINT:
+            to, value = action[2], action[3]
+            if to == player:
+                raise ValueError("Cannot hint yourself")
+            if not 0 <= to < len(self.players):
+                raise ValueError("No such player")
+            if self.tokens == 0:
+                raise ValueError("No hint tokens left")
+            if isinstance(value, Color):
+                touched = any(code != EMPTY and CARD_COLOR[code] is value for code in self.players[to].hand.codes)
+            else:
+                touched = any(code != EMPTY and CARD_NUMBER[code] == value for code in self.players[to].hand.codes)
+            if not touched:
+                raise ValueError("Hint touches no cards")
+        elif not 0 <= action[2] < len(self.players[player].hand) or self.players[player].hand.codes[action[2]] == EMPTY:
+            raise ValueError("No card in that slot")
     def serialize_state(self):
         return {
             "game_id":    self.game_id,
@@ -140,20 +376,23 @@ class GameState():
             "tokens":     self.tokens,
             "misfires":   self.misfires,
             "deck_count": self.deck.get_deck_count(),
-            "discards":   [ {"number":c.number, "color":c.color.name}
-                            for c in self.discards ],
+            "discards":   [ card_dict(c) for c in self.discards ],
             "hands":      [
                 [
-                    {
-                    "number":    card.number,
-                    "color":     card.color.name,
-                    "hints":     ps.hints[idx]
-                    }
+                    dict(card_dict(card), hints=list(COLOR_HINTS[ps.color_hints[idx]] + RANK_HINTS[ps.rank_hints[idx]]))
                     for idx,card in enumerate(ps.hand)
                 ]
                 for ps in self.players
             ],
             "current_turn": self.current_turn,
+            "version":    self.version,
         }
+    def checkpoint(self) -> dict:
+        ''' serialize_state plus what is hidden from players (seed, remaining deck in draw order),
+        enough for from_serialized to restore the exact game '''
+        snap = self.serialize_state()
+        snap["seed"] = self.seed
+        snap["deck"] = list(self.deck.cards) # card codes, see cards.card_code
+        return snap
 
 
@@ -0,0 +1,56 @@
+import pytest
+from game_logic.cards import Color
+from game_logic.state import GameState
+from game_logic.actions import PLAY as S_PLAY, DISC as S_DISC, HINT as S_HINT, apply_action
+
+np = pytest.importorskip("numpy")
+from game_logic.batch import BatchGameState, PLAY, DISC, HINT, NOOP
+
+
+def scalar_action(gs, kind, arg, value):
+    me = gs.current_turn
+    if kind == PLAY:
+        return (S_PLAY, me, arg)
+    if kind == DISC:
+        return (S_DISC, me, arg)
+    return (S_HINT, me, arg, Color(value) if value < 5 else value - 4)
+
+
+@pytest.mark.parametrize("players", [2, 3, 4, 5])
+def test_batch_matches_scalar_game_state(players):
+    seeds = list(range(players * 100, players * 100 + 40))
+    batch = BatchGameState(players, seeds)
+    games = [GameState([f"bot{i}" for i in range(players)], game_id=str(s), seed=s) for s in seeds]
+    rng = np.random.default_rng(players)
+    for k, gs in enumerate(games):
+        assert batch.checkpoint(k) == gs.checkpoint()
+    while not batch.check_end().all():
+        kind, arg, value = batch.random_actions(rng)
+        success = batch.step(kind, arg, value)
+        for k, gs in enumerate(games):
+            if kind[k] == NOOP:
+                assert gs.check_end()
+                continue
+            ok = apply_action(gs, scalar_action(gs, kind[k], int(arg[k]), int(value[k])))
+            if kind[k] == PLAY:
+                assert bool(success[k]) == ok
+            assert batch.checkpoint(k) == gs.checkpoint()
+            assert bool(batch.check_end()[k]) == gs.check_end()
+    assert [int(s) for s in batch.score()] == [sum(gs.board.values()) for gs in games]
+
+
+def test_hint_without_tokens_raises_like_scalar():
+    batch = BatchGameState(2, [1, 2])
+    batch.tokens[:] = 0
+    with pytest.raises(RuntimeError):
+        batch.step(np.array([HINT, HINT]), np.array([1, 0]), np.array([0, 5]))
+
+
+def test_rejected_step_leaves_every_game_unchanged():
+    batch = BatchGameState(3, [4, 5, 6])
+    batch.tokens[2] = 0
+    before = [batch.checkpoint(k) for k in range(3)]
+    # the PLAY and DISC rows are fine, the HINT of the last game has no token
+    with pytest.raises(RuntimeError):
+        batch.step(np.array([PLAY, DISC, HINT]), np.array([0, 1, 1]), np.array([0, 0, 5]))
+    assert [batch.checkpoint(k) for k in range(3)] == before
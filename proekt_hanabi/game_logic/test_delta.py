@@ -0,0 +1,41 @@
+import copy, json, random
+import pytest
+from game_logic.cards import Color
+from game_logic.state import GameState
+from game_logic.delta import apply_delta, StaleDelta
+
+
+def random_action(gs, rng):
+    turn = gs.current_turn
+    choice = rng.randrange(3)
+    if choice == 0 and gs.tokens > 0:
+        to = (turn + 1) % len(gs.players)
+        if rng.random() < 0.5:
+            gs.give_hint(turn, to, color=rng.choice(list(Color)))
+        else:
+            gs.give_hint(turn, to, number=rng.randint(1, 5))
+    elif choice == 1:
+        gs.play_card(turn, rng.randrange(len(gs.players[turn].hand)))
+    else:
+        gs.discard(turn, rng.randrange(len(gs.players[turn].hand)))
+
+
+@pytest.mark.parametrize("players", [2, 3, 5])
+def test_deltas_rebuild_the_full_state(players):
+    rng = random.Random(players)
+    gs = GameState([f"P{i}" for i in range(players)])
+    local = json.loads(json.dumps(gs.serialize_state()))
+    while not gs.check_end():
+        random_action(gs, rng)
+        # round trip through JSON like the wire does
+        apply_delta(local, json.loads(json.dumps(gs.last_delta)))
+        assert local == gs.serialize_state()
+
+
+def test_missed_delta_is_detected():
+    gs = GameState(["P1", "P2"])
+    local = copy.deepcopy(gs.serialize_state())
+    gs.discard(0, 0)
+    gs.discard(1, 0)
+    with pytest.raises(StaleDelta):
+        apply_delta(local, gs.last_delta)
@@ -0,0 +1,49 @@
+from game_logic.actions import apply_action
+from game_logic.endgame import Solver, endgame, solve, position
+from game_logic.sim import SimpleAgent
+
+
+def brute_force(game) -> int:
+    ''' best final score over every legal action, every hint and misfire included '''
+    if game.check_end():
+        return game.score
+    best = 0
+    for action in game.legal_actions():
+        token = game.apply(action)
+        best = max(best, brute_force(game))
+        game.undo(token)
+    return best
+
+
+def test_solver_matches_brute_force():
+    for players, deck, tokens in ((2, 3, 0), (3, 2, 1)): # every hint is a branch, keep it small
+        for seed in range(6):
+            game = endgame(players, seed, deck)
+            game.tokens = min(game.tokens, tokens)
+            solver = Solver()
+            best, action = solver.best_move(game)
+            assert best == brute_force(game)
+            values = solver.action_values(game)
+            assert max(values.values()) == best and values[action] == best
+
+
+def test_solver_is_at_least_as_good_as_a_bot():
+    for seed in range(10):
+        game = endgame(3, seed, 5)
+        best, action = Solver().best_move(game)
+        assert action in game.legal_actions()
+        agents = [SimpleAgent(i, seed) for i in range(3)]
+        while not game.check_end():
+            apply_action(game, agents[game.current_turn].act(game))
+        assert game.score <= best
+
+
+def test_table_bound_and_parallel_root_split():
+    game = endgame(3, 4, 5)
+    full, small = Solver(), Solver(table_size=50)
+    assert full.value(position(game)) == small.value(position(game))
+    assert len(small.table) == 50 and small.stats()["evictions"] > 0
+    serial = solve(game, workers=1)
+    parallel = solve(game, workers=2)
+    assert serial["moves"] == parallel["moves"] and serial["orders"] > 1
+    assert serial["expected"] == max(serial["moves"].values())
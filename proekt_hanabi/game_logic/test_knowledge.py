@@ -0,0 +1,75 @@
+import random
+from game_logic.cards import COUNTS, CARD_NUMBER, EMPTY
+from game_logic.state import GameState
+from game_logic.actions import apply_action
+from game_logic.knowledge import Knowledge, ALL, COLOR_MASK, RANK_MASK, mask_cards
+from game_logic.sim import simulate, InferenceAgent, SimpleAgent
+
+
+def test_possibilities_always_hold_the_real_card():
+    rng = random.Random(5)
+    for seed in range(20):
+        game = GameState(["A", "B", "C", "D"], seed=seed)
+        kn = Knowledge(game)
+        while not game.check_end():
+            action = rng.choice(game.legal_actions())
+            apply_action(game, action)
+            kn.observe(action)
+            for player, ps in enumerate(game.players):
+                # unseen copies from scratch: everything minus board, discards and the other hands
+                seen = [0] * 25
+                for card in game.discards:
+                    seen[card.code] += 1
+                for color, top in game.board.items():
+                    for n in range(1, top + 1):
+                        seen[color.value * 5 + n - 1] += 1
+                for other, ops in enumerate(game.players):
+                    if other != player:
+                        for code in ops.hand.codes:
+                            if code != EMPTY:
+                                seen[code] += 1
+                assert list(kn.unseen(player)) == [COUNTS[CARD_NUMBER[k]] - seen[k] for k in range(25)]
+                for slot, code in enumerate(ps.hand.codes):
+                    if code != EMPTY:
+                        assert code in kn.possible(player, slot)
+                        assert abs(sum(kn.probabilities(player, slot).values()) - 1) < 1e-9
+
+
+def test_negative_hints_and_restart_after_play():
+    game = GameState(["A", "B"], seed=3)
+    kn = Knowledge(game)
+    color = game.players[1].hand[0].color
+    action = ("H", 0, 1, color)
+    apply_action(game, action)
+    kn.observe(action)
+    for slot, card in enumerate(game.players[1].hand):
+        expected = COLOR_MASK[color] if card.color is color else ALL ^ COLOR_MASK[color]
+        assert kn.masks[1][slot] == expected
+    assert set(mask_cards(RANK_MASK[1])) == {k for k in range(25) if k % 5 == 0}
+    action = ("D", 1, 0)
+    apply_action(game, action)
+    kn.observe(action)
+    assert kn.masks[1][0] == ALL
+    # a Knowledge built midway keeps the positive hints
+    assert Knowledge(game).masks[1][1] & kn.masks[1][1] == kn.masks[1][1]
+
+
+def test_inference_agent_beats_simple():
+    infer = [r.score for r in simulate(InferenceAgent, 4, 60, workers=1)]
+    simple = [r.score for r in simulate(SimpleAgent, 4, 60, workers=1)]
+    assert sum(infer) > sum(simple)
+
+
+def test_inference_agent_only_makes_legal_moves():
+    for players in (2, 3, 5):
+        for seed in range(40):
+            game = GameState([f"bot{i}" for i in range(players)], seed=seed)
+            kn = Knowledge(game)
+            agents = [InferenceAgent(i, seed) for i in range(players)]
+            for agent in agents:
+                agent.knowledge = kn
+            while not game.check_end():
+                action = agents[game.current_turn].act(game)
+                game.validate(action)
+                apply_action(game, action)
+                kn.observe(action)
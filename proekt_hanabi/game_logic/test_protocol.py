@@ -0,0 +1,66 @@
+import asyncio, io, json, random, zlib
+import pytest
+from game_logic.state import GameState
+from game_logic.test_actions import play_random
+from game_logic.protocol import (encode_frame, decode_frame, read_frame, read_frame_async, HEADER, COMPRESSED,
+                                 MAX_FRAME, T_ERROR, T_STATE)
+
+
+def round_trip(msg, compress=False):
+    frame = encode_frame(msg, compress)
+    length, t = HEADER.unpack_from(frame)
+    assert length == len(frame) - HEADER.size
+    return decode_frame(t, frame[HEADER.size:]), t
+
+
+@pytest.mark.parametrize("players", [2, 5])
+def test_state_and_deltas_round_trip(players):
+    gs = GameState([f"P{i}" for i in range(players)], seed=players)
+    rng = random.Random(players)
+    while not gs.check_end():
+        play_random(gs, rng, 1)
+        delta = {"type": "DELTA", **gs.last_delta}
+        assert round_trip(delta)[0] == json.loads(json.dumps(delta))
+    state = {"type": "STATE", **gs.serialize_state()}
+    for compress in (False, True):
+        assert round_trip(state, compress)[0] == state
+
+
+def test_moves_are_tiny_and_compression_is_flagged():
+    for msg in [{"type":"PLAY","player_idx":1,"card_idx":4},
+                {"type":"DISC","player_idx":0,"card_idx":0},
+                {"type":"HINT","from":0,"to":2,"color":"WHITE"},
+                {"type":"HINT","from":1,"to":0,"number":3},
+                {"type":"RESYNC"}]:
+        assert len(encode_frame(msg)) <= HEADER.size + 3
+        assert round_trip(msg)[0] == msg
+    long_error = {"type": "ERROR", "msg": "x" * 1000}
+    decoded, t = round_trip(long_error, compress=True)
+    assert t & COMPRESSED and decoded == long_error
+
+
+def test_read_frame_from_stream():
+    frames = encode_frame({"type":"RESYNC"}) + encode_frame({"type":"ERROR","msg":"bad"})
+    f = io.BytesIO(frames)
+    assert read_frame(f) == {"type": "RESYNC"}
+    assert read_frame(f) == {"type": "ERROR", "msg": "bad"}
+    assert read_frame(f) is None
+
+
+BOMB = zlib.compress(b"x" * (MAX_FRAME + 1))
+
+@pytest.mark.parametrize("frame", [
+    HEADER.pack(0xFFFFFFF0, T_ERROR),                                  # announces ~4 GiB
+    HEADER.pack(len(BOMB), T_ERROR | COMPRESSED) + BOMB,               # inflates past MAX_FRAME
+    HEADER.pack(2, T_ERROR) + b"\xff\xfe",                             # ERROR text is not UTF-8
+    HEADER.pack(4, T_ERROR | COMPRESSED) + b"junk",                    # not zlib
+    HEADER.pack(3, T_STATE) + b"\x09ab",                               # STATE cut short
+], ids=["too_long", "zlib_bomb", "bad_utf8", "bad_zlib", "truncated"])
+def test_bad_frames_read_as_a_hang_up(frame):
+    data = frame + encode_frame({"type": "RESYNC"})
+    assert read_frame(io.BytesIO(data)) is None
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        return await read_frame_async(reader) # never waits for the announced bytes
+    assert asyncio.run(asyncio.wait_for(read(), 1)) is None
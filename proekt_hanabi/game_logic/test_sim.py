@@ -0,0 +1,21 @@
+from game_logic.sim import simulate, play_game, RandomAgent, SimpleAgent, GameResult
+
+
+def test_games_are_reproducible_per_seed():
+    assert play_game(SimpleAgent, 3, 11) == play_game(SimpleAgent, 3, 11)
+    result = play_game(RandomAgent, 2, 4)
+    assert isinstance(result, GameResult) and result.seed == 4
+    assert 0 <= result.score <= 25 and result.misfires <= 3
+
+
+def test_process_pool_matches_serial_run():
+    serial = list(simulate(SimpleAgent, 4, 30, base_seed=100, workers=1, batch_size=7))
+    parallel = sorted(simulate(SimpleAgent, 4, 30, base_seed=100, workers=2, batch_size=7))
+    assert [r.seed for r in serial] == list(range(100, 130))
+    assert sorted(serial) == parallel
+
+
+def test_simple_agent_beats_random():
+    simple = [r.score for r in simulate(SimpleAgent, 3, 50, workers=1)]
+    rand = [r.score for r in simulate(RandomAgent, 3, 50, workers=1)]
+    assert sum(simple) > 3 * sum(rand)
@@ -1,6 +1,6 @@
 import pytest
-from cards import Deck, Card, Color
-from state import GameState
+from game_logic.cards import Deck, Card, Color
+from game_logic.state import GameState
 
 
 def test_deck_count_and_draw():
@@ -41,10 +41,28 @@ def test_discard_clears_hints_and_draw():
     gs = GameState(["P1", "P2"])
     # set up hint at slot
     gs.players[1].hints[2].append('1')
+    # cards are interned by value, so make sure the replacement is a different card
+    gs.players[1].hand[2] = Card(1, Color.RED)
+    gs.deck.cards[-1] = Card(2, Color.BLUE).code
     old = gs.players[1].hand[2]
     gs.discard(1, 2)
     assert gs.players[1].hints[2] == []
     assert gs.players[1].hand[2] != old
+    assert gs.players[1].hand[2] is Card(2, Color.BLUE)
+
+
+def test_cards_are_interned_and_hints_are_masks():
+    assert Card(3, Color.GREEN) is Card(3, Color.GREEN)
+    for number, color in ((6, Color.RED), (0, Color.WHITE), (1, "RED"), (1, 0)):
+        with pytest.raises(ValueError):
+            Card(number, color)
+    deck = Deck()
+    assert len({id(deck.draw()) for _ in range(50)}) == 25
+    gs = GameState(["P1", "P2"])
+    gs.players[0].hints[1] = ['2', 'BLUE', 'BLUE']
+    assert gs.players[0].hints[1] == ['BLUE', '2']
+    assert gs.players[0].color_hints[1] == 1 << Color.BLUE.value
+    assert gs.players[0].rank_hints[1] == 1 << 1
 
 
 def test_give_hint_color_and_number():
@@ -82,10 +100,84 @@ def test_check_end_conditions():
     assert gs.check_end() is True
 
 
+def test_clone_is_independent():
+    gs = GameState(["P1", "P2", "P3"], seed=3)
+    gs.give_hint(0, 1, number=1)
+    twin = gs.clone()
+    assert twin.checkpoint() == gs.checkpoint()
+    twin.discard(1, 0)
+    twin.give_hint(2, 0, color=Color.RED)
+    assert gs.version == 1 and gs.deck.get_deck_count() == twin.deck.get_deck_count() + 1
+    assert gs.checkpoint() != twin.checkpoint()
+
+
+def test_apply_undo_restores_every_field():
+    gs = GameState(["P1", "P2", "P3"], seed=9)
+    start = gs.checkpoint()
+    actions = [("H", 0, 1, Color.GREEN), ("P", 1, 0), ("D", 2, 4), ("H", 0, 2, 3), ("P", 1, 2), ("D", 2, 0)]
+    history = []
+    for action in actions:
+        history.append((gs.checkpoint(), gs.apply(action)))
+    for before, token in reversed(history):
+        gs.undo(token)
+        assert gs.checkpoint() == before
+    assert gs.checkpoint() == start
+
+
+def test_counters_follow_every_action_undo_and_restore():
+    import random
+    from game_logic.test_actions import play_random
+    rng = random.Random(4)
+    for seed in range(30):
+        gs = GameState(["P1", "P2", "P3"], seed=seed)
+        while not gs.check_end():
+            before = (gs.score, gs.max_score, gs.discarded.tolist())
+            token = gs.apply(rng.choice(gs.legal_actions()))
+            assert gs.score == sum(gs.board.values())
+            assert gs.max_score == gs.reachable_score() >= gs.score
+            restored = GameState.from_serialized(gs.checkpoint())
+            assert (restored.score, restored.max_score) == (gs.score, gs.max_score)
+            gs.undo(token)
+            assert (gs.score, gs.max_score, gs.discarded.tolist()) == before
+            play_random(gs, rng, 1)
+    # a 5 has a single copy: discarding it caps that tower at 4
+    gs = GameState(["P1", "P2"])
+    gs.players[0].hand[0] = Card(5, Color.BLUE)
+    gs.discard(0, 0)
+    assert gs.max_score == 24
+
+
+def test_legal_actions_and_validation():
+    gs = GameState(["P1", "P2", "P3"], seed=1)
+    legal = gs.legal_actions()
+    assert len(legal) == len(set(legal)) and all(a[1] == 0 for a in legal)
+    for action in legal:
+        gs.validate(action)
+    hints = [a for a in legal if a[0] == "H"]
+    assert {a[2] for a in hints} == {1, 2}
+    # every hint that is not listed touches no card
+    for to in (1, 2):
+        for value in (*Color, 1, 2, 3, 4, 5):
+            if ("H", 0, to, value) not in legal:
+                with pytest.raises(ValueError, match="touches no cards"):
+                    gs.validate(("H", 0, to, value))
+    with pytest.raises(ValueError, match="Not your turn"):
+        gs.validate(("D", 1, 0))
+    with pytest.raises(ValueError, match="yourself"):
+        gs.validate(("H", 0, 0, 1))
+    gs.tokens = 0
+    assert not [a for a in gs.legal_actions() if a[0] == "H"]
+    gs.misfires = 3
+    assert gs.legal_actions() == []
+    with pytest.raises(ValueError, match="over"):
+        gs.validate(("D", 0, 0))
+
+
 def test_serialize_state_structure():
     gs = GameState(["P1", "P2"])
     snap = gs.serialize_state()
-    assert set(snap.keys()) == {'board', 'tokens', 'misfires', 'deck_count', 'hands', 'current_turn'}
+    assert set(snap.keys()) == {'game_id', 'player_names', 'board', 'tokens', 'misfires', 'deck_count',
+                                'discards', 'hands', 'current_turn', 'version'}
     assert isinstance(snap['hands'], list)
     assert len(snap['hands']) == 2
 
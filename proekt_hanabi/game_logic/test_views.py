@@ -0,0 +1,20 @@
+from game_logic.state import GameState
+from game_logic.views import seat_state, seat_delta, HIDDEN
+
+
+def test_seat_views_hide_only_the_own_cards():
+    gs = GameState(["A", "B", "C"], seed=2)
+    gs.give_hint(0, 1, number=gs.players[1].hand[0].number)
+    state = {"type": "STATE", **gs.serialize_state()}
+    view = seat_state(state, 1)
+    assert view["hands"][0] is state["hands"][0] and view["hands"][2] is state["hands"][2]
+    assert [c["hints"] for c in view["hands"][1]] == [c["hints"] for c in state["hands"][1]]
+    assert all(c["number"] is None and c["color"] is None for c in view["hands"][1])
+    assert state["hands"][1][0]["number"] is not None # the shared message is untouched
+
+    gs.discard(1, 0)
+    delta = {"type": "DELTA", **gs.last_delta}
+    # everyone but the drawing seat shares the very same message
+    assert seat_delta(delta, 0) is delta and seat_delta(delta, 2) is delta
+    assert seat_delta(delta, 1)["slot"] == [1, 0, HIDDEN]
+    assert seat_delta(delta, 1)["discard"] == delta["discard"]
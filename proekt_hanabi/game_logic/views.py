@@ -0,0 +1,34 @@
+'''
+What one seat may see. A player never receives the identity of their own cards, only the hints
+on them; everything else (other hands, board, discards) is public. seat_state / seat_delta derive
+a seat's view from the one STATE / DELTA message the server builds per version, copying only
+what differs: for a DELTA that is at most the drawn card of the acting seat, so every other seat
+(and every spectator watching from that seat) shares the unchanged message object and its bytes.
+'''
+HIDDEN = {"number": None, "color": None}
+
+
+def hide_hand(hand: list) -> list:
+    return [{**HIDDEN, "hints": card["hints"]} for card in hand]
+
+
+def seat_state(msg: dict, seat) -> dict:
+    ''' STATE as seen from `seat`, None = every card visible (server internal use only) '''
+    if seat is None:
+        return msg
+    hands = list(msg["hands"])
+    hands[seat] = hide_hand(hands[seat])
+    return {**msg, "hands": hands}
+
+
+def delta_seat(msg: dict):
+    ''' the only seat whose view of this DELTA differs from the shared one, or None '''
+    slot = msg.get("slot")
+    return slot[0] if slot is not None else None
+
+
+def seat_delta(msg: dict, seat) -> dict:
+    if seat is None or delta_seat(msg) != seat:
+        return msg
+    player, idx, _ = msg["slot"]
+    return {**msg, "slot": [player, idx, HIDDEN]}
@@ -0,0 +1,151 @@
+import asyncio, os, socket
+import redis
+'''
+Cluster mode: several server processes share one Redis (the Sentinel master) and route players
+between themselves, clients only need the address of any node.
+
+    hanabi:nodes              set   ids of registered nodes
+    hanabi:node:{id}          hash  host, port, connections, rooms, open_seats   (expires after NODE_TTL)
+    hanabi:node_games:{id}    set   games owned by the node
+    hanabi:owner:{game_id}    str   node id running the game
+    hanabi:room:{name}        str   node id hosting a named room                 (expires after ROOM_TTL)
+
+Every node refreshes its hash each HEARTBEAT seconds. A JOIN is served locally or answered with
+{"type": "REDIRECT", "host", "port"} (before ASSIGN_IDX, so always a JSON line):
+    - game_id: to the node that owns the game, if that node is alive
+    - room:    to the node the room name is pinned to, pinning it to the least loaded node first
+    - neither: to a node with a free lobby seat, else to the least loaded node
+A redirected client sends its JOIN again with "routed": true, which is always served locally.
+
+A node whose hash expired is dead. The first live node to notice takes over its games: ownership
+moves to the survivor, and the games are loaded from the event log (server/eventlog.py) when the
+players come back with their game_id, exactly like any resume.
+'''
+HEARTBEAT = 2.0
+NODE_TTL = 3 * HEARTBEAT
+ROOM_TTL = 300
+
+NODES = "hanabi:nodes"
+def node_key(node_id): return f"hanabi:node:{node_id}"
+def games_key(node_id): return f"hanabi:node_games:{node_id}"
+def owner_key(game_id): return f"hanabi:owner:{game_id}"
+def room_key(name): return f"hanabi:room:{name}"
+def takeover_key(node_id): return f"hanabi:takeover:{node_id}"
+
+# anything Redis can refuse, not only a lost connection: an OOM ResponseError must not end the heartbeat
+REDIS_ERRORS = (redis.exceptions.RedisError, OSError)
+
+
+class Cluster():
+    def __init__(self, r, host: str, port: int, node_id: str = None, reconnect=None):
+        self.r = r
+        self.reconnect = reconnect
+        self.host, self.port = host, port # address other nodes send clients to
+        self.node_id = node_id or f"{socket.gethostname()}:{port}"
+        self.adopted = 0 # games taken over from dead nodes
+
+    @classmethod
+    def from_env(cls, r, port: int, reconnect=None):
+        ''' NODE_HOST is the address clients can reach this node on (the compose service name) '''
+        host = os.getenv("NODE_HOST", socket.gethostname())
+        return cls(r, host, int(os.getenv("NODE_PORT", port)), os.getenv("NODE_ID"), reconnect)
+
+    # -- registry --
+    async def register(self, connections: int = 0, rooms: int = 0, open_seats: int = 0):
+        async with self.r.pipeline(transaction=True) as pipe:
+            pipe.sadd(NODES, self.node_id)
+            pipe.hset(node_key(self.node_id), mapping={
+                "host": self.host, "port": self.port,
+                "connections": connections, "rooms": rooms, "open_seats": open_seats,
+            })
+            pipe.expire(node_key(self.node_id), int(NODE_TTL))
+            await pipe.execute()
+
+    async def nodes(self) -> dict:
+        ''' node id -> info of every live node '''
+        ids = sorted(await self.r.smembers(NODES))
+        async with self.r.pipeline(transaction=False) as pipe:
+            for node in ids:
+                pipe.hgetall(node_key(node))
+            infos = await pipe.execute()
+        return {node: info for node, info in zip(ids, infos) if info}
+
+    # -- ownership --
+    async def claim(self, game_id: str):
+        async with self.r.pipeline(transaction=True) as pipe:
+            pipe.set(owner_key(game_id), self.node_id)
+            pipe.sadd(games_key(self.node_id), game_id)
+            await pipe.execute()
+
+    async def release(self, game_id: str):
+        ''' the game's room closed here, whoever gets the players back may run it '''
+        async with self.r.pipeline(transaction=True) as pipe:
+            pipe.delete(owner_key(game_id))
+            pipe.srem(games_key(self.node_id), game_id)
+            await pipe.execute()
+
+    # -- routing --
+    def _least_loaded(self, nodes: dict) -> str:
+        # ties stay here, so an idle cluster does not bounce clients around
+        return min(nodes, key=lambda n: (int(nodes[n]["connections"]), n != self.node_id))
+
+    async def route(self, join: dict):
+        ''' (host, port) of the node that should serve this JOIN, None to serve it here '''
+        if join.get("routed"):
+            return None
+        nodes = await self.nodes()
+        if self.node_id not in nodes or len(nodes) == 1:
+            return None # not registered yet / alone
+        if join.get("game_id"):
+            target = await self.r.get(owner_key(join["game_id"]))
+            if target not in nodes:
+                target = None # unowned, or the owner died: resume here
+        elif join.get("room") is not None:
+            await self.r.set(room_key(join["room"]), self._least_loaded(nodes), nx=True, ex=ROOM_TTL)
+            target = await self.r.get(room_key(join["room"]))
+            if target not in nodes:
+                # pinned to a dead node, re-pin here
+                await self.r.set(room_key(join["room"]), self.node_id, ex=ROOM_TTL)
+                target = None
+        else:
+            waiting = [n for n, info in nodes.items() if int(info["open_seats"])]
+            target = self.node_id if self.node_id in waiting else (
+                waiting[0] if waiting else self._least_loaded(nodes))
+        if target is None or target == self.node_id:
+            return None
+        return nodes[target]["host"], int(nodes[target]["port"])
+
+    # -- failover --
+    async def takeover(self) -> list:
+        ''' adopt the games of nodes whose heartbeat expired, returns the adopted game ids '''
+        adopted = []
+        for node in await self.r.smembers(NODES):
+            if node == self.node_id or await self.r.exists(node_key(node)):
+                continue
+            if not await self.r.set(takeover_key(node), self.node_id, nx=True, ex=int(NODE_TTL)):
+                continue # another survivor is on it
+            games = list(await self.r.smembers(games_key(node)))
+            async with self.r.pipeline(transaction=True) as pipe:
+                for game_id in games:
+                    pipe.set(owner_key(game_id), self.node_id)
+                if games:
+                    pipe.sadd(games_key(self.node_id), *games)
+                pipe.delete(games_key(node))
+                pipe.srem(NODES, node)
+                await pipe.execute()
+            print(f"[WARN] Node {node} is gone, took over {len(games)} games")
+            adopted += games
+        self.adopted += len(adopted)
+        return adopted
+
+    async def run(self, load):
+        ''' heartbeat + failover loop, `load` returns the kwargs of register() '''
+        while True:
+            try:
+                await self.register(**load())
+                await self.takeover()
+            except REDIS_ERRORS as e:
+                print("[WARN] Cluster heartbeat failed:", e)
+                if self.reconnect is not None:
+                    self.r = self.reconnect()
+            await asyncio.sleep(HEARTBEAT)
@@ -0,0 +1,114 @@
+import json, os, time
+from game_logic.state import GameState
+from game_logic.actions import encode_action, decode_action, apply_action
+'''
+Event-sourced persistence of games in Redis. Per game:
+    hanabi:meta:{id}  hash  player_names (json), seed            written once at game start
+                            log_base                              only if the log was cut, see below
+    hanabi:log:{id}   list  every encoded action of the game      one RPUSH per move
+    hanabi:ckpt:{id}  str   GameState.checkpoint() json           every CHECKPOINT_EVERY moves
+The log is the full history (entry i is the action that made version i + 1), so seed + log
+replays the whole game for analytics (server/analytics.py). A checkpoint at version v lets a
+resume skip the first v entries: checkpoint + log[v:] always replay to the current state.
+If the write-behind queue had to give up queued actions (server/writebehind.py, MAX_PENDING), the
+log restarts at the version it reached, recorded as log_base: entry i is then the action that made
+version log_base + i + 1 and the game can be resumed but no longer replayed from its seed.
+
+The keys of a game being played never have a TTL. When its table empties (every player left) they
+get IDLE_TTL, so a game nobody comes back to expires instead of filling the memory; a resume
+PERSISTs them again. When a game ends it is listed in hanabi:finished (zset, score = end time) and
+its keys get FINISHED_TTL instead; server/archive.py moves finished games in bulk to a file and
+deletes their keys long before that runs out. Redis runs with `maxmemory-policy volatile-lru`, so
+under memory pressure only finished and abandoned games (and other expiring keys) can be evicted,
+never a running game.
+'''
+CHECKPOINT_EVERY = 16
+FINISHED_KEY = "hanabi:finished"
+FINISHED_TTL = int(os.getenv("FINISHED_TTL", str(7 * 24 * 3600))) # seconds a finished game waits for the archiver
+IDLE_TTL = int(os.getenv("IDLE_TTL", str(3 * 24 * 3600)))         # seconds an abandoned game waits for a resume
+
+
+def meta_key(game_id): return f"hanabi:meta:{game_id}"
+def log_key(game_id): return f"hanabi:log:{game_id}"
+def ckpt_key(game_id): return f"hanabi:ckpt:{game_id}"
+
+
+class ActionLog():
+    def __init__(self, r, checkpoint_every: int = CHECKPOINT_EVERY):
+        self.r = r # asyncio redis client
+        self.checkpoint_every = checkpoint_every
+
+    # stage_* queue commands on a pipeline, so a caller can batch many games in one round trip
+    def stage_create(self, pipe, game: GameState):
+        pipe.hset(meta_key(game.game_id), mapping={
+            "player_names": json.dumps([ps.name for ps in game.players]),
+            "seed": game.seed,
+        })
+        if not game.version:
+            # a resumed game keeps its history and checkpoint, a new one starts clean
+            pipe.delete(log_key(game.game_id), ckpt_key(game.game_id))
+            pipe.hdel(meta_key(game.game_id), "log_base")
+        if not game.check_end():
+            # back in play: the IDLE_TTL a resumed game got when its table emptied is lifted
+            for key in (meta_key(game.game_id), log_key(game.game_id), ckpt_key(game.game_id)):
+                pipe.persist(key)
+
+    def stage_actions(self, pipe, game_id: str, codes: list):
+        pipe.rpush(log_key(game_id), *codes)
+
+    def stage_truncate(self, pipe, game_id: str, base: int):
+        ''' restart the log at version `base`, stage with a checkpoint of at least that version '''
+        pipe.delete(log_key(game_id))
+        pipe.hset(meta_key(game_id), "log_base", base)
+
+    def stage_checkpoint(self, pipe, game: GameState):
+        ''' stage after the actions up to game.version, so the checkpoint never runs ahead of the log '''
+        pipe.set(ckpt_key(game.game_id), json.dumps(game.checkpoint()))
+
+    def stage_idle(self, pipe, game_id: str):
+        ''' stage after everything else of the game: its table emptied, let its keys expire unless resumed '''
+        for key in (meta_key(game_id), log_key(game_id), ckpt_key(game_id)):
+            pipe.expire(key, IDLE_TTL)
+
+    def stage_finish(self, pipe, game: GameState):
+        ''' stage after the last actions: queue the game for archival, let its keys expire '''
+        pipe.zadd(FINISHED_KEY, {game.game_id: time.time()})
+        for key in (meta_key(game.game_id), log_key(game.game_id), ckpt_key(game.game_id)):
+            pipe.expire(key, FINISHED_TTL)
+
+    async def create(self, game: GameState):
+        async with self.r.pipeline(transaction=True) as pipe:
+            self.stage_create(pipe, game)
+            await pipe.execute()
+
+    async def append(self, game: GameState, action: tuple):
+        ''' one pipelined round trip per move: the action, plus a checkpoint now and then '''
+        async with self.r.pipeline(transaction=True) as pipe:
+            self.stage_actions(pipe, game.game_id, [encode_action(action)])
+            if game.version % self.checkpoint_every == 0:
+                self.stage_checkpoint(pipe, game)
+            await pipe.execute()
+
+    async def load(self, game_id: str):
+        ''' rebuild the GameState from the last checkpoint (or the seed) and the actions after it '''
+        async with self.r.pipeline(transaction=True) as pipe:
+            pipe.hgetall(meta_key(game_id))
+            pipe.get(ckpt_key(game_id))
+            pipe.lrange(log_key(game_id), 0, -1)
+            meta, ckpt, log = await pipe.execute()
+        if not meta:
+            return None
+        return rebuild(game_id, json.loads(meta["player_names"]), int(meta["seed"]), ckpt, log,
+                       int(meta.get("log_base", 0)))
+
+
+def rebuild(game_id: str, player_names: list, seed: int, ckpt, log: list, log_base: int = 0) -> GameState:
+    ''' the game at the end of `log` from its checkpoint json (or the seed when there is none yet);
+    log[0] is the action that made version log_base + 1. Shared by every store (server/store.py) '''
+    if ckpt:
+        game = GameState.from_serialized(json.loads(ckpt))
+    else:
+        game = GameState(player_names, game_id=game_id, seed=seed)
+    for code in log[game.version - log_base:]:
+        apply_action(game, decode_action(code))
+    return game
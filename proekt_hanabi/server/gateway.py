@@ -0,0 +1,213 @@
+import asyncio, json, os
+import redis
+from game_logic.delta import apply_delta, StaleDelta
+from game_logic.protocol import JSON, BINARY, HEADER, encode_json, decode_frame
+from server.server import Conn, OUTBOX_FRAMES, get_master_client
+from server.spectate import channel, snapshot_key, BACKOFF_MIN, BACKOFF_MAX
+'''
+Spectator gateway: read-only viewers connect here instead of to a game server, so watching never
+loads a player connection. The gateway subscribes once per watched game to its Redis channel
+(server/spectate.py) and fans every frame out to all viewers of that game:
+
+    -> {"type": "SPECTATE", "game_id": "...", "proto": "bin"}   (proto optional, JSON by default)
+    <- STATE, then DELTA after every move, in the chosen wire format
+
+A frame is decoded once per game and encoded at most once per wire format: binary viewers get the
+published bytes as they are. Viewers sit behind the same outbound queues as players (server.Conn),
+so a slow viewer is coalesced onto a STATE and eventually dropped without delaying the others.
+When the subscription breaks (failover, network), the listener backs off, subscribes again to every
+watched game on a fresh connection and reloads the stored snapshots, so viewers only see a pause.
+
+Capacity (bench/bench_spectate.py, one core shared with the viewer sockets, 60 moves of one game):
+    2,000 viewers  JSON ~77,000 / binary ~81,000 frame deliveries/s
+    5,000 viewers  JSON ~72,000 / binary ~72,000 frame deliveries/s
+i.e. about 3,500 viewers per core on games running at 20 moves/s, proportionally more on slower
+(human) games. The per-viewer cost is the socket write, encoding is paid once per game.
+'''
+HOST = '0.0.0.0'
+GATEWAY_PORT = int(os.getenv("GATEWAY_PORT", "12400"))
+REDIS_ERRORS = (redis.exceptions.RedisError, OSError)
+
+
+class Feed():
+    '''One watched game: the gateway's censored copy of it and its viewers.'''
+    __slots__ = ("game_id", "state", "viewers", "snapshots", "loaded", "error")
+    def __init__(self, game_id: str):
+        self.game_id = game_id
+        self.loaded = asyncio.Event() # subscribed and the stored snapshot (if any) read, or failed
+        self.error = None   # why subscribing failed, raised to everyone waiting on loaded
+        self.state = None   # censored STATE dict patched with every DELTA, None while out of sync
+        self.viewers = []   # list of Conn
+        self.snapshots = {} # wire -> encoded STATE of the current version
+
+    def snapshot(self, conn: Conn) -> bytes:
+        data = self.snapshots.get(conn.wire)
+        if data is None:
+            data = self.snapshots[conn.wire] = conn.encode(self.state)
+        return data
+
+
+class SpectatorGateway():
+    def __init__(self, r, reconnect=None):
+        self.r = r # needs decode_responses=False, frames are binary
+        self.reconnect = reconnect # () -> new redis client, None keeps the current one
+        self.pubsub = r.pubsub()
+        self.feeds = {} # game_id -> Feed
+        self.task = None
+        self.frames = 0     # frames received from Redis
+        self.delivered = 0  # frames queued to viewers
+        self.slow_drops = 0
+        self.failures = 0   # times the subscription broke
+
+    async def watch(self, game_id: str) -> Feed:
+        feed = self.feeds.get(game_id)
+        if feed is None:
+            feed = self.feeds[game_id] = Feed(game_id)
+            try:
+                await self.pubsub.subscribe(channel(game_id))
+                snap = await self.r.get(snapshot_key(game_id))
+            except REDIS_ERRORS as e:
+                del self.feeds[game_id]
+                feed.error = e
+                feed.loaded.set() # viewers that came in meanwhile fail too instead of waiting forever
+                raise
+            if snap is not None and feed.state is None:
+                feed.state = decode_frame(snap[4], snap[HEADER.size:])
+            feed.loaded.set()
+            if self.task is None or self.task.done():
+                self.task = asyncio.get_running_loop().create_task(self._listen())
+        await feed.loaded.wait()
+        if feed.error is not None:
+            raise feed.error
+        return feed
+
+    async def unwatch(self, feed: Feed):
+        if not feed.viewers and self.feeds.get(feed.game_id) is feed:
+            del self.feeds[feed.game_id]
+            try:
+                await self.pubsub.unsubscribe(channel(feed.game_id))
+            except REDIS_ERRORS:
+                pass # subscription is broken, the next one leaves this game out
+
+    async def _listen(self):
+        prefix = len(channel(""))
+        backoff, broken = BACKOFF_MIN, False
+        while self.feeds:
+            try:
+                if broken:
+                    await self._resubscribe()
+                    broken, backoff = False, BACKOFF_MIN
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except REDIS_ERRORS as e:
+                self.failures += 1
+                print(f"[WARN] Spectator subscription lost ({e}), resubscribing in {backoff:.2f}s")
+                broken = True
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, BACKOFF_MAX)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            feed = self.feeds.get(message["channel"][prefix:].decode())
+            if feed is not None:
+                self.on_frame(feed, message["data"])
+
+    async def _resubscribe(self):
+        ''' fresh connection and subscription for every watched game, then the stored snapshots:
+        frames published while the subscription was down are lost, a newer snapshot replaces them '''
+        try:
+            await self.pubsub.aclose()
+        except REDIS_ERRORS:
+            pass # the old connection is gone already
+        if self.reconnect is not None:
+            self.r = self.reconnect()
+        self.pubsub = self.r.pubsub()
+        feeds = list(self.feeds.values())
+        if not feeds:
+            return
+        await self.pubsub.subscribe(*(channel(feed.game_id) for feed in feeds))
+        snaps = await self.r.mget([snapshot_key(feed.game_id) for feed in feeds])
+        for feed, snap in zip(feeds, snaps):
+            if snap is None:
+                continue
+            version = decode_frame(snap[4], snap[HEADER.size:])["version"]
+            if feed.state is None or version > feed.state["version"]:
+                self.on_frame(feed, snap)
+
+    def on_frame(self, feed: Feed, data: bytes):
+        self.frames += 1
+        msg = decode_frame(data[4], data[HEADER.size:])
+        if msg["type"] == "STATE":
+            if feed.state is not None and feed.state["version"] == msg["version"] \
+                    and feed.state["game_id"] == msg["game_id"]:
+                return # periodic snapshot of a version the viewers already have
+            feed.state = msg
+            full = True
+        else:
+            if feed.state is None:
+                return # wait for the next snapshot
+            try:
+                apply_delta(feed.state, msg)
+            except StaleDelta:
+                feed.state = None
+                return
+            full = False
+        feed.snapshots = {}
+        frames = {BINARY: data} # binary viewers get the published bytes (never compressed) as they are
+        for conn in feed.viewers:
+            was_closed = conn.closed
+            if full or conn.backlog() < OUTBOX_FRAMES:
+                frame = frames.get(conn.proto)
+                if frame is None:
+                    frame = frames[conn.proto] = encode_json(msg)
+                queued = conn.push(frame, game=True, snapshot=full)
+            else:
+                queued = conn.push(feed.snapshot(conn), game=True, snapshot=True)
+            if queued:
+                self.delivered += 1
+            elif not was_closed:
+                self.slow_drops += 1
+
+    async def handle_viewer(self, reader, writer):
+        line = await reader.readline()
+        try:
+            req = json.loads(line)
+        except ValueError:
+            req = {}
+        if req.get("type") != "SPECTATE" or not req.get("game_id"):
+            writer.write(encode_json({"type":"ERROR","msg":"Expected SPECTATE with a game_id"}))
+            writer.close()
+            return
+        try:
+            feed = await self.watch(req["game_id"])
+        except REDIS_ERRORS:
+            writer.write(encode_json({"type":"ERROR","msg":"Spectating is unavailable, try again"}))
+            writer.close()
+            return
+        conn = Conn(writer, "viewer", BINARY if req.get("proto") == BINARY else JSON)
+        feed.viewers.append(conn)
+        if feed.state is not None:
+            conn.push(feed.snapshot(conn), game=True, snapshot=True)
+        try:
+            while await reader.read(1024):
+                pass # viewers have nothing to say, just wait for them to leave
+        except ConnectionError:
+            pass
+        finally:
+            conn.close()
+            feed.viewers.remove(conn)
+            await self.unwatch(feed)
+            writer.close()
+
+    async def serve(self, host: str = HOST, port: int = GATEWAY_PORT):
+        srv = await asyncio.start_server(self.handle_viewer, host, port, backlog=4096)
+        print(f"Spectator gateway listening on {host}:{port}")
+        async with srv:
+            await srv.serve_forever()
+
+
+def main():
+    asyncio.run(SpectatorGateway(get_master_client(decode_responses=False),
+                                 reconnect=lambda: get_master_client(decode_responses=False)).serve())
+
+if __name__ == "__main__":
+    main()
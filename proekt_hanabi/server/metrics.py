@@ -0,0 +1,140 @@
+import asyncio, json
+from bisect import bisect_left
+from urllib.parse import urlsplit, parse_qs
+'''
+Opt-in metrics for the game server: an in-process registry rendered as Prometheus text on a local
+HTTP port (METRICS_PORT, unset = disabled). With metrics disabled the server holds None instead of
+a Metrics object and every instrumentation point is a single `if m is not None` check.
+
+Phases timed per move (histograms, seconds):
+    lock_wait   waiting for the room lock
+    mutate      GameState.play_card / give_hint / discard
+    serialize   building the STATE / DELTA message and encoding it once per wire format
+    send        writing the frames to every connection of the room
+    redis       one write-behind flush (all games pending at that moment)
+Gauges (connections, rooms, lobby seats, write-behind queue) are callbacks read at scrape time.
+
+    GET /metrics                  Prometheus text
+    GET /profile?game=<game_id>   arm per-phase timing of one game, later calls return what it
+                                  recorded so far as JSON (count / total / mean / max per phase)
+'''
+# 10us .. 1s, the range a move can take between an idle core and a stalled Redis
+BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+PHASES = ("lock_wait", "mutate", "serialize", "send", "redis")
+
+
+class Histogram():
+    __slots__ = ("name", "help", "buckets", "counts", "sum", "count")
+    def __init__(self, name: str, help: str, buckets=BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        total = 0
+        for le, n in zip(self.buckets, self.counts):
+            total += n
+            lines.append(f'{self.name}_bucket{{le="{le}"}} {total}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+class Counter():
+    __slots__ = ("name", "help", "value")
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self.value = 0
+
+    def inc(self, n: int = 1):
+        self.value += n
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter",
+                f"{self.name} {self.value}"]
+
+
+class Gauge():
+    __slots__ = ("name", "help", "fn")
+    def __init__(self, name: str, help: str, fn):
+        self.name, self.help = name, help
+        self.fn = fn # () -> number, evaluated on scrape only
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {self.fn()}"]
+
+
+class Metrics():
+    def __init__(self):
+        self.phases = {
+            phase: Histogram(f"hanabi_{phase}_seconds", f"time per move spent in {phase}")
+            for phase in PHASES
+        }
+        self.moves = Counter("hanabi_moves_total", "moves applied")
+        self.errors = Counter("hanabi_move_errors_total", "moves rejected with an ERROR")
+        self.gauges = []
+        self.profiles = {} # game_id -> {phase: [seconds]}, only for games armed through /profile
+
+    def gauge(self, name: str, help: str, fn):
+        self.gauges.append(Gauge(name, help, fn))
+
+    def observe(self, phase: str, seconds: float, game_id: str = None):
+        self.phases[phase].observe(seconds)
+        if self.profiles and game_id in self.profiles:
+            self.profiles[game_id].setdefault(phase, []).append(seconds)
+
+    def profile(self, game_id: str) -> dict:
+        ''' start recording game_id, or summarize what it recorded since it was armed '''
+        timings = self.profiles.get(game_id)
+        if timings is None:
+            self.profiles[game_id] = {}
+            return {"game_id": game_id, "armed": True}
+        return {"game_id": game_id, "phases": {
+            phase: {"count": len(values), "total_s": sum(values),
+                    "mean_s": sum(values) / len(values), "max_s": max(values)}
+            for phase, values in timings.items()
+        }}
+
+    def render(self) -> str:
+        lines = []
+        for metric in (*self.phases.values(), self.moves, self.errors, *self.gauges):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+    async def handle_http(self, reader, writer):
+        ''' just enough HTTP/1.0 for a Prometheus scrape or curl '''
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip():
+                pass # headers
+            parts = request.decode().split()
+            url = urlsplit(parts[1] if len(parts) > 1 else "/")
+            if url.path == "/metrics":
+                status, ctype, body = "200 OK", "text/plain; version=0.0.4", self.render()
+            elif url.path == "/profile" and "game" in parse_qs(url.query):
+                game_id = parse_qs(url.query)["game"][0]
+                status, ctype, body = "200 OK", "application/json", json.dumps(self.profile(game_id))
+            else:
+                status, ctype, body = "404 Not Found", "text/plain", "not found\n"
+            data = body.encode()
+            writer.write(f"HTTP/1.0 {status}\r\nContent-Type: {ctype}\r\n"
+                         f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start_http(self, host: str, port: int):
+        return await asyncio.start_server(self.handle_http, host, port)
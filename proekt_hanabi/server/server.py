@@ -1,11 +1,32 @@
-import redis,os
-import socket, threading, json
+import os
+import asyncio, json
+from collections import deque
+from time import perf_counter, monotonic
 from game_logic.state import GameState
-from game_logic.cards import Color
-from redis.sentinel import Sentinel
+from game_logic.actions import action_from_msg, apply_action
+from game_logic.protocol import JSON, BINARY, ZLIB, encode_json, encode_frame, read_frame_async
+from game_logic.views import seat_state, seat_delta, delta_seat
+from server.writebehind import WriteBehind
+from server.store import StateStore, MemoryStore
+from server.sqlstore import SQLiteStore
+from server.metrics import Metrics
+from server.cluster import Cluster, REDIS_ERRORS
+from server.spectate import SpectatorFeed, censor
+from server.archive import Archive, Archiver
+from redis.asyncio.sentinel import Sentinel
+'''
+Asyncio game server. One process hosts many independent rooms; every room has its own
+lobby, its own GameState and its own lock, so a move on one table never waits on another.
 
-HOST, PORT = '0.0.0.0', 12345
-# refactored to use sentinel 
+Capacity (bench/bench_rooms.py, one core shared with the bot clients, no Redis, 2 players per room):
+    1,000 rooms /  2,000 connections -> ~4,300 moves/s, each move fanned out as STATE to both seats
+    4,000 rooms /  8,000 connections -> ~3,300 moves/s
+The hard ceiling is file descriptors (one per connection, `ulimit -n`) and MAX_ROOMS; plan for
+about 4,000 active rooms per core so Redis writes and bursts keep headroom.
+'''
+
+HOST, PORT = '0.0.0.0', int(os.getenv("PORT", "12345"))
+# refactored to use sentinel
 # REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 # REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 
@@ -18,134 +39,524 @@ for node in SENTINEL_NODES:
     host, port = node.split(":")
     sentinel_endpoints.append((host, int(port)))
 
-# Connect via Sentinel
-sent = Sentinel(sentinel_endpoints, socket_timeout=0.1)
-def get_master_client():
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "16"))
+
+sent = None # Sentinel, created on first use so importing the server needs no Redis topology
+def get_master_client(decode_responses: bool = True):
     """
     Return a fresh Redis client pointing to the current master.
     """
+    global sent
+    if sent is None:
+        # the asyncio client only opens sockets on first command
+        sent = Sentinel(sentinel_endpoints, socket_timeout=0.1)
     return sent.master_for(
         SENTINEL_MASTER,
         socket_timeout=0.1,
-        decode_responses=True
+        decode_responses=decode_responses,
+        max_connections=REDIS_POOL_SIZE # pooled, the write-behind worker needs only a few
     )
-r = get_master_client()
-
-print(f"[*] Connected to Redis master via Sentinel '{SENTINEL_MASTER}' at {sentinel_endpoints}")
-
-LOBBY_SIZE = 2  # number of players required to start. >2, <= 5
-
-clients = []      # list of (conn, addr, name)
-lobby_names = []  # track names until game starts
-game = None # global variable. A single server process handles only 1 game instance. 
-lock = threading.Lock()
-
-def broadcast_state():
-    """Send current game state to all connected clients.
-    When master changed, rediscover master client"""
-    global r
-    snap = game.serialize_state()
-    snap_json = json.dumps(snap)
-    msg  = json.dumps({"type":"STATE", **snap}) + "\n"
-    state_key = f"hanabi:state:{game.game_id}"
-    # persist for future reloads
-    for attempt in range(2):
-        try:
-            r.set(state_key,snap_json)
-            r.set("hanabi:state", msg.strip())
-            break
-        except (redis.exceptions.ReadOnlyError, redis.exceptions.ConnectionError) as e:
-            # Master has been demoted, re-fetch the new one
-            print("[WARN] Master changed, re-discovering via Sentinel:", e)
-            
-            r = get_master_client()
-    else:
-        print("[ERROR] Could not write to Redis master after retry")
-    # send to all clients
-    for conn, _, _ in clients:
+
+LOBBY_SIZE = int(os.getenv("LOBBY_SIZE", "2"))  # number of players required to start. >2, <= 5
+MAX_ROOMS  = int(os.getenv("MAX_ROOMS", "5000")) # refuse new tables past the documented ceiling
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0")) # Prometheus text on this port, 0 = metrics off
+OUTBOX_FRAMES = int(os.getenv("OUTBOX_FRAMES", "64"))   # queued game frames before they collapse into one STATE
+LAG_BUDGET = float(os.getenv("LAG_BUDGET", "10"))       # seconds a connection may stay behind before it is dropped
+WATCHING = "watching" # Conn.seat of a watcher: the censored view, no hand visible
+CLUSTER = os.getenv("CLUSTER") == "1" # register in Redis and route players between nodes
+SPECTATE = os.getenv("SPECTATE") == "1" # publish censored frames for server/gateway.py
+ARCHIVE_PATH = os.getenv("ARCHIVE_PATH") # run an archiver of finished games into this file (server/archive.py)
+STORE = os.getenv("STORE", "redis") # where games are kept: redis, memory or sqlite:<path> (server/store.py)
+
+
+def encode(msg: dict) -> bytes:
+    return encode_json(msg)
+
+
+class Conn():
+    '''One player connection, the wire format it negotiated in JOIN and its outbound queue.
+
+    Frames are queued and handed to the transport by the connection's own pump task, so a
+    peer that reads slowly only ever delays itself. While the transport is backed up frames
+    wait in `outbox`; a STATE supersedes every game frame queued before it, and a connection
+    that stayed behind for more than LAG_BUDGET is dropped.'''
+    __slots__ = ("writer", "name", "seat", "proto", "compress", "outbox", "ready", "behind_since", "closed", "task")
+    def __init__(self, writer, name: str, proto: str = JSON, compress: bool = False, seat: int = None):
+        self.writer = writer
+        self.name = name
+        self.seat = seat # whose view of the game this connection gets
+        self.proto = proto
+        self.compress = compress
+        self.outbox = deque()      # (is_game_frame, bytes) not yet handed to the transport
+        self.ready = asyncio.Event()
+        self.behind_since = None   # monotonic time of the oldest frame the pump has not written
+        self.closed = False
+        self.task = asyncio.get_running_loop().create_task(self._pump())
+
+    @property
+    def wire(self):
+        return (self.proto, self.compress)
+
+    def encode(self, msg: dict) -> bytes:
+        if self.proto == BINARY:
+            return encode_frame(msg, self.compress)
+        return encode_json(msg)
+
+    async def read(self, reader):
+        '''Next message from the client as a dict, None on disconnect.'''
+        if self.proto == BINARY:
+            return await read_frame_async(reader)
+        line = await reader.readline()
+        return json.loads(line) if line else None
+
+    def backlog(self) -> int:
+        return len(self.outbox)
+
+    def push(self, data: bytes, game: bool = False, snapshot: bool = False) -> bool:
+        '''Queue an encoded frame. snapshot=True (a full STATE) drops the game frames it replaces.
+        Returns False if the connection is closed or was just dropped for lagging.'''
+        if self.closed:
+            return False
+        now = monotonic()
+        if self.behind_since is None:
+            self.behind_since = now
+        elif now - self.behind_since > LAG_BUDGET:
+            self.close()
+            return False
+        if snapshot and self.outbox:
+            self.outbox = deque(item for item in self.outbox if not item[0])
+        self.outbox.append((game, data))
+        self.ready.set()
+        return True
+
+    async def _pump(self):
         try:
-            conn.sendall(msg.encode())
-        except:
-            pass
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                while self.outbox:
+                    self.writer.write(self.outbox.popleft()[1])
+                await self.writer.drain() # only waits while the peer is not reading
+                if not self.outbox:
+                    self.behind_since = None
+        except ConnectionError:
+            self.closed = True
 
-def handle_client(conn, addr):
-    global game
-    conn_file = conn.makefile('r')
-
-    line = conn_file.readline()
-    if not line:
-        conn.close()
-        return
-    join   = json.loads(line)
-    name   = join.get("player")
-    old_id = join.get("game_id")
-
-    with lock:
-        if game is None:
-            if name in lobby_names:
-                err = json.dumps({"type":"ERROR","msg":"Name already taken"}) + "\n"
-                conn.sendall(err.encode())
-                return
+    def close(self):
+        '''Drop the connection without flushing, the reading side then sees EOF and cleans up.'''
+        if not self.closed:
+            self.closed = True
+            self.outbox.clear()
+            self.writer.transport.abort()
+        self.task.cancel()
 
-            idx = len(lobby_names)
-            lobby_names.append(name)
-            clients.append((conn, addr, name))
 
-            msg = json.dumps({"type":"ASSIGN_IDX","idx":idx}) + "\n"
-            conn.sendall(msg.encode())
+class Room():
+    '''A single table: lobby until LOBBY_SIZE players joined, then a running game.'''
+    def __init__(self, room_id: int, size: int):
+        self.room_id = room_id
+        self.size = size
+        self.clients = []      # list of Conn
+        self.lobby_names = []  # track names until game starts
+        self.resume_id = None  # game id requested by a joining player
+        self.game = None
+        self.finished = False  # game over and handed to the archiver
+        self.lock = asyncio.Lock() # serializes moves of this room only
+        self.watchers = []     # Conn of spectators looking over a seat's shoulder
+        self.views = {}        # (kind, seat or None, wire) -> bytes, for views_version only
+        self.base = {}         # kind -> the STATE / DELTA message all views derive from
+        self.views_version = None
 
-            if len(lobby_names) == LOBBY_SIZE:
-                if old_id:
-                    raw = r.get(f"hanabi:state:{old_id}")
-                    if raw:
-                        data = json.loads(raw)
-                        game = GameState.from_serialized(data)
-                    else:
-                        game = GameState(lobby_names)
-                else:
-                    game = GameState(lobby_names)
-                broadcast_state()
+    def is_open(self) -> bool:
+        return self.game is None and len(self.lobby_names) < self.size
+
+    def free_seat(self, name: str, game_id: str):
+        '''Seat of `name` in the running game if it asked for this game and nobody holds the seat
+        (the player dropped and reconnects), else None.'''
+        if game_id is None or game_id != self.game.game_id:
+            return None
+        for seat, ps in enumerate(self.game.players):
+            if ps.name == name and all(c.seat != seat for c in self.clients):
+                return seat
+        return None
+
+    def send(self, conn: Conn, msg: dict):
+        conn.push(conn.encode(msg))
 
+    def remove(self, conn: Conn):
+        '''Forget a connection that went away. A player leaving the lobby gives up its seat, the
+        players who joined after it move up one seat.'''
+        if self.game is None and any(c is conn for c in self.clients):
+            self.lobby_names.remove(conn.name)
+            for c in self.clients:
+                if c is not conn and c.seat != self.lobby_names.index(c.name):
+                    c.seat = self.lobby_names.index(c.name)
+                    self.send(c, {"type":"ASSIGN_IDX","idx":c.seat,"room":self.room_id})
+        self.clients[:] = [c for c in self.clients if c is not conn]
+        self.watchers[:] = [c for c in self.watchers if c is not conn]
+
+    def message(self, kind: str) -> dict:
+        '''The one STATE / DELTA of the current version, serialized once for every view of it.'''
+        if self.views_version != self.game.version:
+            self.views, self.base, self.views_version = {}, {}, self.game.version
+        msg = self.base.get(kind)
+        if msg is None:
+            body = self.game.serialize_state() if kind == "STATE" else self.game.last_delta
+            msg = self.base[kind] = {"type": kind, **body}
+        return msg
+
+    def view(self, conn: Conn, kind: str) -> bytes:
+        '''Encoded STATE / DELTA as conn's seat sees it (its own cards hidden). Cached per version,
+        seat and wire format: a DELTA only differs for the seat that drew a card, so most
+        recipients share one encoding.'''
+        msg = self.message(kind)
+        if conn.seat == WATCHING:
+            seat = WATCHING
+        elif kind == "STATE":
+            seat = conn.seat
         else:
-            err = json.dumps({"type":"ERROR","msg":"Game already in progress"}) + "\n"
-            conn.sendall(err.encode())
-            return
+            seat = conn.seat if delta_seat(msg) == conn.seat else None
+        key = (kind, seat, conn.wire)
+        data = self.views.get(key)
+        if data is None:
+            if seat == WATCHING:
+                view = censor(msg)
+            else:
+                view = seat_state(msg, seat) if kind == "STATE" else seat_delta(msg, seat)
+            data = self.views[key] = conn.encode(view)
+        return data
+
+
+class HanabiServer():
+    def __init__(self, lobby_size: int = LOBBY_SIZE, r=None, max_rooms: int = MAX_ROOMS, reconnect=None,
+                 metrics: Metrics = None, cluster: Cluster = None, spectators: SpectatorFeed = None,
+                 archiver: Archiver = None, store: StateStore = None):
+        self.lobby_size = lobby_size
+        self.r = r # redis client, None = no Redis event log unless `store` is given
+        self.metrics = metrics # None disables instrumentation
+        self.cluster = cluster # None = standalone node
+        self.spectators = spectators # None = no spectator feed
+        self.archiver = archiver # None = finished games wait for an external archiver (or their TTL)
+        # moves are persisted write-behind, store latency never reaches the room
+        if store is None and r is not None:
+            store = WriteBehind(r, reconnect=reconnect, metrics=metrics)
+        self.store = store # None disables persistence
+        self.max_rooms = max_rooms
+        self.rooms = {}  # room_id -> Room
+        self.next_room_id = 0
+        self.slow_drops = 0 # connections dropped for exceeding LAG_BUDGET
+        if metrics is not None:
+            self.register_gauges(metrics)
+
+    def load(self) -> dict:
+        '''What this node reports to the cluster registry.'''
+        return {
+            "connections": sum(len(room.clients) for room in self.rooms.values()),
+            "rooms": len(self.rooms),
+            "open_seats": sum(room.size - len(room.lobby_names) for room in self.rooms.values() if room.is_open()),
+        }
+
+    def register_gauges(self, m: Metrics):
+        m.gauge("hanabi_connections", "open player connections",
+                lambda: sum(len(room.clients) for room in self.rooms.values()))
+        m.gauge("hanabi_rooms", "rooms in lobby or playing", lambda: len(self.rooms))
+        m.gauge("hanabi_rooms_playing", "rooms with a running game",
+                lambda: sum(room.game is not None for room in self.rooms.values()))
+        m.gauge("hanabi_slow_consumer_drops", "connections dropped for lagging past LAG_BUDGET",
+                lambda: self.slow_drops)
+        m.gauge("hanabi_outbox_frames", "frames queued behind slow connections",
+                lambda: sum(c.backlog() for room in self.rooms.values() for c in room.clients))
+        m.gauge("hanabi_lobby_players", "players waiting in a lobby for the table to fill",
+                lambda: sum(len(room.lobby_names) for room in self.rooms.values() if room.game is None))
+        if self.store is not None:
+            m.gauge("hanabi_writebehind_depth", "actions queued for Redis",
+                    lambda: self.store.stats()["queue_depth"])
+            m.gauge("hanabi_writebehind_lag_seconds", "age of the oldest unwritten change",
+                    lambda: self.store.stats()["lag_s"])
+            m.gauge("hanabi_writebehind_games", "games with changes queued for Redis",
+                    lambda: self.store.stats()["queue_games"])
+            m.gauge("hanabi_writebehind_collapsed", "queued actions given up for checkpoints past MAX_PENDING",
+                    lambda: self.store.stats()["collapsed"])
+            m.gauge("hanabi_writebehind_dropped", "games left unwritten on shutdown",
+                    lambda: self.store.stats()["dropped"])
+            m.gauge("hanabi_writebehind_failures", "Redis flushes that failed and were retried",
+                    lambda: self.store.stats()["failures"])
+        if self.archiver is not None:
+            self.archiver.register_gauges(m)
 
-    while True:
-        line = conn_file.readline()
+    def find_room(self, room_id=None):
+        '''Return the requested room, or the first room whose lobby still has a free seat.'''
+        if room_id is not None:
+            room = self.rooms.get(room_id)
+            if room is None:
+                if len(self.rooms) >= self.max_rooms:
+                    return None
+                room = self.rooms[room_id] = Room(room_id, self.lobby_size)
+            return room
+        for room in self.rooms.values():
+            if room.is_open():
+                return room
+        if len(self.rooms) >= self.max_rooms:
+            return None
+        while self.next_room_id in self.rooms:
+            self.next_room_id += 1
+        room = self.rooms[self.next_room_id] = Room(self.next_room_id, self.lobby_size)
+        return room
+
+    async def broadcast_state(self, room: Room, full: bool = False):
+        """Send the last action of the room as a DELTA, or a full STATE snapshot
+        (game start / resume), each seat's view of it (see Room.view). A connection with
+        OUTBOX_FRAMES frames still queued gets one STATE instead, which replaces its backlog."""
+        m = self.metrics
+        if m is not None:
+            t0 = perf_counter()
+        full = full or room.game.last_delta is None
+        kind = "STATE" if full else "DELTA"
+        if self.spectators is not None:
+            self.spectators.publish(room.game, room.message(kind), full)
+        out = [] # (conn, bytes, is_snapshot)
+        for conn in (*room.clients, *room.watchers):
+            if full or conn.backlog() < OUTBOX_FRAMES:
+                out.append((conn, room.view(conn, kind), full))
+            else:
+                out.append((conn, room.view(conn, "STATE"), True))
+        if m is not None:
+            t1 = perf_counter()
+            m.observe("serialize", t1 - t0, room.game.game_id)
+        for conn, data, snapshot in out:
+            was_closed = conn.closed
+            if not conn.push(data, game=True, snapshot=snapshot) and not was_closed:
+                self.slow_drops += 1
+                print(f"[WARN] Dropped slow connection {conn.name} in room {room.room_id}")
+        if m is not None:
+            m.observe("send", perf_counter() - t1, room.game.game_id)
+
+    def send_state(self, room: Room, conn: Conn):
+        """Full snapshot for a single client that asked to RESYNC, it replaces whatever is queued."""
+        conn.push(room.view(conn, "STATE"), game=True, snapshot=True)
+
+    async def start_game(self, room: Room):
+        if room.resume_id and self.store is not None:
+            try:
+                room.game = await self.store.load(room.resume_id)
+            except self.store.ERRORS as e:
+                print("[WARN] Could not load game to resume, starting a new one:", e)
+        if room.game is None:
+            room.game = GameState(room.lobby_names)
+        names = [ps.name for ps in room.game.players]
+        if sorted(names) == sorted(room.lobby_names):
+            # a resumed game keeps its seating, whatever order the players came back in
+            for conn in room.clients:
+                if conn.seat != names.index(conn.name):
+                    conn.seat = names.index(conn.name)
+                    room.send(conn, {"type":"ASSIGN_IDX","idx":conn.seat,"room":room.room_id})
+        room.finished = room.game.check_end() # a resumed game that had ended is listed already
+        if self.store is not None:
+            self.store.submit_create(room.game)
+        if self.cluster is not None:
+            try:
+                await self.cluster.claim(room.game.game_id)
+            except REDIS_ERRORS as e:
+                print("[WARN] Could not register game ownership:", e)
+        await self.broadcast_state(room, full=True)
+
+    def apply(self, game, msg: dict, seat: int = None):
+        '''Apply a PLAY / HINT / DISC message of the player at `seat`, returns the action tuple or
+        None if it was not a move. Illegal moves raise ValueError before the game is touched.'''
+        action = action_from_msg(msg)
+        if action is not None:
+            if seat is not None and action[1] != seat:
+                raise ValueError("Not your seat")
+            game.validate(action)
+            apply_action(game, action)
+        return action
+
+    async def handle_client(self, reader, writer):
+        line = await reader.readline()
         if not line:
-            break
-        msg = json.loads(line)
-        with lock:
+            writer.close()
+            return
+        join   = json.loads(line)
+        name   = join.get("player")
+        old_id = join.get("game_id")
+
+        if self.cluster is not None:
             try:
-                if msg.get("type") == "PLAY":
-                    game.play_card(msg["player_idx"], msg["card_idx"])
-                elif msg.get("type") == "HINT":
-                    if "color" in msg:
-                        game.give_hint(msg["from"], msg["to"],color=Color[msg["color"]])
-                    elif "number" in msg:
-                        game.give_hint(msg["from"], msg["to"],number=msg["number"])
-                elif msg.get("type") == "DISC":
-                    game.discard(msg["player_idx"], msg["card_idx"])
-                broadcast_state()
-            except Exception as e:
-                err = json.dumps({"type":"ERROR","msg":str(e)}) + "\n"
-                conn.sendall(err.encode())
-    with lock:
-        clients[:] = [c for c in clients if c[0] != conn]
-        conn_file.close()
-        conn.close()
+                target = await self.cluster.route(join)
+            except REDIS_ERRORS:
+                target = None # registry unreachable, serve the player here
+            if target is not None:
+                writer.write(encode({"type":"REDIRECT","host":target[0],"port":target[1]}))
+                writer.close()
+                return
+
+        if join.get("watch") is not None:
+            await self.watch(join, reader, writer)
+            return
+
+        room = self.find_room(join.get("room"))
+        if room is None:
+            writer.write(encode({"type":"ERROR","msg":"Server full"}))
+            writer.close()
+            return
+        async with room.lock:
+            # errors before ASSIGN_IDX are always JSON lines, the wire format is not agreed yet
+            rejoin = None
+            if room.game is not None:
+                rejoin = room.free_seat(name, old_id)
+                if rejoin is None:
+                    writer.write(encode({"type":"ERROR","msg":"Game already in progress"}))
+                    writer.close()
+                    return
+            elif name in room.lobby_names:
+                writer.write(encode({"type":"ERROR","msg":"Name already taken"}))
+                writer.close()
+                return
+
+            proto = BINARY if join.get("proto") == BINARY else JSON
+            compress = proto == BINARY and join.get("compress") == ZLIB
+            if rejoin is not None:
+                idx = rejoin # back into a running game, the table never stopped
+            else:
+                idx = len(room.lobby_names)
+                room.lobby_names.append(name)
+                if old_id:
+                    room.resume_id = old_id
+            conn = Conn(writer, name, proto, compress, seat=idx)
+            room.clients.append(conn)
+            conn.push(encode({"type":"ASSIGN_IDX","idx":idx,"room":room.room_id,
+                              "proto":proto,"compress":ZLIB if compress else None}))
+
+            if rejoin is not None:
+                self.send_state(room, conn)
+            elif len(room.lobby_names) == room.size:
+                await self.start_game(room)
+
+        m = self.metrics
+        try:
+            while True:
+                msg = await conn.read(reader)
+                if msg is None:
+                    break
+                if m is not None:
+                    t0 = perf_counter()
+                async with room.lock:
+                    if msg.get("type") == "RESYNC":
+                        if room.game is not None:
+                            self.send_state(room, conn)
+                        continue
+                    try:
+                        if m is not None:
+                            t1 = perf_counter()
+                            m.observe("lock_wait", t1 - t0, room.game.game_id)
+                        action = self.apply(room.game, msg, conn.seat)
+                        if action is not None:
+                            if m is not None:
+                                m.observe("mutate", perf_counter() - t1, room.game.game_id)
+                                m.moves.inc()
+                            await self.broadcast_state(room)
+                            if self.store is not None:
+                                self.store.submit_action(room.game, action)
+                                if not room.finished and room.game.check_end(): # O(1), counters
+                                    room.finished = True
+                                    self.store.submit_finish(room.game)
+                    except Exception as e:
+                        if m is not None:
+                            m.errors.inc()
+                        room.send(conn, {"type":"ERROR","msg":str(e)})
+        except ConnectionError:
+            pass
+        finally:
+            conn.close()
+            async with room.lock: # a lobby seat must not go away while the game starts
+                room.remove(conn)
+            if not room.clients:
+                # last player left: table is gone, its state survives in the store for resume
+                self.rooms.pop(room.room_id, None)
+                for watcher in room.watchers:
+                    watcher.close()
+                if room.game is not None and self.store is not None:
+                    if not room.finished:
+                        self.store.submit_idle(room.game)
+                    self.store.forget(room.game.game_id)
+                if room.game is not None and self.cluster is not None:
+                    try:
+                        await self.cluster.release(room.game.game_id)
+                    except REDIS_ERRORS:
+                        pass # the owner key points at a live node that sends the game back here
+            writer.close()
+
+    async def watch(self, join: dict, reader, writer):
+        '''Spectator on this server watching a named room: {"type":"JOIN","room":...,"watch":seat}.
+        Whatever seat it names, it gets the censored view of the spectator gateway (every hand
+        hidden), otherwise a player could watch another seat and read their own cards. All
+        watchers share one cached encoding per version and wire format; they cannot move.'''
+        room = self.rooms.get(join.get("room"))
+        seat = join["watch"]
+        if room is None or not isinstance(seat, int) or not 0 <= seat < room.size:
+            writer.write(encode({"type":"ERROR","msg":"No such room or seat"}))
+            writer.close()
+            return
+        proto = BINARY if join.get("proto") == BINARY else JSON
+        compress = proto == BINARY and join.get("compress") == ZLIB
+        conn = Conn(writer, join.get("player") or "watcher", proto, compress, seat=WATCHING)
+        async with room.lock:
+            room.watchers.append(conn)
+            conn.push(encode({"type":"ASSIGN_IDX","idx":seat,"room":room.room_id,"watch":True,
+                              "proto":proto,"compress":ZLIB if compress else None}))
+            if room.game is not None:
+                self.send_state(room, conn)
+        try:
+            while True:
+                msg = await conn.read(reader)
+                if msg is None:
+                    break
+                if msg.get("type") == "RESYNC" and room.game is not None:
+                    async with room.lock:
+                        self.send_state(room, conn)
+        except ConnectionError:
+            pass
+        finally:
+            conn.close()
+            room.remove(conn)
+            writer.close()
+
+    async def serve(self, host: str = HOST, port: int = PORT, metrics_port: int = METRICS_PORT):
+        srv = await asyncio.start_server(self.handle_client, host, port)
+        if self.metrics is not None and metrics_port:
+            await self.metrics.start_http(host, metrics_port)
+            print(f"Metrics on http://{host}:{metrics_port}/metrics")
+        if self.cluster is not None:
+            asyncio.get_running_loop().create_task(self.cluster.run(self.load))
+            print(f"Cluster node {self.cluster.node_id}, reachable at {self.cluster.host}:{self.cluster.port}")
+        if self.archiver is not None:
+            asyncio.get_running_loop().create_task(self.archiver.run())
+            print(f"Archiving finished games to {self.archiver.archive.path}")
+        print(f"Server listening on {host}:{port}, rooms of {self.lobby_size} players, up to {self.max_rooms} rooms")
+        async with srv:
+            await srv.serve_forever()
 
 
 def main():
-    with socket.socket() as s:
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s.bind((HOST, PORT))
-        s.listen()
-        print(f"Server listening on {HOST}:{PORT}, waiting for {LOBBY_SIZE} players...")
-        while True:
-            conn, addr = s.accept()
-            threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
+    metrics = Metrics() if METRICS_PORT else None
+    r = None
+    if STORE == "redis" or CLUSTER or SPECTATE or ARCHIVE_PATH:
+        r = get_master_client()
+        print(f"[*] Using Redis master via Sentinel '{SENTINEL_MASTER}' at {sentinel_endpoints}")
+    if STORE == "redis":
+        store = WriteBehind(r, reconnect=get_master_client, metrics=metrics)
+    elif STORE == "memory":
+        store = MemoryStore()
+    elif STORE.startswith("sqlite:"):
+        store = SQLiteStore(STORE[len("sqlite:"):], metrics=metrics)
+    else:
+        raise SystemExit(f"Unknown STORE {STORE!r}, use redis, memory or sqlite:<path>")
+    print(f"[*] Games are kept in {STORE}")
+    cluster = Cluster.from_env(r, PORT, reconnect=get_master_client) if CLUSTER else None
+    spectators = SpectatorFeed(r, reconnect=get_master_client) if SPECTATE else None
+    archiver = Archiver(r, Archive(ARCHIVE_PATH), reconnect=get_master_client) if ARCHIVE_PATH else None
+    asyncio.run(HanabiServer(r=r, reconnect=get_master_client, metrics=metrics, cluster=cluster,
+                             spectators=spectators, archiver=archiver, store=store).serve())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,93 @@
+import asyncio
+from collections import deque
+import redis
+from game_logic.protocol import encode_frame
+from game_logic.views import HIDDEN, hide_hand
+'''
+Publishing side of spectator mode. The game server hands every STATE / DELTA of a room to
+SpectatorFeed.publish (never awaits, like the write-behind queue); a worker task pipelines them
+as binary frames to the Redis channel of the game, where server/gateway.py picks them up.
+
+    hanabi:spectate:{id}       channel  censored frames, in version order
+    hanabi:spectate_snap:{id}  str      last censored STATE frame, for viewers that join late
+
+Spectators never see the cards in hands (only the hints on them), so a player cannot use a
+spectator window to look at their own cards. Every SNAPSHOT_EVERY versions a censored STATE is
+also published and stored, so a gateway that missed a frame catches up without asking the server.
+'''
+SNAPSHOT_EVERY = 16
+SNAPSHOT_TTL = 3600
+MAX_QUEUE = 10000 # frames; past this the oldest are dropped, the next snapshot repairs the feed
+BACKOFF_MIN, BACKOFF_MAX = 0.05, 2.0
+
+def channel(game_id): return f"hanabi:spectate:{game_id}"
+def snapshot_key(game_id): return f"hanabi:spectate_snap:{game_id}"
+
+
+def censor(msg: dict) -> dict:
+    ''' spectator copy of a STATE / DELTA message: card identities in hands are hidden '''
+    if msg["type"] == "STATE":
+        return {**msg, "hands": [hide_hand(hand) for hand in msg["hands"]]}
+    if "slot" in msg:
+        player, idx, _ = msg["slot"]
+        return {**msg, "slot": [player, idx, HIDDEN]}
+    return msg
+
+
+class SpectatorFeed():
+    def __init__(self, r, reconnect=None, max_queue: int = MAX_QUEUE,
+                 snapshot_every: int = SNAPSHOT_EVERY):
+        self.r = r
+        self.reconnect = reconnect
+        self.max_queue = max_queue
+        self.snapshot_every = snapshot_every
+        self.queue = deque() # (game_id, frame, is_snapshot)
+        self.wakeup = None
+        self.task = None
+        self.published = 0
+        self.dropped = 0
+        self.failures = 0
+
+    def publish(self, game, msg: dict, full: bool = False):
+        ''' queue one broadcast of a room, encoded once for every gateway and viewer '''
+        self._push(game.game_id, encode_frame(censor(msg)), full)
+        if not full and game.version % self.snapshot_every == 0:
+            state = {"type": "STATE", **game.serialize_state()}
+            self._push(game.game_id, encode_frame(censor(state)), True)
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        self.wakeup.set()
+
+    def _push(self, game_id: str, frame: bytes, snapshot: bool):
+        if len(self.queue) >= self.max_queue:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append((game_id, frame, snapshot))
+
+    async def _run(self):
+        backoff = BACKOFF_MIN
+        while True:
+            if not self.queue:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            batch, self.queue = self.queue, deque()
+            try:
+                async with self.r.pipeline(transaction=False) as pipe:
+                    for game_id, frame, snapshot in batch:
+                        pipe.publish(channel(game_id), frame)
+                        if snapshot:
+                            pipe.set(snapshot_key(game_id), frame, ex=SNAPSHOT_TTL)
+                    await pipe.execute()
+                self.published += len(batch)
+                backoff = BACKOFF_MIN
+            except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError, OSError) as e:
+                # a live feed is not worth replaying: drop the batch, snapshots repair the viewers
+                self.failures += 1
+                self.dropped += len(batch)
+                print(f"[WARN] Spectator publish failed ({e}), retrying in {backoff:.2f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, BACKOFF_MAX)
+                if self.reconnect is not None:
+                    self.r = self.reconnect()
@@ -0,0 +1,101 @@
+import asyncio, json, sqlite3, threading, time
+from server.eventlog import rebuild, CHECKPOINT_EVERY
+from server.writebehind import WriteBehind, MAX_PENDING, LOAD_TIMEOUT
+'''
+Local file StateStore for single-node deployments: the write-behind queue of server/writebehind.py
+with SQLite instead of Redis underneath, no network round trip and no other process to run.
+
+    games    game_id, player_names (json), seed, log_base, checkpoint (json), finished (end time)
+    actions  game_id, version, code        the move that made `version`, one row per move
+
+Same model as the Redis event log (server/eventlog.py): checkpoint + the actions after it rebuild a
+game, log_base marks history given up past MAX_PENDING. The worker writes everything pending in one
+transaction; with WAL and synchronous=FULL a commit is one fsync, so the fsync is shared by every
+move of every game that queued while the previous commit was on its way to the disk (group commit),
+and the event loop never waits on it: commits run in a thread.
+'''
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS games (
+        game_id TEXT PRIMARY KEY, player_names TEXT NOT NULL, seed INTEGER,
+        log_base INTEGER NOT NULL DEFAULT 0, checkpoint TEXT, finished REAL)""",
+    """CREATE TABLE IF NOT EXISTS actions (
+        game_id TEXT NOT NULL, version INTEGER NOT NULL, code TEXT NOT NULL,
+        PRIMARY KEY (game_id, version)) WITHOUT ROWID""",
+)
+
+
+class SQLiteStore(WriteBehind):
+    ERRORS = (sqlite3.Error, OSError)
+    PHASE = None
+
+    def __init__(self, path: str, max_pending: int = MAX_PENDING,
+                 checkpoint_every: int = CHECKPOINT_EVERY, metrics=None, load_timeout: float = LOAD_TIMEOUT):
+        super().__init__(None, max_pending=max_pending, checkpoint_every=checkpoint_every, metrics=metrics,
+                         load_timeout=load_timeout)
+        self.path = path
+        # one connection shared by the commit thread and load(), one of them at a time
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db_lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=FULL")
+        for statement in SCHEMA:
+            self.db.execute(statement)
+
+    async def _store(self, batch: dict):
+        # everything read from the live games here, on the event loop; the thread only writes
+        ops = []
+        for game_id, entry in batch.items():
+            game = entry.game
+            if entry.create:
+                names = json.dumps([ps.name for ps in game.players])
+                if not game.version: # a resumed game keeps its history and checkpoint
+                    ops.append(("DELETE FROM games WHERE game_id = ?", [(game_id,)]))
+                    ops.append(("DELETE FROM actions WHERE game_id = ?", [(game_id,)]))
+                ops.append(("INSERT INTO games (game_id, player_names, seed) VALUES (?, ?, ?) ON CONFLICT (game_id)"
+                            " DO UPDATE SET player_names = excluded.player_names, seed = excluded.seed",
+                            [(game_id, names, game.seed)]))
+            first = game.version - len(entry.codes) + 1 # version made by the first queued code
+            if entry.truncate:
+                ops.append(("DELETE FROM actions WHERE game_id = ?", [(game_id,)]))
+                ops.append(("UPDATE games SET log_base = ? WHERE game_id = ?", [(first - 1, game_id)]))
+            if entry.codes:
+                ops.append(("INSERT OR REPLACE INTO actions (game_id, version, code) VALUES (?, ?, ?)",
+                            [(game_id, first + i, code) for i, code in enumerate(entry.codes)]))
+            if entry.checkpoint:
+                ops.append(("UPDATE games SET checkpoint = ? WHERE game_id = ?",
+                            [(json.dumps(game.checkpoint()), game_id)]))
+            if entry.finish:
+                ops.append(("UPDATE games SET finished = ? WHERE game_id = ?", [(time.time(), game_id)]))
+        await asyncio.to_thread(self._commit, ops)
+
+    def _commit(self, ops: list):
+        with self.db_lock:
+            self.db.execute("BEGIN")
+            try:
+                for sql, rows in ops:
+                    self.db.executemany(sql, rows)
+                self.db.execute("COMMIT")
+            except BaseException:
+                if self.db.in_transaction:
+                    self.db.execute("ROLLBACK") # nothing of the batch is written, it gets requeued
+                raise
+
+    async def _read(self, game_id: str):
+        await self.written(game_id)
+        return await asyncio.to_thread(self._load, game_id)
+
+    def _load(self, game_id: str):
+        with self.db_lock:
+            row = self.db.execute("SELECT player_names, seed, checkpoint, log_base FROM games WHERE game_id = ?",
+                                  (game_id,)).fetchone()
+            if row is None:
+                return None
+            names, seed, ckpt, log_base = row
+            log = [code for code, in self.db.execute(
+                "SELECT code FROM actions WHERE game_id = ? ORDER BY version", (game_id,))]
+        return rebuild(game_id, json.loads(names), seed, ckpt, log, log_base)
+
+    async def close(self, timeout: float = 5.0):
+        await super().close(timeout)
+        with self.db_lock:
+            self.db.close()
@@ -0,0 +1,83 @@
+import json
+from game_logic.actions import encode_action
+from server.eventlog import rebuild, CHECKPOINT_EVERY
+'''
+Where the server keeps its games. A StateStore gets every game at its start, every move and its end,
+and can rebuild a game for a resume. The room side (submit_*) never awaits: a store that writes to
+disk or network queues and flushes on its own. Backends:
+
+    WriteBehind   server/writebehind.py  Redis / Sentinel event log, pooled client that connects on
+                                         first use, the default (STORE=redis)
+    SQLiteStore   server/sqlstore.py     one local SQLite file, one commit + fsync per flushed batch
+                                         of games (STORE=sqlite:/data/hanabi.db)
+    MemoryStore   this module            in-process dicts, nothing survives the process (STORE=memory)
+
+Only WriteBehind feeds the archiver, analytics and cluster takeover, which all read Redis.
+`python -m bench.bench_store` compares the backends per move.
+'''
+STATS = ("queue_games", "queue_depth", "lag_s", "flushed", "batches", "coalesced", "collapsed",
+         "dropped", "failures")
+
+
+class StateStore():
+    ERRORS = (OSError,) # what load() and flush() raise when the backend is unavailable
+
+    def submit_create(self, game):
+        raise NotImplementedError
+
+    def submit_action(self, game, action: tuple):
+        raise NotImplementedError
+
+    def submit_finish(self, game):
+        raise NotImplementedError
+
+    def submit_idle(self, game):
+        ''' every player left the unfinished game, a store that expires games may start counting '''
+
+    async def load(self, game_id: str):
+        ''' the stored game after everything submitted so far, None if there is none '''
+        raise NotImplementedError
+
+    async def flush(self):
+        ''' wait until everything submitted so far is stored '''
+
+    def forget(self, game_id: str):
+        ''' game left this process (finished / archived), drop per-game bookkeeping '''
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return dict.fromkeys(STATS, 0)
+
+
+class MemoryStore(StateStore):
+    ''' games of this process only, for tests, benchmarks and single-node play without Redis.
+    Same layout as the event log, so a resume replays checkpoint + log like everywhere else;
+    a finished game is dropped, there is no archive to hand it to '''
+    def __init__(self, checkpoint_every: int = CHECKPOINT_EVERY):
+        self.checkpoint_every = checkpoint_every
+        self.games = {} # game_id -> [player_names, seed, checkpoint json or None, log]
+        self.flushed = 0
+
+    def submit_create(self, game):
+        stored = self.games.get(game.game_id)
+        if stored is None or not game.version:
+            self.games[game.game_id] = [[ps.name for ps in game.players], game.seed, None, []]
+
+    def submit_action(self, game, action: tuple):
+        stored = self.games[game.game_id]
+        stored[3].append(encode_action(action))
+        if game.version % self.checkpoint_every == 0:
+            stored[2] = json.dumps(game.checkpoint())
+        self.flushed += 1
+
+    def submit_finish(self, game):
+        self.games.pop(game.game_id, None)
+
+    async def load(self, game_id: str):
+        stored = self.games.get(game_id)
+        return rebuild(game_id, *stored) if stored is not None else None
+
+    def stats(self) -> dict:
+        return {**super().stats(), "flushed": self.flushed}
@@ -0,0 +1,122 @@
+import asyncio, random
+import pytest
+import redis
+from game_logic.state import GameState
+from game_logic.actions import decode_action
+from game_logic.test_actions import play_random
+from server.eventlog import meta_key, log_key, ckpt_key, FINISHED_KEY, IDLE_TTL
+from server.writebehind import WriteBehind
+from server.archive import Archive, Archiver
+from server.analytics import read_archive, replay
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def record(i):
+    return {"game_id": f"g{i}", "player_names": ["A", "B"], "seed": i, "log": ["D00", "H12R", "P13"] * i, "finished": 1.0}
+
+
+def test_lookup_survives_reopen_and_a_torn_append(tmp_path):
+    path = str(tmp_path / "games")
+    archive = Archive(path)
+    assert archive.append_many([record(i) for i in range(10)])[0] == 10
+    assert archive.append_many([record(3)]) == (0, 0) # already archived
+    assert archive.get("g7") == record(7) and archive.get("nope") is None
+    archive.close()
+
+    # a crash after the data was written but before its index line: the record is not visible,
+    # an index line whose record never made it to disk is ignored and a torn last line is cut off,
+    # even if what is left of it parses
+    with open(path + ".dat", "ab") as f:
+        f.write(b"garbage")
+    with open(path + ".idx", "a") as f:
+        f.write("g99 999999 10\ng10 0 12")
+    archive = Archive(path)
+    assert len(archive) == 10 and "g99" not in archive and "g10" not in archive
+    with open(path + ".idx") as f:
+        assert f.read().endswith("g99 999999 10\n")
+    archive.append_many([record(10)])
+    assert archive.get("g10") == record(10) and archive.get("g2") == record(2)
+    assert [rec["game_id"] for rec in archive] == [f"g{i}" for i in range(11)]
+    archive.close()
+    assert len(Archive(path)) == 11
+
+
+def test_finished_games_move_from_redis_to_the_archive(tmp_path):
+    async def scenario():
+        r = fakeredis.FakeAsyncRedis(decode_responses=True)
+        wb = WriteBehind(r)
+        rng = random.Random(1)
+        finished, live = [], GameState(["A", "B"], seed=100)
+        wb.submit_create(live)
+        wb.submit_action(live, decode_action(play_random(live, rng, 1)[0]))
+        for seed in range(5):
+            gs = GameState(["A", "B", "C"], seed=seed)
+            wb.submit_create(gs)
+            while not gs.check_end():
+                wb.submit_action(gs, decode_action(play_random(gs, rng, 1)[0]))
+            wb.submit_finish(gs)
+            finished.append(gs)
+        await wb.flush()
+        assert await r.zcard(FINISHED_KEY) == 5
+        assert await r.ttl(meta_key(finished[0].game_id)) > 0
+        assert await r.ttl(meta_key(live.game_id)) == -1 # live games never become eviction candidates
+        # a game whose table emptied may expire, until it is resumed
+        wb.submit_idle(live)
+        await wb.flush()
+        for key in (meta_key(live.game_id), log_key(live.game_id)):
+            assert 0 < await r.ttl(key) <= IDLE_TTL
+        wb.submit_create(live)
+        await wb.flush()
+        for key in (meta_key(live.game_id), log_key(live.game_id)):
+            assert await r.ttl(key) == -1
+
+        archiver = Archiver(r, Archive(str(tmp_path / "games")), batch=2)
+        assert await archiver.lead() and await archiver.lead()
+        assert not await Archiver(r, archiver.archive).lead()
+        while await archiver.archive_batch():
+            pass
+        assert archiver.archived == 5 and archiver.stats()["bytes_per_game"] > 0
+        assert await r.zcard(FINISHED_KEY) == 0
+        for gs in finished:
+            assert not await r.exists(meta_key(gs.game_id), log_key(gs.game_id), ckpt_key(gs.game_id))
+        assert await r.exists(meta_key(live.game_id))
+        archiver.archive.close()
+
+        by_id = {gs.game_id: gs for gs in finished}
+        for game_id, names, seed, codes in read_archive(str(tmp_path / "games")):
+            gs = by_id.pop(game_id)
+            assert replay(game_id, names, seed, codes)["score"] == sum(gs.board.values())
+        assert not by_id
+        await wb.close()
+    asyncio.run(scenario())
+
+
+def test_archiver_backs_off_when_redis_refuses_a_command(tmp_path):
+    async def scenario():
+        r = fakeredis.FakeAsyncRedis(decode_responses=True)
+        wb = WriteBehind(r)
+        rng = random.Random(2)
+        gs = GameState(["A", "B"], seed=9)
+        wb.submit_create(gs)
+        while not gs.check_end():
+            wb.submit_action(gs, decode_action(play_random(gs, rng, 1)[0]))
+        wb.submit_finish(gs)
+        await wb.flush()
+        archiver = Archiver(r, Archive(str(tmp_path / "games")))
+        archive_batch = archiver.archive_batch
+        async def refused_once():
+            if not archiver.failures:
+                raise redis.exceptions.ResponseError("MISCONF Redis is configured to save RDB snapshots")
+            return await archive_batch()
+        archiver.archive_batch = refused_once
+        task = asyncio.get_running_loop().create_task(archiver.run(interval=0.01))
+        for _ in range(200):
+            if archiver.archived:
+                break
+            await asyncio.sleep(0.01)
+        assert archiver.failures == 1 and archiver.archived == 1 and not task.done()
+        task.cancel()
+        archiver.archive.close()
+        await wb.close()
+    asyncio.run(scenario())
@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+import redis
+from server import cluster
+from server.server import HanabiServer
+from server.cluster import Cluster, node_key, owner_key
+from server.test_server import join, read_msg, start, HOST
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+async def node(redis_server, name):
+    r = fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True)
+    server = HanabiServer(lobby_size=2)
+    srv, port = await start(server)
+    server.cluster = Cluster(r, HOST, port, node_id=name)
+    await server.cluster.register(**server.load())
+    return server, srv, port, r
+
+
+def test_joins_are_routed_to_the_owner_and_taken_over():
+    async def scenario():
+        redis_server = fakeredis.FakeServer()
+        a, srv_a, port_a, r = await node(redis_server, "a")
+        b, srv_b, port_b, _ = await node(redis_server, "b")
+        assert set(await a.cluster.nodes()) == {"a", "b"}
+
+        # a named room is pinned to one node, joiners at the other one are sent there
+        first = await join(port_a, "P0", room="t")
+        assert (await read_msg(first[0]))["type"] == "ASSIGN_IDX" # idle tie stays local
+        await a.cluster.register(**a.load()) # heartbeat: a now has a waiting player
+        other = await join(port_b, "P1", room="t")
+        redirect = await read_msg(other[0])
+        assert redirect == {"type": "REDIRECT", "host": HOST, "port": port_a}
+        second = await join(port_a, "P1", room="t", routed=True)
+        assert (await read_msg(second[0]))["idx"] == 1
+        state = await read_msg(first[0])
+        game_id = state["game_id"]
+        assert await r.get(owner_key(game_id)) == "a"
+
+        # a resume of that game at b is sent to its owner
+        resume = await join(port_b, "P0", game_id=game_id)
+        assert (await read_msg(resume[0]))["port"] == port_a
+
+        # a dies (its heartbeat expires): b adopts the game and serves the resume itself
+        await r.delete(node_key("a"))
+        assert await b.cluster.takeover() == [game_id]
+        assert await r.get(owner_key(game_id)) == "b"
+        assert await b.cluster.takeover() == []
+        resume = await join(port_b, "P0", game_id=game_id)
+        assert (await read_msg(resume[0]))["type"] == "ASSIGN_IDX"
+
+        for _, w in (first, other, second, resume):
+            w.close()
+        srv_a.close()
+        srv_b.close()
+    asyncio.run(scenario())
+
+
+def test_redis_refusing_commands_neither_stops_the_heartbeat_nor_the_join(monkeypatch):
+    async def scenario():
+        redis_server = fakeredis.FakeServer()
+        a, srv_a, port_a, r = await node(redis_server, "a")
+        _, srv_b, _, _ = await node(redis_server, "b")
+        oom = redis.exceptions.OutOfMemoryError("command not allowed when used memory > 'maxmemory'")
+        register, beats = a.cluster.register, []
+        async def full_once(**load):
+            beats.append(load)
+            if len(beats) == 1:
+                raise oom
+            await register(**load)
+        a.cluster.register = full_once
+        await r.delete(node_key("a"))
+        monkeypatch.setattr(cluster, "HEARTBEAT", 0.01)
+        heartbeat = asyncio.get_running_loop().create_task(a.cluster.run(a.load))
+        for _ in range(200):
+            if await r.exists(node_key("a")):
+                break
+            await asyncio.sleep(0.01)
+        assert len(beats) >= 2 and await r.exists(node_key("a")) and not heartbeat.done()
+        heartbeat.cancel()
+
+        # the registry refuses the routing lookup: the player is served here
+        async def refused(join):
+            raise oom
+        a.cluster.route = refused
+        player = await join(port_a, "P0", room="t")
+        assert (await read_msg(player[0]))["type"] == "ASSIGN_IDX"
+        player[1].close()
+        srv_a.close()
+        srv_b.close()
+    asyncio.run(scenario())
@@ -0,0 +1,28 @@
+import asyncio, json, random
+import pytest
+from game_logic.state import GameState
+from game_logic.actions import decode_action
+from game_logic.test_actions import play_random
+from server.eventlog import ActionLog
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_log_and_checkpoints_rebuild_the_game():
+    async def scenario():
+        r = fakeredis.FakeAsyncRedis(decode_responses=True)
+        log = ActionLog(r, checkpoint_every=4)
+        gs = GameState(["A", "B", "C"], seed=5)
+        await log.create(gs)
+        rng = random.Random(3)
+        while not gs.check_end():
+            code = play_random(gs, rng, 1)[0]
+            await log.append(gs, decode_action(code))
+            loaded = await log.load(gs.game_id)
+            assert loaded.checkpoint() == gs.checkpoint()
+            # the log is the whole history, the checkpoint trails it by less than 4 moves
+            assert await r.llen(f"hanabi:log:{gs.game_id}") == gs.version
+            ckpt = json.loads(await r.get(f"hanabi:ckpt:{gs.game_id}") or '{"version": 0}')
+            assert ckpt["version"] == gs.version - gs.version % 4
+        assert await log.load("missing") is None
+    asyncio.run(scenario())
@@ -0,0 +1,57 @@
+import asyncio, json
+from server.metrics import Metrics, Histogram
+from server.server import HanabiServer
+from server.test_server import join, read_msg, start, HOST
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("t_seconds", "test", buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 0.7, 3.0):
+        h.observe(v)
+    lines = h.render()
+    assert 't_seconds_bucket{le="0.1"} 1' in lines
+    assert 't_seconds_bucket{le="1.0"} 3' in lines
+    assert 't_seconds_bucket{le="+Inf"} 4' in lines
+    assert "t_seconds_count 4" in lines
+
+
+async def http_get(port, path):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    writer.write(f"GET {path} HTTP/1.0\r\n\r\n".encode())
+    raw = await asyncio.wait_for(reader.read(), 2)
+    writer.close()
+    head, body = raw.decode().split("\r\n\r\n", 1)
+    return head.split()[1], body
+
+
+def test_server_exports_phase_timings_and_profile():
+    async def scenario():
+        metrics = Metrics()
+        server = HanabiServer(lobby_size=2, metrics=metrics)
+        srv, port = await start(server)
+        http = await metrics.start_http(HOST, 0)
+        http_port = http.sockets[0].getsockname()[1]
+        players = [await join(port, f"P{i}") for i in range(2)]
+        for r, _ in players:
+            await read_msg(r) # ASSIGN_IDX
+        state = [await read_msg(r) for r, _ in players][0]
+        status, body = await http_get(http_port, f"/profile?game={state['game_id']}")
+        assert json.loads(body)["armed"]
+        for turn in range(4):
+            players[turn % 2][1].write((json.dumps({"type":"DISC","player_idx":turn % 2,"card_idx":0}) + "\n").encode())
+            for r, _ in players:
+                assert (await read_msg(r))["version"] == turn + 1
+        status, body = await http_get(http_port, "/metrics")
+        assert status == "200"
+        assert "hanabi_moves_total 4" in body
+        assert "hanabi_mutate_seconds_count 4" in body
+        assert "hanabi_connections 2" in body and "hanabi_lobby_players 0" in body
+        status, body = await http_get(http_port, f"/profile?game={state['game_id']}")
+        phases = json.loads(body)["phases"]
+        assert phases["mutate"]["count"] == 4 and phases["send"]["count"] == 4
+        assert (await http_get(http_port, "/nope"))[0] == "404"
+        for _, w in players:
+            w.close()
+        srv.close()
+        http.close()
+    asyncio.run(scenario())
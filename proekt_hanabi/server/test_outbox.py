@@ -0,0 +1,57 @@
+import asyncio, json
+import server.server as srvmod
+from game_logic.state import GameState
+from server.server import Conn, Room, HanabiServer
+
+
+class StalledWriter():
+    ''' StreamWriter whose peer never reads: the first write goes out, then drain() hangs '''
+    def __init__(self):
+        self.written = []
+        self.aborted = False
+        self.transport = self
+        self.unblock = asyncio.Event()
+
+    def write(self, data):
+        self.written.append(data)
+
+    async def drain(self):
+        await self.unblock.wait()
+
+    def abort(self):
+        self.aborted = True
+
+
+def test_slow_connection_is_coalesced_then_dropped(monkeypatch):
+    async def scenario():
+        monkeypatch.setattr(srvmod, "OUTBOX_FRAMES", 3)
+        server = HanabiServer(lobby_size=2)
+        room = Room(0, 2)
+        room.game = GameState(["A", "B"], seed=1)
+        slow, fast = StalledWriter(), StalledWriter()
+        fast.unblock.set()
+        room.clients = [Conn(slow, "A"), Conn(fast, "B")]
+        slow_conn = room.clients[0]
+        await server.broadcast_state(room, full=True)
+        await asyncio.sleep(0.001) # let the pumps run
+        for turn in range(6):
+            room.game.discard(turn % 2, 0)
+            await server.broadcast_state(room)
+            await asyncio.sleep(0.001) # let the pumps run
+        # the fast peer got every frame, the slow one has one STATE standing in for the backlog
+        assert len(fast.written) == 7
+        assert len(slow.written) == 1
+        queued = [json.loads(data) for _, data in slow_conn.outbox]
+        assert queued[0]["type"] == "STATE" and queued[-1]["version"] == 6
+        assert len(queued) <= 3
+        # once it has been behind for longer than the budget it is cut off
+        monkeypatch.setattr(srvmod, "LAG_BUDGET", 0.0)
+        room.game.discard(0, 0)
+        await server.broadcast_state(room)
+        assert slow_conn.closed and slow.aborted and server.slow_drops == 1
+        await asyncio.sleep(0.001)
+        await server.broadcast_state(room) # counted once, later broadcasts skip it
+        assert server.slow_drops == 1
+        for conn in room.clients:
+            conn.close()
+    asyncio.run(scenario())
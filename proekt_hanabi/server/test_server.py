@@ -0,0 +1,198 @@
+import asyncio, json
+from game_logic.protocol import encode_frame, read_frame_async, HEADER, T_ERROR
+from server.server import HanabiServer, WATCHING
+from server.spectate import censor
+
+HOST = '127.0.0.1'
+
+
+async def join(port, name, room=None, **extra):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    payload = {"type":"JOIN","player":name, **extra}
+    if room is not None:
+        payload["room"] = room
+    writer.write((json.dumps(payload) + "\n").encode())
+    return reader, writer
+
+
+async def read_msg(reader):
+    return json.loads(await asyncio.wait_for(reader.readline(), 2))
+
+
+async def start(server):
+    srv = await asyncio.start_server(server.handle_client, HOST, 0)
+    return srv, srv.sockets[0].getsockname()[1]
+
+
+def test_rooms_are_independent():
+    async def scenario():
+        server = HanabiServer(lobby_size=2)
+        srv, port = await start(server)
+        players = [await join(port, f"P{i}") for i in range(4)]
+        assigns = [await read_msg(r) for r, _ in players]
+        assert [a["idx"] for a in assigns] == [0, 1, 0, 1]
+        assert assigns[0]["room"] == assigns[1]["room"] != assigns[2]["room"]
+        states = [await read_msg(r) for r, _ in players]
+        assert all(s["type"] == "STATE" for s in states)
+        assert states[0]["game_id"] != states[2]["game_id"]
+        # a move in the first room is only broadcast to that room
+        players[0][1].write((json.dumps({"type":"DISC","player_idx":0,"card_idx":0}) + "\n").encode())
+        after = await read_msg(players[1][0])
+        assert after["type"] == "DELTA" and after["version"] == 1
+        assert after["current_turn"] == 1
+        # resync returns a full snapshot to the asking client only
+        players[1][1].write((json.dumps({"type":"RESYNC"}) + "\n").encode())
+        full = await read_msg(players[1][0])
+        assert full["type"] == "STATE" and full["version"] == 1
+        assert server.rooms[assigns[2]["room"]].game.current_turn == 0
+        for _, w in players:
+            w.close()
+        srv.close()
+    asyncio.run(scenario())
+
+
+def test_named_room_rejects_duplicate_and_full():
+    async def scenario():
+        server = HanabiServer(lobby_size=2, max_rooms=1)
+        srv, port = await start(server)
+        a = await join(port, "A", room="t1")
+        assert (await read_msg(a[0]))["idx"] == 0
+        dup = await join(port, "A", room="t1")
+        assert (await read_msg(dup[0]))["msg"] == "Name already taken"
+        other = await join(port, "B", room="t2")
+        assert (await read_msg(other[0]))["msg"] == "Server full"
+        for _, w in (a, dup, other):
+            w.close()
+        srv.close()
+    asyncio.run(scenario())
+
+
+def test_player_leaving_the_lobby_frees_its_seat():
+    async def scenario():
+        server = HanabiServer(lobby_size=3)
+        srv, port = await start(server)
+        a = await join(port, "A", room="t")
+        b = await join(port, "B", room="t")
+        assert (await read_msg(a[0]))["idx"] == 0 and (await read_msg(b[0]))["idx"] == 1
+        a[1].close()
+        assert (await read_msg(b[0]))["idx"] == 0 # moved up into the free seat
+        assert server.rooms["t"].lobby_names == ["B"]
+        c = await join(port, "C", room="t")
+        d = await join(port, "D", room="t")
+        assert (await read_msg(c[0]))["idx"] == 1 and (await read_msg(d[0]))["idx"] == 2
+        states = [await read_msg(r) for r, _ in (b, c, d)]
+        assert states[0]["player_names"] == ["B", "C", "D"]
+        # every seat is held, so the first player to move is connected
+        b[1].write((json.dumps({"type":"DISC","player_idx":0,"card_idx":0}) + "\n").encode())
+        assert (await read_msg(c[0]))["version"] == 1
+        for _, w in (b, c, d):
+            w.close()
+        srv.close()
+    asyncio.run(scenario())
+
+
+def test_binary_and_json_clients_share_a_room():
+    async def scenario():
+        server = HanabiServer(lobby_size=2)
+        srv, port = await start(server)
+        text = await join(port, "T")
+        binary = await join(port, "B", proto="bin", compress="zlib")
+        assert (await read_msg(text[0]))["proto"] == "json"
+        assign = await read_msg(binary[0])
+        assert assign["proto"] == "bin" and assign["compress"] == "zlib"
+        json_state = await read_msg(text[0])
+        bin_state = await read_frame_async(binary[0])
+        # same game, each seat sees the other hand and only the hints of its own
+        assert {**bin_state, "hands": None} == {**json_state, "hands": None}
+        assert json_state["hands"][1] == server.rooms[0].message("STATE")["hands"][1]
+        assert bin_state["hands"][0] == server.rooms[0].message("STATE")["hands"][0]
+        assert all(c["number"] is None for c in json_state["hands"][0] + bin_state["hands"][1])
+        text[1].write((json.dumps({"type":"DISC","player_idx":0,"card_idx":1}) + "\n").encode())
+        bin_delta = await read_frame_async(binary[0])
+        json_delta = await read_msg(text[0])
+        assert bin_delta["slot"][2]["number"] is not None and json_delta["slot"][2]["number"] is None
+        assert {**bin_delta, "slot": None} == {**json_delta, "slot": None}
+        binary[1].write(encode_frame({"type":"DISC","player_idx":1,"card_idx":2}))
+        json_delta = await read_msg(text[0])
+        bin_delta = await asyncio.wait_for(read_frame_async(binary[0]), 2)
+        assert json_delta["slot"][:2] == bin_delta["slot"][:2] == [1, 2]
+        assert bin_delta["discard"] == json_delta["discard"]
+        for _, w in (text, binary):
+            w.close()
+        srv.close()
+    asyncio.run(scenario())
+
+
+def test_watcher_sees_no_hand_whatever_seat_it_names():
+    async def scenario():
+        server = HanabiServer(lobby_size=3)
+        srv, port = await start(server)
+        players = [await join(port, f"P{i}", room="t") for i in range(3)]
+        watcher = await join(port, "W", room="t", watch=0)
+        for r, _ in (*players, watcher):
+            await read_msg(r) # ASSIGN_IDX
+        states = [await read_msg(r) for r, _ in players]
+        watched = await read_msg(watcher[0])
+        assert watched == censor(states[1]) == censor(states[0])
+        assert all(card["number"] is None for hand in watched["hands"] for card in hand)
+        players[0][1].write((json.dumps({"type":"DISC","player_idx":0,"card_idx":0}) + "\n").encode())
+        deltas = [await read_msg(r) for r, _ in players]
+        assert await read_msg(watcher[0]) == censor(deltas[1]) == deltas[0]
+        assert deltas[1] == deltas[2] != deltas[0]
+        # one shared encoding, the drawing seat's and the watchers', whatever the table size
+        assert {key[1] for key in server.rooms["t"].views} == {None, 0, WATCHING}
+        watcher[1].write((json.dumps({"type":"PLAY","player_idx":2,"card_idx":0}) + "\n").encode())
+        watcher[1].close() # moves from a watcher are ignored
+        players[2][1].write((json.dumps({"type":"RESYNC"}) + "\n").encode())
+        assert (await read_msg(players[2][0]))["version"] == 1
+        for _, w in players:
+            w.close()
+        srv.close()
+    asyncio.run(scenario())
+
+
+def test_dropped_player_retakes_its_seat():
+    async def scenario():
+        server = HanabiServer(lobby_size=2)
+        srv, port = await start(server)
+        players = [await join(port, f"P{i}", room="t") for i in range(2)]
+        for r, _ in players:
+            await read_msg(r) # ASSIGN_IDX
+        game_id = (await read_msg(players[0][0]))["game_id"]
+        players[0][1].write((json.dumps({"type":"DISC","player_idx":0,"card_idx":0}) + "\n").encode())
+        players[1][1].close()
+        while len(server.rooms["t"].clients) == 2:
+            await asyncio.sleep(0.01)
+        stranger = await join(port, "X", room="t", game_id=game_id)
+        assert (await read_msg(stranger[0]))["msg"] == "Game already in progress"
+        back = await join(port, "P1", room="t", game_id=game_id)
+        assert (await read_msg(back[0]))["idx"] == 1
+        state = await read_msg(back[0])
+        assert state["type"] == "STATE" and state["version"] == 1 and state["current_turn"] == 1
+        back[1].write((json.dumps({"type":"DISC","player_idx":1,"card_idx":0}) + "\n").encode())
+        assert (await read_msg(players[0][0]))["version"] == 1 # the DISC before the drop
+        assert (await read_msg(players[0][0]))["version"] == 2
+        for w in (players[0][1], stranger[1], back[1]):
+            w.close()
+        srv.close()
+    asyncio.run(scenario())
+
+
+def test_bad_binary_frame_drops_only_that_connection():
+    async def scenario():
+        server = HanabiServer(lobby_size=2)
+        srv, port = await start(server)
+        bad = await join(port, "A", room="t", proto="bin")
+        await read_msg(bad[0]) # ASSIGN_IDX
+        bad[1].write(HEADER.pack(0xFFFFFFF0, T_ERROR)) # a ~4 GiB frame that never comes
+        assert await asyncio.wait_for(bad[0].read(), 2) == b"" # hung up on
+        for _ in range(100): # the lobby seat goes with it
+            if "t" not in server.rooms:
+                break
+            await asyncio.sleep(0.01)
+        assert "t" not in server.rooms
+        ok = await join(port, "B", room="t")
+        assert (await read_msg(ok[0]))["idx"] == 0
+        ok[1].close()
+        srv.close()
+    asyncio.run(scenario())
@@ -0,0 +1,132 @@
+import asyncio
+import pytest
+from game_logic.delta import apply_delta
+from game_logic.protocol import encode_json, encode_frame, read_frame_async
+from game_logic.actions import DISC, apply_action
+from game_logic.state import GameState
+from server.server import HanabiServer
+from server.spectate import SpectatorFeed, censor, channel, snapshot_key
+from server.gateway import SpectatorGateway
+from server.test_server import join, read_msg, start, HOST
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+async def wait_for(cond, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if cond():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+async def spectate(port, game_id, **extra):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    writer.write(encode_json({"type": "SPECTATE", "game_id": game_id, **extra}))
+    return reader, writer
+
+
+def test_viewers_follow_a_censored_game_through_the_gateway():
+    async def scenario():
+        redis_server = fakeredis.FakeServer()
+        feed = SpectatorFeed(fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True),
+                             snapshot_every=4)
+        server = HanabiServer(lobby_size=2, spectators=feed)
+        srv, port = await start(server)
+        gateway = SpectatorGateway(fakeredis.FakeAsyncRedis(server=redis_server))
+        gw = await asyncio.start_server(gateway.handle_viewer, HOST, 0)
+        gw_port = gw.sockets[0].getsockname()[1]
+
+        players = [await join(port, f"P{i}") for i in range(2)]
+        for r, _ in players:
+            await read_msg(r)
+        game_id = (await read_msg(players[0][0]))["game_id"]
+        await read_msg(players[1][0])
+        game = next(iter(server.rooms.values())).game
+        await wait_for(lambda: feed.published >= 1)
+
+        # the start STATE was stored as the snapshot, a viewer joining now gets it
+        text = await spectate(gw_port, game_id)
+        binary = await spectate(gw_port, game_id, proto="bin")
+        seen = [await read_msg(text[0]), await asyncio.wait_for(read_frame_async(binary[0]), 2)]
+        assert seen[0] == seen[1] == censor({"type": "STATE", **game.serialize_state()})
+        assert all(card["number"] is None for hand in seen[0]["hands"] for card in hand)
+
+        for turn in range(6):
+            players[turn % 2][1].write(encode_json({"type": "DISC", "player_idx": turn % 2, "card_idx": 0}))
+            for r, _ in players:
+                await read_msg(r)
+            apply_delta(seen[0], await read_msg(text[0]))
+            apply_delta(seen[1], await asyncio.wait_for(read_frame_async(binary[0]), 2))
+        expected = censor({"type": "STATE", **game.serialize_state()})
+        assert seen[0] == seen[1] == expected
+        assert gateway.frames == 7 # 6 deltas + the start state, periodic snapshots are absorbed
+
+        # a late viewer starts from the gateway's copy, not from the server
+        late = await spectate(gw_port, game_id)
+        assert await read_msg(late[0]) == expected
+
+        for _, w in (*players, text, binary, late):
+            w.close()
+        await wait_for(lambda: not gateway.feeds)
+        srv.close()
+        gw.close()
+    asyncio.run(scenario())
+
+
+def test_gateway_resubscribes_and_reloads_the_snapshot_after_a_lost_subscription():
+    async def scenario():
+        redis_server = fakeredis.FakeServer()
+        publisher = fakeredis.FakeAsyncRedis(server=redis_server)
+        game = GameState(["A", "B"], game_id="g1", seed=3)
+        await publisher.set(snapshot_key("g1"), encode_frame(censor({"type": "STATE", **game.serialize_state()})))
+        gateway = SpectatorGateway(fakeredis.FakeAsyncRedis(server=redis_server),
+                                   reconnect=lambda: fakeredis.FakeAsyncRedis(server=redis_server))
+        gw = await asyncio.start_server(gateway.handle_viewer, HOST, 0)
+        viewer = await spectate(gw.sockets[0].getsockname()[1], "g1")
+        assert (await read_msg(viewer[0]))["version"] == 0
+
+        # the subscription breaks; meanwhile the game moves on and only its snapshot is left to find
+        lost = asyncio.Event()
+        async def broken(**kwargs):
+            lost.set()
+            raise ConnectionError("connection reset")
+        gateway.pubsub.get_message = broken
+        await lost.wait()
+        for _ in range(3):
+            apply_action(game, (DISC, game.current_turn, 0))
+        await publisher.set(snapshot_key("g1"), encode_frame(censor({"type": "STATE", **game.serialize_state()})))
+        assert await read_msg(viewer[0]) == censor({"type": "STATE", **game.serialize_state()})
+        assert gateway.failures == 1
+
+        # and the new subscription carries the frames after it
+        apply_action(game, (DISC, game.current_turn, 0))
+        state = censor({"type": "STATE", **game.serialize_state()})
+        await wait_for(lambda: gateway.pubsub.subscribed)
+        await publisher.publish(channel("g1"), encode_frame(state))
+        assert await read_msg(viewer[0]) == state
+
+        viewer[1].close()
+        await wait_for(lambda: not gateway.feeds)
+        gw.close()
+    asyncio.run(scenario())
+
+
+def test_failed_subscribe_fails_every_waiting_viewer():
+    async def scenario():
+        gateway = SpectatorGateway(fakeredis.FakeAsyncRedis())
+        async def refused(*channels):
+            await asyncio.sleep(0.05) # the second viewer arrives while the first subscribe is on its way
+            raise ConnectionError("connection refused")
+        gateway.pubsub.subscribe = refused
+        results = await asyncio.wait_for(
+            asyncio.gather(gateway.watch("g1"), gateway.watch("g1"), return_exceptions=True), 2)
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert not gateway.feeds
+
+        gw = await asyncio.start_server(gateway.handle_viewer, HOST, 0)
+        reader, writer = await spectate(gw.sockets[0].getsockname()[1], "g1")
+        assert (await read_msg(reader))["type"] == "ERROR"
+        writer.close()
+        gw.close()
+    asyncio.run(scenario())
@@ -0,0 +1,157 @@
+import asyncio, random
+import pytest
+import redis.asyncio
+from game_logic.state import GameState
+from game_logic.actions import decode_action
+from game_logic.test_actions import play_random
+from server.writebehind import WriteBehind
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_queue_coalesces_and_load_matches_after_flush():
+    async def scenario():
+        r = fakeredis.FakeAsyncRedis(decode_responses=True)
+        wb = WriteBehind(r, checkpoint_every=4)
+        gs = GameState(["A", "B"], seed=11)
+        wb.submit_create(gs)
+        rng = random.Random(2)
+        # a burst of moves with no chance for the worker to run in between
+        for _ in range(10):
+            if gs.check_end():
+                break
+            wb.submit_action(gs, decode_action(play_random(gs, rng, 1)[0]))
+        assert wb.stats()["queue_games"] == 1
+        await wb.flush()
+        stats = wb.stats()
+        assert stats["queue_depth"] == 0 and stats["coalesced"] > 0
+        assert (await wb.log.load(gs.game_id)).checkpoint() == gs.checkpoint()
+        # one move at a time goes out as plain log entries until the next checkpoint
+        for _ in range(3):
+            wb.submit_action(gs, decode_action(play_random(gs, rng, 1)[0]))
+            await wb.flush()
+            assert (await wb.log.load(gs.game_id)).checkpoint() == gs.checkpoint()
+        await wb.close()
+    asyncio.run(scenario())
+
+
+class FlakyRedis():
+    ''' fakeredis whose pipelines fail `fail` times, like a master going away during failover '''
+    def __init__(self, r, fail: int):
+        self.r, self.fail = r, fail
+
+    def pipeline(self, transaction=True):
+        if self.fail:
+            self.fail -= 1
+            raise redis.exceptions.ConnectionError("master down")
+        return self.r.pipeline(transaction=transaction)
+
+
+def test_failed_writes_are_retried_with_backoff():
+    async def scenario():
+        r = fakeredis.FakeAsyncRedis(decode_responses=True)
+        flaky = FlakyRedis(r, fail=2)
+        reconnects = []
+        def reconnect():
+            reconnects.append(1)
+            return flaky
+        wb = WriteBehind(flaky, reconnect=reconnect, checkpoint_every=8)
+        gs = GameState(["A", "B", "C"], seed=4)
+        wb.submit_create(gs)
+        rng = random.Random(1)
+        for _ in range(3):
+            wb.submit_action(gs, decode_action(play_random(gs, rng, 1)[0]))
+            await asyncio.sleep(0)
+        await asyncio.wait_for(wb.flush(), 5)
+        stats = wb.stats()
+        assert stats["failures"] == 2 and len(reconnects) == 2
+        assert stats["queue_depth"] == 0 and stats["flushed"] == 3
+        assert (await wb.log.load(gs.game_id)).checkpoint() == gs.checkpoint()
+        await wb.close()
+    asyncio.run(scenario())
+
+
+def test_out_of_memory_keeps_the_batch():
+    async def scenario():
+        r = fakeredis.FakeAsyncRedis(decode_responses=True)
+        wb = WriteBehind(r, checkpoint_every=8)
+        write, calls = wb._write, []
+        async def oom_once(batch):
+            calls.append(len(batch))
+            if len(calls) == 1:
+                raise redis.exceptions.OutOfMemoryError("command not allowed when used memory > 'maxmemory'")
+            await write(batch)
+        wb._write = oom_once
+        gs = GameState(["A", "B"], seed=6)
+        wb.submit_create(gs)
+        rng = random.Random(5)
+        for _ in range(5):
+            wb.submit_action(gs, decode_action(play_random(gs, rng, 1)[0]))
+        await asyncio.wait_for(wb.flush(), 5)
+        assert len(calls) == 2 and wb.stats()["failures"] == 1
+        # create and meta survived the failed flush
+        assert (await wb.log.load(gs.game_id)).checkpoint() == gs.checkpoint()
+        await wb.close()
+    asyncio.run(scenario())
+
+
+def test_backlog_past_the_bound_collapses_into_a_checkpoint():
+    async def scenario():
+        r = fakeredis.FakeAsyncRedis(decode_responses=True)
+        wb = WriteBehind(r, max_pending=4, checkpoint_every=16)
+        gs = GameState(["A", "B", "C"], seed=19)
+        wb.submit_create(gs)
+        rng = random.Random(4)
+        for _ in range(12):
+            wb.submit_action(gs, decode_action(play_random(gs, rng, 1)[0]))
+            assert wb.stats()["queue_depth"] <= 4
+        await wb.flush()
+        stats = wb.stats()
+        # moves 1-5 and 6-10 each went over the bound, 11 and 12 are logged after the cut
+        assert stats["collapsed"] == 10 and stats["flushed"] == 2
+        assert await r.hget(f"hanabi:meta:{gs.game_id}", "log_base") == "10"
+        assert await r.llen(f"hanabi:log:{gs.game_id}") == 2
+        assert (await wb.log.load(gs.game_id)).checkpoint() == gs.checkpoint()
+        # later moves are logged after the cut and still load
+        for _ in range(3):
+            wb.submit_action(gs, decode_action(play_random(gs, rng, 1)[0]))
+            await wb.flush()
+            assert (await wb.log.load(gs.game_id)).checkpoint() == gs.checkpoint()
+        await wb.close()
+    asyncio.run(scenario())
+
+
+def test_resume_waits_only_for_its_own_game_and_not_forever():
+    async def scenario():
+        r = fakeredis.FakeAsyncRedis(decode_responses=True)
+        wb = WriteBehind(r, load_timeout=0.2)
+        done = GameState(["A", "B"], seed=7)
+        wb.submit_create(done)
+        await wb.flush()
+        # Redis hangs from now on: the next batch never comes back
+        store, hung = wb._store, asyncio.Event()
+        async def hanging(batch):
+            await hung.wait()
+            await store(batch)
+        wb._store = hanging
+        busy = GameState(["C", "D"], seed=8)
+        wb.submit_create(busy)
+        await asyncio.sleep(0)
+        assert (await asyncio.wait_for(wb.load(done.game_id), 1)).checkpoint() == done.checkpoint()
+        with pytest.raises(wb.ERRORS):
+            await asyncio.wait_for(wb.load(busy.game_id), 1)
+        hung.set()
+        assert (await asyncio.wait_for(wb.load(busy.game_id), 1)).checkpoint() == busy.checkpoint()
+        await wb.close()
+
+        # nothing listens on the port: the resume fails within load_timeout
+        srv = await asyncio.start_server(lambda reader, writer: None, "127.0.0.1", 0)
+        port = srv.sockets[0].getsockname()[1]
+        srv.close()
+        await srv.wait_closed()
+        down = WriteBehind(redis.asyncio.Redis(port=port, decode_responses=True), load_timeout=0.5)
+        down.submit_create(busy)
+        with pytest.raises(down.ERRORS):
+            await asyncio.wait_for(down.load(busy.game_id), 3)
+        down.task.cancel()
+    asyncio.run(scenario())
@@ -0,0 +1,276 @@
+import asyncio, time
+from time import perf_counter
+import redis
+from game_logic.actions import encode_action
+from server.eventlog import ActionLog, CHECKPOINT_EVERY
+from server.store import StateStore
+'''
+Write-behind persistence, the Redis StateStore (server/store.py): the room only queues what
+changed (submit_* never awaits) and one worker task flushes everything pending in a single
+pipelined MULTI, so a slow or failing-over Redis master never sits between a move and its
+broadcast. Subclasses keep the queue and only replace _store (server/sqlstore.py).
+
+Per game the queue holds at most one entry: the actions since the last flush (the log is the
+game's full history, so every action is written) and whether a checkpoint is due. However many
+CHECKPOINT_EVERY boundaries a game crosses while queued, one checkpoint of its latest state goes
+out with the flush (latest state wins); a finished game is handed to the archiver after its last
+actions. On any Redis error the batch goes back to the queue and the worker retries with
+exponential backoff, asking `reconnect` for a fresh master client (Sentinel rediscovery).
+A resume (load) waits only until the writes queued for its own game are stored, and at most
+LOAD_TIMEOUT for those and the read together, so an outage fails the resume instead of holding it.
+
+The queue is bounded. Past MAX_PENDING queued actions, the game that submits one more has its
+queued actions collapsed into a checkpoint of its latest state, and a failed batch going back over
+the bound collapses every game. A collapsed game stays resumable: its log restarts at that
+checkpoint (log_base, see server/eventlog.py), it just drops out of seed replay analytics.
+`collapsed` counts the actions given up.
+'''
+MAX_PENDING = 100000 # queued actions before games are collapsed into checkpoints. the queue then
+                     # holds about one checkpoint per live game, which is in memory anyway
+BACKOFF_MIN, BACKOFF_MAX = 0.05, 2.0
+LOAD_TIMEOUT = 3.0 # seconds a resume waits for its game's pending writes and the read
+
+
+class Pending():
+    __slots__ = ("game", "create", "truncate", "codes", "checkpoint", "finish", "idle", "since")
+    def __init__(self, game):
+        self.game = game
+        self.create = False
+        self.truncate = False   # actions were given up: restart the log at the first of the codes
+        self.codes = []         # encoded actions not yet in Redis
+        self.checkpoint = False # write game.checkpoint() after the codes
+        self.finish = False     # game over: hand it to the archiver after everything else
+        self.idle = False       # its table emptied: let the keys expire after everything else
+        self.since = time.monotonic()
+
+
+class WriteBehind(StateStore):
+    ERRORS = (redis.exceptions.RedisError, OSError)
+    PHASE = "redis" # metrics phase of a flush, None = not timed
+
+    def __init__(self, r, reconnect=None, max_pending: int = MAX_PENDING,
+                 checkpoint_every: int = CHECKPOINT_EVERY, metrics=None, load_timeout: float = LOAD_TIMEOUT):
+        self.log = ActionLog(r, checkpoint_every) if r is not None else None
+        self.reconnect = reconnect # () -> new redis client, None keeps the current one
+        self.metrics = metrics     # server.metrics.Metrics or None
+        self.max_pending = max_pending
+        self.checkpoint_every = checkpoint_every
+        self.load_timeout = load_timeout
+        self.pending = {}   # game_id -> Pending
+        self.inflight = {}  # the batch being written
+        self.waiters = {}   # game_id -> Event set once its queued writes are stored
+        self.log_len = {}   # game_id -> actions in Redis since the last checkpoint
+        self.depth = 0      # queued actions over all games
+        self.wakeup = None
+        self.idle = None
+        self.task = None
+        # counters
+        self.flushed = 0    # actions written
+        self.batches = 0
+        self.coalesced = 0  # checkpoints folded into a later one before they were written
+        self.collapsed = 0  # actions given up to stay under max_pending
+        self.dropped = 0    # games given up on (close() with Redis still down)
+        self.warned = False
+        self.failures = 0
+
+    # -- producer side, called from the room, never blocks --
+    def _entry(self, game):
+        entry = self.pending.get(game.game_id)
+        if entry is None:
+            entry = self.pending[game.game_id] = Pending(game)
+        entry.game = game
+        return entry
+
+    def submit_create(self, game):
+        entry = self._entry(game)
+        self.depth -= len(entry.codes)
+        entry.create, entry.truncate, entry.codes, entry.checkpoint, entry.finish = True, False, [], False, False
+        entry.idle = False
+        self.log_len[game.game_id] = 0
+        self._kick()
+
+    def submit_action(self, game, action: tuple):
+        entry = self._entry(game)
+        entry.codes.append(encode_action(action))
+        self.depth += 1
+        backlog = self.log_len.get(game.game_id, 0) + len(entry.codes)
+        if backlog >= self.checkpoint_every and backlog % self.checkpoint_every == 0:
+            if entry.checkpoint:
+                self.coalesced += 1
+            entry.checkpoint = True
+        if self.depth > self.max_pending:
+            self._collapse(entry)
+        self._kick()
+
+    def _collapse(self, entry):
+        if not self.warned:
+            self.warned = True
+            print(f"[WARN] Write-behind backlog past {self.max_pending} actions, collapsing games into checkpoints")
+        self.collapsed += len(entry.codes)
+        self.depth -= len(entry.codes)
+        entry.codes, entry.truncate, entry.checkpoint = [], True, True
+
+    def submit_finish(self, game):
+        self._entry(game).finish = True
+        self._kick()
+
+    def submit_idle(self, game):
+        self._entry(game).idle = True
+        self._kick()
+
+    def _kick(self):
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.idle = asyncio.Event()
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        self.idle.clear()
+        self.wakeup.set()
+
+    # -- worker --
+    async def _run(self):
+        backoff = BACKOFF_MIN
+        while True:
+            if not self.pending:
+                self.idle.set()
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            batch, self.pending = self.pending, {}
+            self.inflight = batch
+            try:
+                t0 = perf_counter()
+                await self._write(batch)
+                self.inflight = {}
+                self._wake(batch)
+                if self.metrics is not None and self.PHASE:
+                    self.metrics.observe(self.PHASE, perf_counter() - t0)
+                backoff = BACKOFF_MIN
+            except self.ERRORS as e:
+                # anything Redis refuses (failover, OOM, EXECABORT) discards the whole MULTI
+                self.failures += 1
+                print(f"[WARN] Store write failed ({e}), retrying in {backoff:.2f}s")
+                self.inflight = {}
+                self._requeue(batch)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, BACKOFF_MAX)
+                if self.reconnect is not None:
+                    self.log.r = self.reconnect()
+
+    async def _write(self, batch: dict):
+        await self._store(batch)
+        for game_id, entry in batch.items():
+            self.depth -= len(entry.codes)
+            self.flushed += len(entry.codes)
+            if game_id not in self.log_len:
+                continue # forgotten meanwhile
+            if entry.checkpoint:
+                self.log_len[game_id] = 0
+            else:
+                self.log_len[game_id] += len(entry.codes)
+        self.batches += 1
+        if self.depth <= self.max_pending:
+            self.warned = False
+
+    async def _store(self, batch: dict):
+        ''' write one batch or raise one of ERRORS having written nothing '''
+        async with self.log.r.pipeline(transaction=True) as pipe:
+            for game_id, entry in batch.items():
+                if entry.create:
+                    self.log.stage_create(pipe, entry.game)
+                if entry.truncate:
+                    self.log.stage_truncate(pipe, game_id, entry.game.version - len(entry.codes))
+                if entry.codes:
+                    self.log.stage_actions(pipe, game_id, entry.codes)
+                if entry.checkpoint:
+                    # the live game is exactly at the end of the queued codes
+                    self.log.stage_checkpoint(pipe, entry.game)
+                if entry.finish:
+                    self.log.stage_finish(pipe, entry.game)
+                elif entry.idle:
+                    self.log.stage_idle(pipe, game_id)
+            await pipe.execute()
+
+    def _wake(self, batch: dict):
+        for game_id in batch:
+            waiter = self.waiters.get(game_id)
+            if waiter is not None and game_id not in self.pending:
+                del self.waiters[game_id]
+                waiter.set()
+
+    def _requeue(self, batch: dict):
+        ''' failed entries go back in front of whatever was queued for the same game meanwhile '''
+        for game_id, entry in batch.items():
+            newer = self.pending.get(game_id)
+            if newer is not None and newer.create:
+                # the game was (re)created since, the failed writes are obsolete
+                self.depth -= len(entry.codes)
+                continue
+            if newer is not None and newer.truncate:
+                # the actions between the two entries are gone, the older ones cannot be logged either
+                self.collapsed += len(entry.codes)
+                self.depth -= len(entry.codes)
+                entry.codes, entry.truncate = [], True
+            if newer is not None:
+                entry.game = newer.game
+                entry.codes += newer.codes
+                if entry.checkpoint and newer.checkpoint:
+                    self.coalesced += 1
+                entry.checkpoint = entry.checkpoint or newer.checkpoint
+                entry.finish = entry.finish or newer.finish
+                entry.idle = entry.idle or newer.idle
+            self.pending[game_id] = entry
+        if self.depth > self.max_pending:
+            for entry in self.pending.values():
+                if entry.codes:
+                    self._collapse(entry)
+
+    async def flush(self):
+        ''' wait until everything queued so far is in Redis (used before a resume reads it back) '''
+        if self.task is not None and not self.task.done():
+            await self.idle.wait()
+
+    async def written(self, game_id: str):
+        ''' wait until everything queued so far for this game is stored, other games do not count '''
+        if game_id in self.pending or game_id in self.inflight:
+            waiter = self.waiters.get(game_id)
+            if waiter is None:
+                waiter = self.waiters[game_id] = asyncio.Event()
+            await waiter.wait()
+
+    async def load(self, game_id: str):
+        try:
+            return await asyncio.wait_for(self._read(game_id), self.load_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Game {game_id} not readable within {self.load_timeout}s") from None
+
+    async def _read(self, game_id: str):
+        await self.written(game_id) # the game may still have writes in flight
+        return await self.log.load(game_id)
+
+    def forget(self, game_id: str):
+        ''' game left this process (finished / archived), stop tracking its log length '''
+        self.log_len.pop(game_id, None)
+
+    async def close(self, timeout: float = 5.0):
+        if self.task is None:
+            return
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            self.dropped += len(self.pending)
+            print(f"[ERROR] Dropping {len(self.pending)} unwritten games on shutdown")
+        self.task.cancel()
+
+    def stats(self) -> dict:
+        oldest = min((e.since for e in self.pending.values()), default=None)
+        return {
+            "queue_games": len(self.pending),
+            "queue_depth": self.depth,
+            "lag_s": time.monotonic() - oldest if oldest is not None else 0.0,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "coalesced": self.coalesced,
+            "collapsed": self.collapsed,
+            "dropped": self.dropped,
+            "failures": self.failures,
+        }